@@ -0,0 +1,105 @@
+"""Measures the cold import cost of each Lambda handler in glue/handler.py.
+
+Every handler imports its integrations inside its own body, so a cold start costs
+`import glue.handler` plus that handler's imports. For each handler this runs those
+imports in a fresh interpreter a few times & prints the median wall time, next to the
+baseline of importing glue.handler alone.
+
+Usage (from the cb-airtable-glue directory):
+    python benchmarks/import_time.py [--repeat 5]
+"""
+
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HANDLER_PATH = os.path.join(ROOT, "glue", "handler.py")
+
+TIMER = """
+import sys, time
+start = time.perf_counter()
+try:
+{imports}
+except ImportError as e:
+    print("missing", getattr(e, "name", None) or e)
+    sys.exit(0)
+print(time.perf_counter() - start)
+"""
+
+
+def handler_imports(path=HANDLER_PATH) -> dict:
+    """Returns {handler name: [import statements in its body]} for each handler"""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    handlers = {}
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef):
+            continue
+        if [arg.arg for arg in node.args.args] != ["event", "context"]:
+            continue
+        handlers[node.name] = [
+            _unparse_import(stmt)
+            for stmt in ast.walk(node)
+            if isinstance(stmt, (ast.Import, ast.ImportFrom))
+        ]
+    return handlers
+
+
+def _unparse_import(stmt) -> str:
+    names = ", ".join(
+        alias.name + (f" as {alias.asname}" if alias.asname else "")
+        for alias in stmt.names
+    )
+    if isinstance(stmt, ast.ImportFrom):
+        return f"from {'.' * stmt.level}{stmt.module or ''} import {names}"
+    return f"import {names}"
+
+
+def time_imports(statements: list, repeat: int):
+    """Median seconds to run `statements` in a new interpreter, or a missing module"""
+    code = TIMER.format(
+        imports="\n".join(f"    {statement}" for statement in statements)
+    )
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if output.returncode:
+            return "error: " + output.stderr.strip().splitlines()[-1]
+        result = output.stdout.strip().splitlines()[-1]
+        if result.startswith("missing"):
+            return result
+        timings.append(float(result))
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = time_imports(["import glue.handler"], args.repeat)
+    if not isinstance(baseline, float):
+        print(f"import glue.handler: {baseline}")
+        return
+    print(f"{'import glue.handler':<32}{baseline * 1000:>10.1f} ms")
+    for name, statements in handler_imports().items():
+        result = time_imports(["import glue.handler"] + statements, args.repeat)
+        if isinstance(result, float):
+            print(f"{name:<32}{result * 1000:>10.1f} ms")
+        else:
+            print(f"{name:<32}{result:>10}")
+
+
+if __name__ == "__main__":
+    main()
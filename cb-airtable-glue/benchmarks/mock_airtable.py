@@ -0,0 +1,600 @@
+"""Local stand-in for the Airtable API & Google Sheets, for benchmarks & trying changes
+offline.
+
+MockAirtable serves the parts of the Airtable REST API the gluecode uses from in-memory
+tables: listing records (GET & POST listRecords) with 100-record pages & offsets,
+`fields[]`, `view` (ignored), `maxRecords` & a subset of `filterByFormula`, batch
+creates, updates, upserts & deletes of up to 10 records, and the base schema endpoint.
+Like Airtable it answers 429 when a base gets more than `requests_per_second` requests,
+and it can add a fixed `latency` to each request.
+
+FakeSpreadsheet stands in for gspread.Spreadsheet, keeping written tabs in memory &
+counting writes.
+
+Point the gluecode at the mock with the AIRTABLE_API_URL environment variable (set
+before glue is imported), e.g.:
+
+    mock = MockAirtable().start()
+    mock.add_table("appBench", "People", [{"Name": "...", "Email": "..."}, ...])
+    os.environ["AIRTABLE_API_URL"] = mock.url
+"""
+
+import gzip
+import itertools
+import json
+import random
+import re
+import string
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+PAGE_SIZE = 100
+BATCH_SIZE = 10
+RECORD_ID_CHARS = string.digits + string.ascii_letters
+
+
+class FormulaError(Exception):
+    pass
+
+
+TOKEN_RE = re.compile(
+    r'\s*(?:(?P<string>"(?:[^"\\]|\\.)*")|(?P<number>\d+(?:\.\d+)?)'
+    r"|(?P<field>\{[^}]*\})|(?P<name>[A-Za-z_][A-Za-z0-9_]*)"
+    r"|(?P<op>!=|<=|>=|=|<|>|&|\(|\)|,))"
+)
+
+
+def _tokenize(formula):
+    tokens = []
+    position = 0
+    formula = formula.strip()
+    while position < len(formula):
+        match = TOKEN_RE.match(formula, position)
+        if not match:
+            raise FormulaError(f"Can't parse formula at {formula[position:]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        elif kind == "number":
+            value = float(value)
+        elif kind == "field":
+            value = value[1:-1]
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+def _blank(value):
+    return value is None or value == "" or value == []
+
+
+def _compare(op, left, right):
+    if op == "=":
+        return (_blank(left) and _blank(right)) or left == right
+    if op == "!=":
+        return not _compare("=", left, right)
+    if _blank(left) or _blank(right):
+        return False
+    return {
+        "<": left < right,
+        ">": left > right,
+        "<=": left <= right,
+        ">=": left >= right,
+    }[op]
+
+
+FUNCTIONS = {
+    "AND": lambda record, *args: all(args),
+    "OR": lambda record, *args: any(args),
+    "NOT": lambda record, value: not value,
+    "TRUE": lambda record: True,
+    "FALSE": lambda record: False,
+    "BLANK": lambda record: None,
+    "RECORD_ID": lambda record: record["id"],
+    "CREATED_TIME": lambda record: record["createdTime"],
+    "UPPER": lambda record, value: str(value or "").upper(),
+    "LOWER": lambda record, value: str(value or "").lower(),
+    "LEN": lambda record, value: float(len("" if _blank(value) else str(value))),
+    "REGEX_MATCH": lambda record, value, pattern: bool(
+        re.search(pattern, str(value or ""))
+    ),
+    "IS_AFTER": lambda record, a, b: not _blank(a) and a[:19] > b[:19],
+    "IS_BEFORE": lambda record, a, b: not _blank(a) and a[:19] < b[:19],
+}
+
+
+class Formula:
+    """Parses & evaluates the subset of Airtable formulas the gluecode sends"""
+
+    def __init__(self, formula):
+        self.tokens = _tokenize(formula)
+        self.position = 0
+        self.tree = self._comparison()
+        if self.position != len(self.tokens):
+            raise FormulaError(f"Unexpected {self.tokens[self.position][1]!r}")
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _take(self, value=None):
+        token = self._peek()
+        if token is None or (value is not None and token[1] != value):
+            raise FormulaError(f"Expected {value!r}, got {token!r}")
+        self.position += 1
+        return token
+
+    def _comparison(self):
+        left = self._concat()
+        token = self._peek()
+        if token and token[0] == "op" and token[1] in ("=", "!=", "<", ">", "<=", ">="):
+            self._take()
+            return ("compare", token[1], left, self._concat())
+        return left
+
+    def _concat(self):
+        node = self._primary()
+        while self._peek() == ("op", "&"):
+            self._take()
+            node = ("concat", node, self._primary())
+        return node
+
+    def _primary(self):
+        kind, value = self._take()
+        if kind in ("string", "number"):
+            return ("literal", value)
+        if kind == "field":
+            return ("field", value)
+        if kind == "op" and value == "(":
+            node = self._comparison()
+            self._take(")")
+            return node
+        if kind == "name":
+            if self._peek() != ("op", "("):
+                # bare field names like Email are allowed when they have no spaces
+                return ("field", value)
+            if value.upper() not in FUNCTIONS:
+                raise FormulaError(f"Unsupported function {value}")
+            self._take("(")
+            args = []
+            while self._peek() != ("op", ")"):
+                args.append(self._comparison())
+                if self._peek() == ("op", ","):
+                    self._take()
+            self._take(")")
+            return ("call", value.upper(), args)
+        raise FormulaError(f"Unexpected {value!r}")
+
+    def evaluate(self, record, node=None):
+        node = node or self.tree
+        kind = node[0]
+        if kind == "literal":
+            return node[1]
+        if kind == "field":
+            value = record["fields"].get(node[1])
+            return (
+                float(value)
+                if isinstance(value, int) and not isinstance(value, bool)
+                else value
+            )
+        if kind == "concat":
+            return "".join(
+                "" if _blank(value) else str(value)
+                for value in (self.evaluate(record, arg) for arg in node[1:])
+            )
+        if kind == "compare":
+            return _compare(
+                node[1], self.evaluate(record, node[2]), self.evaluate(record, node[3])
+            )
+        args = [self.evaluate(record, arg) for arg in node[2]]
+        return FUNCTIONS[node[1]](record, *args)
+
+
+def record_id():
+    return "rec" + "".join(random.choice(RECORD_ID_CHARS) for _ in range(14))
+
+
+def _field_type(values):
+    values = [v for v in values if v is not None]
+    if values and all(
+        isinstance(v, (int, float)) and not isinstance(v, bool) for v in values
+    ):
+        return "number"
+    if values and all(isinstance(v, bool) for v in values):
+        return "checkbox"
+    if values and all(isinstance(v, list) for v in values):
+        return "multipleSelects"
+    return "singleLineText"
+
+
+class MockAirtable:
+    """In-memory Airtable API on localhost, with Airtable's pagination & rate limits"""
+
+    def __init__(self, requests_per_second=5, latency=0.0, host="127.0.0.1", port=0):
+        self.requests_per_second = requests_per_second
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.tables = {}
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        self._windows = {}
+        self._failures = []
+        self._server = None
+        # filtered records per (base, table, formula), so paging through a filtered
+        # table doesn't evaluate the formula against the whole table for every page.
+        # Cleared for a table whenever it's written to, see _changed
+        self._filtered = {}
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self._server.server_port}/v0"
+
+    def start(self):
+        mock = self
+
+        class Handler(MockHandler):
+            pass
+
+        Handler.mock = mock
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def add_table(self, base, table, rows):
+        """Replace `table` in `base` with a record for each dict of fields in `rows`"""
+        created = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        records = {}
+        for fields in rows:
+            rec_id = record_id()
+            records[rec_id] = {
+                "id": rec_id,
+                "createdTime": created,
+                "fields": dict(fields),
+            }
+        with self.lock:
+            self.tables.setdefault(base, {})[table] = records
+            self._changed(base, table)
+
+    def fail_next(self, *statuses, error="SERVER_ERROR"):
+        """Answer the next requests with these statuses & an `error` type, one each"""
+        with self.lock:
+            self._failures.extend((status, error) for status in statuses)
+
+    def _next_failure(self):
+        with self.lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def _changed(self, base, table):
+        """Forget the filtered records of `table`, called with the lock held"""
+        for key in [k for k in self._filtered if k[:2] == (base, table)]:
+            del self._filtered[key]
+
+    def records(self, base, table):
+        return list(self.tables.get(base, {}).get(table, {}).values())
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = Counter()
+
+    @property
+    def request_count(self):
+        return sum(self.requests.values())
+
+    def _rate_limited(self, base):
+        """Returns seconds to wait if `base` is over its requests per second, else 0"""
+        if not self.requests_per_second:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            window_start, count = self._windows.get(base, (now, 0))
+            if now - window_start >= 1:
+                window_start, count = now, 0
+            if count >= self.requests_per_second:
+                return 1 - (now - window_start)
+            self._windows[base] = (window_start, count + 1)
+            return 0
+
+    # the handlers below return (status, body)
+
+    def list_records(self, base, table, params):
+        records = self.records(base, table)
+        formula = params.get("filterByFormula")
+        if formula:
+            cached = self._filtered.get((base, table, formula))
+            if params.get("offset") and cached is not None:
+                records = cached
+            else:
+                try:
+                    compiled = Formula(formula)
+                except FormulaError as e:
+                    return 422, {
+                        "error": {
+                            "type": "INVALID_FILTER_BY_FORMULA",
+                            "message": str(e),
+                        }
+                    }
+                records = [r for r in records if compiled.evaluate(r)]
+                with self.lock:
+                    self._filtered[(base, table, formula)] = records
+        if params.get("maxRecords"):
+            records = records[: int(params["maxRecords"])]
+        offset = int(params.get("offset") or 0)
+        page_size = min(int(params.get("pageSize") or PAGE_SIZE), PAGE_SIZE)
+        page = records[offset : offset + page_size]
+        fields = params.get("fields")
+        if fields:
+            page = [
+                {**r, "fields": {k: v for k, v in r["fields"].items() if k in fields}}
+                for r in page
+            ]
+        body = {"records": page}
+        if offset + page_size < len(records):
+            body["offset"] = str(offset + page_size)
+        return 200, body
+
+    def create_records(self, base, table, body):
+        records = body.get("records", [])
+        if len(records) > BATCH_SIZE:
+            return 422, {"error": {"type": "INVALID_RECORDS"}}
+        created = []
+        with self.lock:
+            table_records = self.tables.setdefault(base, {}).setdefault(table, {})
+            self._changed(base, table)
+            for record in records:
+                rec_id = record_id()
+                table_records[rec_id] = {
+                    "id": rec_id,
+                    "createdTime": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                    "fields": dict(record["fields"]),
+                }
+                created.append(table_records[rec_id])
+        return 200, {"records": created}
+
+    def update_records(self, base, table, body):
+        records = body.get("records", [])
+        if len(records) > BATCH_SIZE:
+            return 422, {"error": {"type": "INVALID_RECORDS"}}
+        merge_on = (body.get("performUpsert") or {}).get("fieldsToMergeOn")
+        updated = []
+        with self.lock:
+            table_records = self.tables.setdefault(base, {}).setdefault(table, {})
+            self._changed(base, table)
+            for record in records:
+                if merge_on:
+                    key = [record["fields"].get(f) for f in merge_on]
+                    match = next(
+                        (
+                            r
+                            for r in table_records.values()
+                            if [r["fields"].get(f) for f in merge_on] == key
+                        ),
+                        None,
+                    )
+                    if match is None:
+                        rec_id = record_id()
+                        match = table_records[rec_id] = {
+                            "id": rec_id,
+                            "createdTime": datetime.utcnow().strftime(
+                                "%Y-%m-%dT%H:%M:%S.000Z"
+                            ),
+                            "fields": {},
+                        }
+                else:
+                    match = table_records.get(record["id"])
+                    if match is None:
+                        return 404, {"error": "NOT_FOUND"}
+                match["fields"].update(record["fields"])
+                updated.append(match)
+        return 200, {"records": updated}
+
+    def delete_records(self, base, table, params):
+        record_ids = params.get("records[]", [])
+        if len(record_ids) > BATCH_SIZE:
+            return 422, {"error": {"type": "INVALID_RECORDS"}}
+        with self.lock:
+            table_records = self.tables.get(base, {}).get(table, {})
+            self._changed(base, table)
+            for rec_id in record_ids:
+                table_records.pop(rec_id, None)
+        return 200, {"records": [{"id": i, "deleted": True} for i in record_ids]}
+
+    def schema(self, base):
+        tables = []
+        for table, records in self.tables.get(base, {}).items():
+            names = {}
+            for record in list(records.values())[:100]:
+                for name, value in record["fields"].items():
+                    names.setdefault(name, []).append(value)
+            fields = [
+                {"name": name, "type": _field_type(values)}
+                for name, values in names.items()
+            ]
+            tables.append({"id": table, "name": table, "fields": fields})
+        return 200, {"tables": tables}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    mock = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            data = gzip.compress(data, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [unquote(p) for p in url.path.strip("/").split("/")]
+        body = self._body() if method in ("POST", "PATCH") else {}
+        if parts[:2] == ["v0", "meta"]:
+            base = parts[3]
+        else:
+            base = parts[1]
+        self.mock.requests[method] += 1
+        if self.mock.latency:
+            time.sleep(self.mock.latency)
+        wait = self.mock._rate_limited(base)
+        if wait:
+            self.mock.requests["429"] += 1
+            return self._respond(
+                429,
+                {"errors": [{"error": "RATE_LIMIT_REACHED"}]},
+                {"Retry-After": f"{wait:.3f}"},
+            )
+        failure = self.mock._next_failure()
+        if failure:
+            status, error = failure
+            return self._respond(status, {"error": {"type": error}})
+        if parts[:2] == ["v0", "meta"]:
+            return self._respond(*self.mock.schema(base))
+        table = parts[2]
+        if method == "GET":
+            params = {k: v[0] for k, v in query.items() if k != "fields[]"}
+            params["fields"] = query.get("fields[]")
+            return self._respond(*self.mock.list_records(base, table, params))
+        if method == "POST" and parts[3:] == ["listRecords"]:
+            return self._respond(*self.mock.list_records(base, table, body))
+        if method == "POST":
+            return self._respond(*self.mock.create_records(base, table, body))
+        if method == "PATCH":
+            return self._respond(*self.mock.update_records(base, table, body))
+        if method == "DELETE":
+            return self._respond(*self.mock.delete_records(base, table, query))
+        return self._respond(404, {"error": "NOT_FOUND"})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+class FakeWorksheet:
+    """The parts of gspread.Worksheet used by glue.sheet_diff & glue.sheet_writer"""
+
+    def __init__(self, id, title, counter):
+        self.id = id
+        self.title = title
+        self.values = []
+        self.counter = counter
+
+    def get_all_values(self):
+        self.counter["reads"] += 1
+        return [list(row) for row in self.values]
+
+    def resize(self, rows=None, cols=None):
+        self.counter["writes"] += 1
+        if rows is not None:
+            self.values = self.values[:rows]
+
+    def write(self, row, col, values):
+        for r, line_values in enumerate(values, start=row - 1):
+            while len(self.values) <= r:
+                self.values.append([])
+            line = self.values[r]
+            while len(line) < col - 1 + len(line_values):
+                line.append("")
+            line[col - 1 : col - 1 + len(line_values)] = line_values
+        self.counter["cells"] += sum(len(v) for v in values)
+
+    def batch_update(self, updates, value_input_option=None):
+        from gspread.utils import a1_to_rowcol
+
+        self.counter["writes"] += 1
+        for update in updates:
+            self.write(*a1_to_rowcol(update["range"].split(":")[0]), update["values"])
+
+
+class FakeSpreadsheet:
+    """Stands in for gspread.Spreadsheet, keeping every tab written in memory.
+
+    Tabs are shared between instances through the class attribute `sheets`, keyed by
+    (spreadsheet key, tab name), and `counter` counts reads, writes & cells written
+    """
+
+    sheets = {}
+    counter = Counter()
+    sheet_ids = itertools.count(1)
+
+    def __init__(self, key, config=None):
+        self.key = key
+
+    def _tabs(self):
+        return {
+            title: sheet
+            for (key, title), sheet in self.sheets.items()
+            if key == self.key
+        }
+
+    def worksheets(self):
+        self.counter["reads"] += 1
+        return list(self._tabs().values())
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        self.counter["writes"] += 1
+        sheet = FakeWorksheet(next(self.sheet_ids), title, self.counter)
+        self.sheets[(self.key, title)] = sheet
+        return sheet
+
+    def del_worksheet(self, worksheet):
+        self.counter["writes"] += 1
+        del self.sheets[(self.key, worksheet.title)]
+
+    def values_update(self, range, params=None, body=None):
+        from gspread.utils import a1_to_rowcol
+
+        self.counter["writes"] += 1
+        title, _, start = range.rpartition("!")
+        self.sheets[(self.key, title.strip("'"))].write(
+            *a1_to_rowcol(start), body["values"]
+        )
+
+    def batch_update(self, body):
+        """Applies the swap requests (see glue.sheet_writer) to the in-memory tabs"""
+        self.counter["writes"] += 1
+        by_id = {sheet.id: sheet for sheet in self._tabs().values()}
+        for request in body["requests"]:
+            if "updateSheetProperties" in request:
+                properties = request["updateSheetProperties"]["properties"]
+                sheet = by_id[properties["sheetId"]]
+                sheet.values = sheet.values[: properties["gridProperties"]["rowCount"]]
+            elif "copyPaste" in request:
+                source = by_id[request["copyPaste"]["source"]["sheetId"]]
+                destination = by_id[request["copyPaste"]["destination"]["sheetId"]]
+                destination.values = [list(row) for row in source.values]
+            elif "deleteSheet" in request:
+                sheet = by_id[request["deleteSheet"]["sheetId"]]
+                del self.sheets[(self.key, sheet.title)]
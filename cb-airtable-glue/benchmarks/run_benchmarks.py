@@ -0,0 +1,234 @@
+"""Benchmarks the main Airtable & Google Sheets paths against the local mock (see
+mock_airtable.py).
+
+For each table size, measures load_table, sync_table, get_person_email_map,
+sync_airtable_to_sheets & LOOKUPS lookups by field, one at a time & concurrently with
+AsyncAirtable, reporting the requests made to the mock Airtable API (and how many of
+them were rate limited), wall time & peak Python memory (traced with tracemalloc, which
+slows down CPU-bound code, so compare wall times between runs made with the same
+options).
+
+The mock enforces Airtable's 5 requests per second per base by default, so wall times at
+large sizes are dominated by the rate limit, like they are in production. Pass e.g.
+`--rate 1000` to measure the gluecode's own overhead instead.
+
+Usage (from the cb-airtable-glue directory):
+    python benchmarks/run_benchmarks.py [--sizes 1000,10000,100000] [--rate 5] \
+        [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.dirname(os.path.abspath(__file__))]
+
+from mock_airtable import FakeSpreadsheet, MockAirtable  # noqa: E402
+
+BASE = "appBenchmark00000"
+SHEET_KEY = "benchmark-spreadsheet"
+STATUSES = ["Active", "Inactive", "Pending", "Lapsed", "Prospect"]
+SIZES = [1000, 10000, 100000]
+LOOKUPS = 50
+
+
+def records_rows(size):
+    random.seed(size)
+    return [
+        {
+            "ID": i,
+            "Name": f"Record {i}",
+            "Amount": round(random.uniform(5, 500), 2),
+            "Status": random.choice(STATUSES),
+            "Notes": "lorem ipsum dolor sit amet " * random.randint(0, 8),
+            "Tags": random.sample(STATUSES, 2),
+        }
+        for i in range(size)
+    ]
+
+
+def people_rows(size):
+    return [
+        {
+            "Name": f"Person {i}",
+            "Email": f"person{i}@example.org",
+            "Email 2": f"person{i}@work.example.org" if i % 5 == 0 else None,
+        }
+        for i in range(size)
+    ]
+
+
+def incoming_records(size):
+    """Records from "another system": the table's rows with 10% changed & 1% new"""
+    rows = records_rows(size)
+    for row in rows[::10]:
+        row["Amount"] = round(row["Amount"] + 1, 2)
+    rows.extend(
+        {"ID": size + i, "Name": f"Record {size + i}", "Amount": 1.0, "Status": "New"}
+        for i in range(max(size // 100, 1))
+    )
+    for row in rows:
+        row.pop("Tags", None)
+        row.pop("Notes", None)
+    return rows
+
+
+def benchmarks(glue, rate):
+    """Returns {name: (setup(mock, size), run(size))} for each benchmark"""
+    airtable, airtable_to_sheets, airtable_async, sheet_writer = glue
+
+    def setup_records(mock, size):
+        mock.add_table(BASE, "Records", records_rows(size))
+
+    def setup_people(mock, size):
+        mock.add_table(BASE, "People", people_rows(size))
+        airtable.invalidate_person_email_index()
+
+    def setup_sheets(mock, size):
+        setup_records(mock, size)
+        FakeSpreadsheet.sheets.clear()
+        # forget the tabs the writer cached when the last size was written
+        sheet_writer._writers.clear()
+
+    def run_sync_table(size):
+        airtable.sync_table(incoming_records(size), "Records", id_field="ID", base=BASE)
+
+    def run_sheets(size):
+        airtable_to_sheets.sync_airtable_to_sheets(
+            gspread_config={},
+            spreadsheet_key=SHEET_KEY,
+            base=BASE,
+            table="Records",
+            skip_unchanged=False,
+        )
+
+    def lookup_values(size):
+        return [f"Record {i}" for i in range(0, size, max(size // LOOKUPS, 1))][
+            :LOOKUPS
+        ]
+
+    def run_lookups(size):
+        for value in lookup_values(size):
+            airtable.get_record_by_field(BASE, "Records", "Name", value)
+
+    def run_async_lookups(size):
+        async def main():
+            async with airtable_async.AsyncAirtable(requests_per_second=rate) as client:
+                await client.get_records_by_field(
+                    BASE, "Records", "Name", lookup_values(size)
+                )
+
+        asyncio.run(main())
+
+    return {
+        "load_table": (
+            setup_records,
+            lambda size: airtable.load_table(BASE, "Records"),
+        ),
+        "sync_table": (setup_records, run_sync_table),
+        "get_person_email_map": (
+            setup_people,
+            lambda size: airtable.get_person_email_map(),
+        ),
+        "sync_airtable_to_sheets": (setup_sheets, run_sheets),
+        "get_record_by_field": (setup_records, run_lookups),
+        "async get_records_by_field": (setup_records, run_async_lookups),
+    }
+
+
+def measure(mock, run, size, trace_memory=True):
+    mock.reset_stats()
+    FakeSpreadsheet.counter.clear()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    run(size)
+    wall = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+    if trace_memory:
+        tracemalloc.stop()
+    return {
+        "requests": mock.request_count - mock.requests["429"],
+        "rate_limited": mock.requests["429"],
+        "sheet_writes": FakeSpreadsheet.counter["writes"],
+        "seconds": round(wall, 3),
+        "peak_mb": round(peak / 1024 / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(str(s) for s in SIZES))
+    parser.add_argument("--benchmarks", help="comma separated benchmarks to run")
+    parser.add_argument(
+        "--rate", type=float, default=5, help="requests per second allowed per base"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to every request"
+    )
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    mock = MockAirtable(requests_per_second=args.rate, latency=args.latency).start()
+    # configure the gluecode before it's imported, since it reads these at import time
+    os.environ.update(
+        AIRTABLE_API_URL=mock.url,
+        AIRTABLE_KEY="benchmark",
+        AIRTABLE_BASE=BASE,
+        GLUE_STATE_STORE="file",
+        GLUE_STATE_DIR=tempfile.mkdtemp(prefix="glue-benchmark-"),
+    )
+    from glue import (
+        airtable,
+        airtable_async,
+        airtable_client,
+        airtable_to_sheets,
+        sheet_writer,
+    )
+
+    airtable_client._client = airtable_client.AirtableClient(
+        requests_per_second=args.rate
+    )
+    sheet_writer.open_spreadsheet = FakeSpreadsheet
+
+    selected = benchmarks(
+        (airtable, airtable_to_sheets, airtable_async, sheet_writer), args.rate
+    )
+    if args.benchmarks:
+        selected = {name: selected[name] for name in args.benchmarks.split(",")}
+
+    results = []
+    print(
+        f"{'benchmark':<26}{'records':>9}{'requests':>10}{'429s':>6}"
+        f"{'sheet writes':>14}{'seconds':>10}{'peak MB':>9}"
+    )
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for name, (setup, run) in selected.items():
+            setup(mock, size)
+            result = {
+                "benchmark": name,
+                "records": size,
+                **measure(mock, run, size, not args.no_memory),
+            }
+            results.append(result)
+            print(
+                f"{name:<26}{size:>9}{result['requests']:>10}"
+                f"{result['rate_limited']:>6}{result['sheet_writes']:>14}"
+                f"{result['seconds']:>10}{result['peak_mb']:>9}"
+            )
+    mock.stop()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,62 @@
 """Basic functions to connect to Airtable & read / write data"""
 
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from itertools import zip_longest
+from urllib.parse import quote
 
 import requests
 
-from glue.constants import AIRTABLE_BASE, AIRTABLE_KEY
+from glue.airtable_client import AirtableError, get_client
+from glue.checkpoint import Checkpoint, DeadlineExceeded, get_deadline
+from glue.constants import AIRTABLE_BASE, PEOPLE_MODIFIED_FIELD
+from glue.fingerprint import ChangeIndex, get_table_schema
+from glue.jobs import current_job
+from glue.mirror import get_mirror, lookup_key
+from glue.state import get_state_store, warn_if_ephemeral
+
+# Airtable rejects URLs over 16,000 characters, longer formulas are POSTed to
+# listRecords instead
+MAX_URL_FORMULA_LENGTH = 10000
+# values packed into each OR() formula by get_records_by_field_values
+VALUES_PER_LOOKUP = 50
+
+PERSON_EMAIL_FIELDS = ["Email", "Email 2", "Email 3"]
+# how long the People email index is reused before it's reloaded
+PERSON_EMAIL_INDEX_TTL = 15 * 60
+
+# incremental loads fall back to a full reload once a day, since deleted records and
+# records that no longer match the formula or view can't be seen in the changes since
+# the last load
+SNAPSHOT_MAX_AGE = 24 * 60 * 60
+
+# fields to request from a table by default, pinned with set_field_projection, keyed by
+# (base, table)
+FIELD_PROJECTIONS = {}
+
+# characters record IDs are made of, split into ranges to partition a table by
+# RECORD_ID()
+RECORD_ID_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+# partitioned loads default to one slice per request Airtable allows each second
+PARTITIONS = 5
+
+
+class BatchWriteError(Exception):
+    """Raised when one or more batches failed to write to Airtable.
+
+    `failures` holds a dict for each failed batch with the `records` it contained and
+    the `error` raised, and `record_id_map` holds the results of the batches that did
+    succeed, if any
+    """
+
+    def __init__(self, failures, record_id_map=None):
+        super().__init__(f"{len(failures)} batch(es) failed to write to Airtable")
+        self.failures = failures
+        self.record_id_map = record_id_map
 
 
 def grouper(iterable, n, fillvalue=None):
@@ -43,125 +95,804 @@ def diff_fields(obj, airtable):
     return False
 
 
-def sync_table(records, table, id_field="ID", base=AIRTABLE_BASE):
+def set_field_projection(base, table, fields):
+    """Pin the fields requested from `table` by sync_table & lookups that don't pass
+    `fields`, e.g. to avoid downloading long text & attachment fields the gluecode never
+    reads. Pass None to request every field again
+    """
+    if fields is None:
+        FIELD_PROJECTIONS.pop((base, table), None)
+    else:
+        FIELD_PROJECTIONS[(base, table)] = list(fields)
+
+
+def sync_fields(records, table, id_field, base, fields=None):
+    """Fields sync_table needs to load to diff `records` against `table`: the fields
+    being synced & `id_field`, plus any pinned (or given) `fields`. Fields the table's
+    schema doesn't have are left out, since Airtable rejects requests for unknown fields
+    """
+    needed = {id_field}
+    for record in records:
+        needed.update(record.keys())
+    needed.update(fields or FIELD_PROJECTIONS.get((base, table), []))
+    schema = get_table_schema(base, table)
+    if schema:
+        needed = {field for field in needed if field in schema}
+    return sorted(needed)
+
+
+def sync_table(
+    records,
+    table,
+    id_field="ID",
+    base=AIRTABLE_BASE,
+    upsert=False,
+    modified_field=None,
+    fields=None,
+    job=None,
+):
     """Sync Airtable table with records from another system.
 
-       Returns a dict that maps the primary key values from both systems to the Airtable record ID
+       Returns a dict that maps the primary key values from both systems to the Airtable
+       record ID. Raises BatchWriteError after all batches have been attempted if any of
+       them failed
+
+       With `upsert` set, the records are upserted by Airtable using `id_field` as the
+       merge key instead of diffing them against the whole table, so only the incoming
+       records are requested & the returned map only covers the incoming records
+
+       With `modified_field` set, the table is loaded incrementally, see load_table
+
+       Only the fields being synced & `id_field` are loaded from the table, along with
+       any `fields` given or pinned for the table with set_field_projection
+
+       If the invocation's deadline passes (see glue.checkpoint), DeadlineExceeded is
+       raised between pages or batches, with progress saved in checkpoints under
+       "checkpoints/sync/{job}/{base}/{table}", `job` defaulting to the job run_jobs is
+       running (see glue.jobs), so jobs syncing the same table keep their own. A stopped
+       load of the table resumes from the page it stopped at & a stopped upsert from the
+       batch it stopped at. Records created or updated before the deadline are found in
+       Airtable by the next run's diff, so a stopped sync resumes with only the records
+       it hadn't written yet
     """
-    airtable_records = load_table(base, table)
-    airtable_pk_map = {
-        r["fields"][id_field]: r for r in airtable_records if id_field in r["fields"]
-    }
+    job = job or current_job()
+    key = "/".join(filter(None, ["checkpoints/sync", job, base, table]))
+    # load checkpoints are saved after every page, more often than SSM allows
+    store = get_state_store(large=True)
+    if upsert:
+        return _upsert_table(
+            records, table, id_field, base, Checkpoint(f"{key}/upsert", store)
+        )
+    index = _load_index(
+        records,
+        table,
+        id_field,
+        base,
+        sync_fields(records, table, id_field, base, fields),
+        modified_field,
+        Checkpoint(f"{key}/load", store),
+    )
     # records from the other system that don't exist in Airtable
-    records_to_create = [r for r in records if r[id_field] not in airtable_pk_map]
+    records_to_create = [r for r in records if r[id_field] not in index]
     # records that exist in both systems but have been modified in the other system
     records_to_update = [
-        r
-        for r in records
-        if r[id_field] in airtable_pk_map
-        and diff_fields(r, airtable_pk_map[r[id_field]])
+        r for r in records if r[id_field] in index and index.changed(r)
     ]
-    created_records = create_batch_records(base, table, records_to_create)
-    for record in records_to_update:
-        create_update_record(
-            base, table, record, update_id=airtable_pk_map[record[id_field]]["id"]
+    failures = []
+    created_records = create_batch_records(
+        base, table, records_to_create, failures=failures
+    )
+    update_batch_records(
+        base,
+        table,
+        [{"id": index.record_id(r[id_field]), "fields": r} for r in records_to_update],
+        failures=failures,
+    )
+    record_id_map = index.record_id_map()
+    for record in created_records:
+        if record.get("fields"):
+            record_id_map[record["fields"][id_field]] = record["id"]
+    _raise_for_failures(failures, table, record_id_map)
+    return record_id_map
+
+
+def _load_index(records, table, id_field, base, fields, modified_field, checkpoint):
+    """Index `table` by primary key & a hash of the fields being synced, rather than
+    holding every Airtable record in memory to compare `records` against.
+
+    When the deadline stops the load, the index so far is saved in `checkpoint` along
+    with the offset of the next page, and the next run picks up from there. A load
+    stopped any other way leaves only an offset, so the next run starts over
+    """
+    state = dict(checkpoint.state)
+    checkpoint.clear()
+    saved = state.get("index")
+    index = ChangeIndex(
+        records,
+        id_field,
+        get_table_schema(base, table) or (saved and saved["field_types"]),
+    )
+    # a saved index is only valid for the fields it hashed
+    if saved and index.matches(saved):
+        print(f"Resuming the load of {table} from the last run")
+        checkpoint.update(offset=state["offset"], resumed=True)
+    else:
+        saved = None
+    try:
+        index.load(
+            iter_table(
+                base,
+                table,
+                fields=fields,
+                modified_field=modified_field,
+                # incremental loads resume from their own snapshot instead
+                checkpoint=None if modified_field else checkpoint,
+            )
         )
+    except DeadlineExceeded:
+        if checkpoint.get("offset"):
+            # iter_pages clears the checkpoint if the load had to restart
+            if saved and checkpoint.get("resumed"):
+                index.restore(saved)
+            checkpoint.update(index=index.save())
+        raise
+    if saved and checkpoint.get("resumed"):
+        index.restore(saved)
+    checkpoint.clear()
+    return index
+
+
+def _raise_for_failures(failures, table, record_id_map):
+    """Print & raise any batches that failed while syncing `table`"""
+    if not failures:
+        return
+    for failure in failures:
+        print(
+            f"Error syncing {len(failure['records'])} records to {table}: "
+            f"{failure['error']}"
+        )
+    raise BatchWriteError(failures, record_id_map)
+
+
+def _upsert_table(records, table, id_field, base, checkpoint=None):
+    """Upsert `records` by `id_field`, mapping their primary keys to record IDs"""
+    failures = []
+    upserted_records = upsert_batch_records(
+        base, table, records, [id_field], failures=failures, checkpoint=checkpoint
+    )
     record_id_map = {
         r["fields"][id_field]: r["id"]
-        for r in airtable_records
-        if id_field in r["fields"]
+        for r in upserted_records
+        if id_field in r.get("fields", {})
     }
-    for record in created_records:
-        if record.get("fields"):
-            record_id_map[record["fields"][id_field]] = record["id"]
+    _raise_for_failures(failures, table, record_id_map)
     return record_id_map
 
 
-def load_table(base, table, formula=None, view=None, fields: list = None, max_records=None):
-    """Load all records from Airtable table with optional formula filter"""
-    offset = ""
-    has_offset = True
-    records = []
-
-    while has_offset:
-        url = f"https://api.airtable.com/v0/{base}/{table}?pageSize=100"
-        if max_records:
-            url += f"&maxRecords={max_records}"
-        if view:
-            url += f"&view={view}"
-        if formula:
-            url += f"&filterByFormula={formula}"
-        if fields:
-            # convoluted code to accomplish URL encoding of field names supplied to function as a list, 
-            # as well as strange query parameter syntax required by Airtable API, see following links:
-            # - https://airtable.com/developers/web/api/list-records#query-fields
-            # - https://community.airtable.com/t5/development-apis/using-the-quot-fields-quot-query-parameter-in-appgyver/td-p/67817
-            # - https://codepen.io/airtable/full/MeXqOg
-            url += "&fields%5B%5D="+"&fields%5B%5D=".join(list(map(requests.utils.quote, fields))) 
+def iter_pages(
+    base,
+    table,
+    formula=None,
+    view=None,
+    fields: list = None,
+    max_records=None,
+    checkpoint=None,
+):
+    """Yield pages of up to 100 records from Airtable table as they're loaded, with
+    optional formula filter
+
+    Formulas too long to fit in a URL are sent in the body of a POST to the listRecords
+    endpoint. With a `checkpoint` (see glue.checkpoint), the offset of the next page is
+    saved once each page has been processed, and a resumed load continues from the saved
+    offset. If that offset has expired before any page was loaded, the checkpoint is
+    cleared & the load starts over. Raises DeadlineExceeded instead of requesting
+    another page once the invocation's deadline has passed
+    """
+    use_post = formula and len(quote(formula)) > MAX_URL_FORMULA_LENGTH
+    params = {"pageSize": 100}
+    if max_records:
+        params["maxRecords"] = max_records
+    if view:
+        params["view"] = view
+    if formula:
+        params["filterByFormula"] = formula
+    if fields:
+        # Airtable expects a separate "fields[]" parameter for each field in GET
+        # requests, see:
+        # - https://airtable.com/developers/web/api/list-records#query-fields
+        # - https://codepen.io/airtable/full/MeXqOg
+        params["fields" if use_post else "fields[]"] = fields
+    offset = checkpoint.get("offset") if checkpoint else None
+    resuming = bool(offset)
+
+    while True:
+        get_deadline().check()
         if offset:
-            url += f"&offset={offset}"
-        res = requests.get(url, headers={"Authorization": f"Bearer {AIRTABLE_KEY}"})
-        data = res.json()
-        records.extend(data["records"])
-        if "offset" in data:
-            offset = data["offset"]
-        else:
-            has_offset = False
+            params["offset"] = offset
+        try:
+            if use_post:
+                data = get_client().post(base, f"{table}/listRecords", json=params)
+            else:
+                data = get_client().get(base, table, params=params)
+        except AirtableError as e:
+            # offsets expire after a while, so a load resumed much later has to start
+            # over. Once pages have been yielded, starting over would yield their
+            # records twice
+            if not resuming or "LIST_RECORDS_ITERATOR_NOT_AVAILABLE" not in str(e):
+                raise
+            print(f"Offset for {table} expired, loading it from the start")
+            checkpoint.clear()
+            offset = None
+            resuming = False
+            params.pop("offset")
+            continue
+        resuming = False
+        yield data["records"]
+        offset = data.get("offset")
+        if checkpoint:
+            checkpoint.update(offset=offset)
+        if not offset:
+            break
+
+
+def iter_table(
+    base,
+    table,
+    formula=None,
+    view=None,
+    fields: list = None,
+    max_records=None,
+    modified_field=None,
+    store=None,
+    checkpoint=None,
+):
+    """Yield records from Airtable table as pages are loaded, so only one page is held
+    in memory.
+
+    Incremental loads (see load_table) yield from the merged snapshot instead. A
+    `checkpoint` resumes the load from the page after the last one processed, see
+    iter_pages
+    """
+    if modified_field:
+        yield from load_table(
+            base,
+            table,
+            formula=formula,
+            view=view,
+            fields=fields,
+            modified_field=modified_field,
+            store=store,
+        )
+        return
+    for page in iter_pages(
+        base,
+        table,
+        formula=formula,
+        view=view,
+        fields=fields,
+        max_records=max_records,
+        checkpoint=checkpoint,
+    ):
+        yield from page
+
+
+def load_table(
+    base,
+    table,
+    formula=None,
+    view=None,
+    fields: list = None,
+    max_records=None,
+    modified_field=None,
+    store=None,
+):
+    """Load all records from Airtable table with optional formula filter
+
+    With `modified_field` set to the name of a "Last modified time" field, the table is
+    loaded incrementally: only records modified since the previous load are requested,
+    and they're merged into a snapshot of the table persisted in `store` (or the state
+    store for large values)
+    """
+    if modified_field:
+        if store is None:
+            warn_if_ephemeral("incremental load snapshots", large=True)
+        return _load_table_incremental(
+            base,
+            table,
+            formula,
+            view,
+            fields,
+            modified_field,
+            # the watermark is kept with the snapshot, since it's only valid with it
+            store or get_state_store(large=True),
+        )
+    return list(
+        iter_table(
+            base,
+            table,
+            formula=formula,
+            view=view,
+            fields=fields,
+            max_records=max_records,
+        )
+    )
+
+
+def _snapshot_key(base, table, formula, view, fields):
+    """Key for a table's snapshot, distinct for each formula, view & fields"""
+    key = f"airtable/{base}/{table}"
+    if formula or view or fields:
+        query = json.dumps([formula, view, sorted(fields or [])])
+        key += f"/{hashlib.sha1(query.encode()).hexdigest()[:12]}"
+    return key
+
+
+def modified_since_formula(modified_field, watermark, formula=None):
+    """Formula matching records whose `modified_field` is after the `watermark`
+    timestamp, combined with an optional `formula`
+    """
+    # step back a second so records modified in the same second as the watermark aren't
+    # missed, re-fetching a record that's already been loaded is harmless
+    since = datetime.strptime(watermark[:19], "%Y-%m-%dT%H:%M:%S")
+    since -= timedelta(seconds=1)
+    since_formula = f'IS_AFTER({{{modified_field}}}, "{dt_format(since)}")'
+    if formula:
+        return f"AND({formula}, {since_formula})"
+    return since_formula
+
+
+def _load_table_incremental(base, table, formula, view, fields, modified_field, store):
+    """Merge records modified since the last load's watermark into the snapshot"""
+    key = _snapshot_key(base, table, formula, view, fields)
+    snapshot = store.get(f"{key}/snapshot")
+    watermark = store.get(f"{key}/watermark")
+    if fields and modified_field not in fields:
+        fields = [*fields, modified_field]
+
+    if (
+        snapshot is None
+        or watermark is None
+        or time.time() - snapshot["loaded_at"] > SNAPSHOT_MAX_AGE
+    ):
+        changed_records = load_table(
+            base, table, formula=formula, view=view, fields=fields
+        )
+        snapshot = {"loaded_at": time.time(), "records": changed_records}
+    else:
+        changed_records = load_table(
+            base,
+            table,
+            formula=modified_since_formula(modified_field, watermark, formula),
+            view=view,
+            fields=fields,
+        )
+        merged_records = {r["id"]: r for r in snapshot["records"]}
+        merged_records.update({r["id"]: r for r in changed_records})
+        snapshot["records"] = list(merged_records.values())
+
+    modified_times = [
+        r["fields"][modified_field]
+        for r in changed_records
+        if r["fields"].get(modified_field)
+    ]
+    watermark = max(modified_times + ([watermark] if watermark else []), default=None)
+    store.set(f"{key}/snapshot", snapshot)
+    if watermark:
+        store.set(f"{key}/watermark", watermark)
+    return snapshot["records"]
+
+
+def partition_formulas(partitions=PARTITIONS, partition_field=None, bounds=None):
+    """Formulas splitting a table into disjoint slices that together cover every record.
+
+    By default records are split into `partitions` slices by the last character of their
+    record ID, which is evenly distributed. With a `partition_field` (e.g. an autonumber
+    or created time field) & sorted `bounds`, there's a slice for each range between
+    consecutive bounds, plus one for values below the first bound (or blank) & one for
+    values from the last bound on
+    """
+    if partition_field is None:
+        # the first `extra` slices take one more character so there are exactly
+        # `partitions` of them
+        size, extra = divmod(len(RECORD_ID_CHARS), partitions)
+        starts = [i * size + min(i, extra) for i in range(partitions + 1)]
+        return [
+            f'REGEX_MATCH(RECORD_ID(), "[{RECORD_ID_CHARS[start:end]}]$")'
+            for start, end in zip(starts, starts[1:])
+        ]
+
+    field = f"{{{partition_field}}}"
+
+    def before(bound):
+        if isinstance(bound, datetime):
+            return f'IS_BEFORE({field}, "{dt_format(bound)}")'
+        return f"{field} < {formula_value(bound)}"
+
+    # `= BLANK()` also matches 0 in number fields, so check for an empty value instead.
+    # Blanks go in the first slice only, whatever comparing them to a bound gives
+    blank = f'LEN({field} & "") = 0'
+    formulas = [f"OR({blank}, {before(bounds[0])})"]
+    for lower, upper in zip(bounds, bounds[1:]):
+        formulas.append(f"AND(NOT({before(lower)}), {before(upper)})")
+    formulas.append(f"AND(NOT({blank}), NOT({before(bounds[-1])}))")
+    return formulas
+
+
+def load_table_partitioned(
+    base,
+    table,
+    formula=None,
+    view=None,
+    fields: list = None,
+    partitions=PARTITIONS,
+    partition_field=None,
+    bounds=None,
+    dedup=True,
+    ordered=False,
+    max_workers=None,
+):
+    """Load all records from Airtable table by paging through disjoint slices of it
+    concurrently.
+
+    Each slice (see partition_formulas) is filtered with its own formula, combined with
+    the optional `formula`, and paged through in parallel with the others, all within
+    the base's rate limit, so a large table loads in roughly 1 / `partitions` of the
+    round trips.
+
+    Args:
+        base (str): Airtable base key
+        table (str): Airtable table name or ID
+        formula (str, optional): formula filter applied to every slice. Defaults to
+            None.
+        view (str, optional): view name or ID. Defaults to None.
+        fields (list, optional): field names or IDs to load. Defaults to None, all
+            fields.
+        partitions (int, optional): number of record ID slices. Defaults to PARTITIONS.
+        partition_field (str, optional): field to partition by instead of record ID.
+            Defaults to None.
+        bounds (list, optional): sorted values of `partition_field` separating the
+            slices.
+        dedup (bool, optional): drop records loaded by more than one slice. Defaults to
+            True.
+        ordered (bool, optional): sort records by creation time, the order load_table
+            returns them in when no view is given. Defaults to False, records grouped by
+            slice.
+        max_workers (int, optional): slices loaded at once. Defaults to one per slice.
+
+    Returns:
+        list: records loaded from every slice
+    """
+    if partition_field is not None and not bounds:
+        raise ValueError("bounds are required to partition by a field")
+    slices = [
+        f"AND({formula}, {slice_formula})" if formula else slice_formula
+        for slice_formula in partition_formulas(partitions, partition_field, bounds)
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers or len(slices)) as executor:
+        results = executor.map(
+            lambda slice_formula: load_table(
+                base, table, formula=slice_formula, view=view, fields=fields
+            ),
+            slices,
+        )
+        records = [record for slice_records in results for record in slice_records]
+    if dedup:
+        records = list({record["id"]: record for record in records}.values())
+    if ordered:
+        records.sort(key=lambda record: (record.get("createdTime", ""), record["id"]))
     return records
 
 
-def create_batch_records(base, table, records):
+def _write_batches(
+    method, base, table, records, failures, build_record, body=None, checkpoint=None
+):
+    """Send `records` to Airtable's batch API in groups of 10, returning the records in
+    the responses.
+
+    Any keys in `body` are sent along with each batch of records. If a `failures` list
+    is supplied, failed batches are appended to it and the remaining batches are still
+    attempted, otherwise the first failure is raised.
+
+    Raises DeadlineExceeded between batches once the invocation's deadline has passed.
+    With a `checkpoint`, the number of batches written is saved when the deadline stops
+    the writes, and a later run given the same records skips those batches. Only
+    upserts are checkpointed: records created or updated before a stop are left out of
+    the next run's diff, so its records never match
+    """
+    written_batches = 0
+    if checkpoint:
+        digest = hashlib.sha1(
+            json.dumps(records, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        if checkpoint.get("records") == digest:
+            written_batches = checkpoint.get("batches", 0)
+            print(f"Resuming writes to {table} after {written_batches} batches")
+    skipped_batches = written_batches
+    written_records = []
+    failed = False
+    for batch_number, record_group in enumerate(grouper(records, 10)):
+        if batch_number < skipped_batches:
+            continue
+        try:
+            get_deadline().check()
+        except DeadlineExceeded:
+            if checkpoint:
+                checkpoint.update(records=digest, batches=written_batches)
+            raise
+        batch = [rec for rec in record_group if rec]
+        try:
+            res = get_client().request(
+                method,
+                base,
+                table,
+                json={**(body or {}), "records": [build_record(r) for r in batch]},
+            )
+            res_data = res.json()
+        except (AirtableError, requests.RequestException) as e:
+            if failures is None:
+                raise
+            failures.append({"records": batch, "error": e})
+            failed = True
+            continue
+        # only count batches up to the first failure, so a resumed run retries them
+        if not failed:
+            written_batches = batch_number + 1
+        written_records.extend(res_data.get("records", []))
+        mirror = get_mirror()
+        if mirror:
+            mirror.write_through(base, table, res_data.get("records", []))
+    if checkpoint and checkpoint.state:
+        # all attempted, so writing the same records again isn't mistaken for a resume
+        checkpoint.clear()
+    return written_records
+
+
+def create_batch_records(base, table, records, failures=None):
     """Create records in batches of size 10 with Airtable's batch API"""
-    req_url = f"https://api.airtable.com/v0/{base}/{table}"
-    created_records = []
-    for record_group in grouper(records, 10):
-        res = requests.post(
-            req_url,
-            headers={"Authorization": f"Bearer {AIRTABLE_KEY}"},
-            json={"records": [{"fields": rec} for rec in record_group if rec]},
-        )
-        res_data = res.json()
-        created_records.extend(res_data.get("records", []))
-    return created_records
+    return _write_batches(
+        "POST", base, table, records, failures, lambda rec: {"fields": rec}
+    )
+
+
+def update_batch_records(base, table, records, failures=None):
+    """Update records in batches of size 10 with Airtable's batch API.
+
+    Each record is a dict with the Airtable record `id` and the `fields` to update
+    """
+    return _write_batches(
+        "PATCH",
+        base,
+        table,
+        records,
+        failures,
+        lambda rec: {"id": rec["id"], "fields": rec["fields"]},
+    )
+
+
+def upsert_batch_records(
+    base, table, records, merge_on, failures=None, checkpoint=None
+):
+    """Upsert records in batches of size 10 with Airtable's batch API.
+
+    Records whose `merge_on` field values match an existing record update it, all others
+    are created. Returns the upserted records, see
+    https://airtable.com/developers/web/api/update-multiple-records
+    """
+    return _write_batches(
+        "PATCH",
+        base,
+        table,
+        records,
+        failures,
+        lambda rec: {"fields": rec},
+        body={"performUpsert": {"fieldsToMergeOn": merge_on}},
+        checkpoint=checkpoint,
+    )
 
 
 def delete_batch_records(base, table, records):
     """Delete records in batches of size 10 with Airtable's batch API"""
-    req_url = f"https://api.airtable.com/v0/{base}/{table}"
+    mirror = get_mirror()
     for record_group in grouper(records, 10):
-        requests.delete(
-            req_url,
-            headers={"Authorization": f"Bearer {AIRTABLE_KEY}"},
-            params={"records[]": [rec["id"] for rec in record_group if rec]},
-        )
+        record_ids = [rec["id"] for rec in record_group if rec]
+        get_client().delete(base, table, params={"records[]": record_ids})
+        if mirror:
+            mirror.delete_through(base, table, record_ids)
 
 
 def create_update_record(base, table, data, update_id=None):
     """Create or update an Airtable record based on whether update_id is set"""
-    req = requests.patch if update_id else requests.post
-    req_url = f"https://api.airtable.com/v0/{base}/{table}"
     if update_id:
-        req_url += f"/{update_id}"
-    res = req(
-        req_url,
-        headers={"Authorization": f"Bearer {AIRTABLE_KEY}"},
-        json={"fields": data},
-    )
-    return res.json()
+        record = get_client().patch(base, f"{table}/{update_id}", json={"fields": data})
+    else:
+        record = get_client().post(base, table, json={"fields": data})
+    mirror = get_mirror()
+    if mirror:
+        mirror.write_through(base, table, [record])
+    if base == AIRTABLE_BASE and table == "People" and person_email_index.is_fresh():
+        person_email_index.add(record)
+    return record
 
 
-def get_record_by_formula(base, table, formula):
-    """Returns first matching record by formula or None"""
-    records = load_table(base, table, formula=formula, max_records=1)
+def get_record_by_formula(base, table, formula, fields: list = None):
+    """Returns first matching record by formula or None, with only `fields` (or the
+    fields pinned for the table with set_field_projection) if given
+    """
+    records = load_table(
+        base,
+        table,
+        formula=formula,
+        fields=fields or FIELD_PROJECTIONS.get((base, table)),
+        max_records=1,
+    )
     if len(records) > 0:
         return records[0]
 
 
-def get_record_by_field(base, table, field, value):
-    """Returns first matching record or None"""
+def get_record_by_field(base, table, field, value, fields: list = None):
+    """Returns first matching record or None, from the mirror if it has the field"""
+    mirror = get_mirror()
+    if mirror and mirror.mirrors(base, table, field):
+        return mirror.get_by_fields(base, table, [field], value)
     if isinstance(value, str):
-        return get_record_by_formula(base, table, f'"{value}" = {{{field}}}')
-    return get_record_by_formula(base, table, f"{field} = {value}")
+        return get_record_by_formula(
+            base, table, f'"{value}" = {{{field}}}', fields=fields
+        )
+    return get_record_by_formula(base, table, f"{field} = {value}", fields=fields)
+
+
+def formula_value(value):
+    """Format a Python value as a literal in an Airtable formula"""
+    if isinstance(value, bool):
+        return "TRUE()" if value else "FALSE()"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def get_records_by_field_values(
+    base, table, field, values, fields: list = None, max_workers=4
+):
+    """Returns a dict mapping each of `values` to the first record where `field` matches
+    it (or None)
+
+    Values are looked up VALUES_PER_LOOKUP at a time with OR() formulas, which are
+    requested in parallel (within the base's rate limit) instead of making a request per
+    value
+    """
+    values = [v for v in dict.fromkeys(values) if v is not None]
+    formulas = [
+        "OR({})".format(
+            ", ".join(
+                f"{{{field}}} = {formula_value(v)}" for v in chunk if v is not None
+            )
+        )
+        for chunk in grouper(values, VALUES_PER_LOOKUP)
+    ]
+    records_by_value = {}
+    records_by_folded_value = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda formula: load_table(base, table, formula=formula, fields=fields),
+            formulas,
+        )
+        for records in results:
+            for record in records:
+                record_values = record["fields"].get(field)
+                if not isinstance(record_values, list):
+                    record_values = [record_values]
+                for value in record_values:
+                    if value is not None:
+                        key = lookup_key(value)
+                        records_by_value.setdefault(key, record)
+                        records_by_folded_value.setdefault(key.casefold(), record)
+
+    # fall back to a case-insensitive match in case Airtable matched the value
+    # regardless of case
+    return {
+        value: records_by_value.get(lookup_key(value))
+        or records_by_folded_value.get(lookup_key(value).casefold())
+        for value in values
+    }
+
+
+class PersonEmailIndex:
+    """Index of People records by casefolded email address (across Email, Email 2 &
+    Email 3).
+
+    A single instance is kept for the lifetime of the process, so it's reused across
+    warm Lambda invocations until it's older than `ttl` seconds or invalidated
+    """
+
+    def __init__(self, ttl=PERSON_EMAIL_INDEX_TTL):
+        self.ttl = ttl
+        self.loaded_at = None
+        self.by_id = {}
+        self.people = {}
+        self.emails = {}
+        self.lock = threading.RLock()
+
+    def is_fresh(self):
+        return self.loaded_at is not None and time.time() - self.loaded_at < self.ttl
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+            self.by_id = {}
+            self.people = {}
+            self.emails = {}
+
+    def add(self, person):
+        """Index a People record, replacing any emails previously indexed for it"""
+        with self.lock:
+            emails = [
+                person["fields"][f].casefold()
+                for f in PERSON_EMAIL_FIELDS
+                if person["fields"].get(f)
+            ]
+            for email in self.emails.pop(person["id"], []):
+                owner = self.people.get(email, {}).get("id")
+                if email in emails or owner != person["id"]:
+                    continue
+                del self.people[email]
+                # hand the email back to the last other person who has it
+                for other_id, other_emails in self.emails.items():
+                    if email in other_emails:
+                        self.people[email] = self.by_id[other_id]
+            for email in emails:
+                # the last person found for an email wins, like get_person_email_map
+                self.people[email] = person
+            self.by_id[person["id"]] = person
+            self.emails[person["id"]] = emails
+
+    def load(self):
+        """(Re)load the index of every person with an email, unless it's fresh"""
+        with self.lock:
+            if self.is_fresh():
+                return self
+            self.by_id = {}
+            self.people = {}
+            self.emails = {}
+            people = iter_table(
+                AIRTABLE_BASE,
+                "People",
+                formula=(
+                    "OR(Email != BLANK(), {Email 2} != BLANK(), {Email 3} != BLANK())"
+                ),
+                modified_field=PEOPLE_MODIFIED_FIELD,
+            )
+            for person in people:
+                self.add(person)
+            self.loaded_at = time.time()
+            return self
+
+    def get(self, email):
+        return self.load().people.get(email.casefold())
+
+    def get_many(self, emails):
+        self.load()
+        return {email: self.people.get(email.casefold()) for email in emails}
+
+    def records(self):
+        """Returns each indexed People record once, in the order they were loaded"""
+        return list(self.load().by_id.values())
+
+
+person_email_index = PersonEmailIndex()
+
+
+def invalidate_person_email_index():
+    """Force the People email index to be reloaded on its next use"""
+    person_email_index.invalidate()
+
+
+def get_people_by_emails(emails):
+    """Returns a dict mapping each email to the matching People record (or None),
+    case-insensitively, loading the People email index once instead of querying Airtable
+    per email
+    """
+    return person_email_index.get_many(emails)
 
 
 def get_person_by_email(email):
@@ -169,7 +900,20 @@ def get_person_by_email(email):
     Helper method for finding person across email fields
     Base → Table → View:
     CB CRM → People → all views
+
+    Served from the local mirror or the People email index when either is available.
+    Otherwise a single formula query is made, so one-off lookups (e.g. in webhooks)
+    don't load the whole table; use get_people_by_emails to look up many emails
     """
+    mirror = get_mirror()
+    if mirror and all(
+        mirror.mirrors(AIRTABLE_BASE, "People", f) for f in PERSON_EMAIL_FIELDS
+    ):
+        return mirror.get_by_fields(
+            AIRTABLE_BASE, "People", PERSON_EMAIL_FIELDS, email, casefold=True
+        )
+    if person_email_index.is_fresh():
+        return person_email_index.get(email)
     upper_email = email.upper()
     formula = """OR(
             "{e}" = UPPER(Email),
@@ -187,11 +931,14 @@ def get_person_email_map():
 
     Creates key-value pair to map email to Person record ID for each email field (Email, Email 2, Email 3)
     and also creates additional pairs for all-lowercase versions of the email addresses
+
+    Built from the People email index, so People are only loaded once per index TTL
     """
-    airtable_people = load_table(AIRTABLE_BASE, "People", formula="Email != BLANK()")
     airtable_people_map = {}
-    for person in airtable_people:
-        for email_field in ["Email", "Email 2", "Email 3"]:
+    for person in person_email_index.records():
+        if not person["fields"].get("Email"):
+            continue
+        for email_field in PERSON_EMAIL_FIELDS:
             if person["fields"].get(email_field):
                 airtable_people_map[person["fields"][email_field]] = person["id"]
                 airtable_people_map[person["fields"]
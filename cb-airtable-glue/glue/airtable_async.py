@@ -0,0 +1,369 @@
+"""asyncio counterpart of glue.airtable, for handlers that make many independent
+requests.
+
+AsyncAirtable keeps one pooled aiohttp session & a rate limiter per base shared by every
+coroutine using it, so loading several tables, writing many batches or running many
+lookups at once keeps the base's whole request budget in use, instead of waiting on each
+round trip in turn. Requests are retried like the shared sync client's (see
+glue.airtable_client), and records written are written through to the local mirror.
+
+From synchronous code (e.g. a Lambda handler), use run() or load_tables():
+
+    tables = load_tables([(AIRTABLE_BASE, "People"), (AIRTABLE_BASE, "Donations")])
+    created = run("create_batch_records", AIRTABLE_BASE, "Donations", records)
+
+The sync client & AsyncAirtable keep separate rate limiters, so avoid using both against
+the same base at the same time.
+"""
+
+import asyncio
+import json
+import time
+from urllib.parse import quote
+
+import aiohttp
+
+from glue.airtable import MAX_URL_FORMULA_LENGTH, formula_value, grouper
+from glue.airtable_client import (
+    AIRTABLE_API_URL,
+    MAX_RETRIES,
+    RATE_LIMIT_WAIT,
+    REQUEST_TIMEOUT,
+    REQUESTS_PER_SECOND,
+    AirtableError,
+    is_create,
+)
+from glue.constants import AIRTABLE_KEY
+from glue.mirror import get_mirror
+from glue.telemetry import telemetry
+
+
+class AsyncTokenBucket:
+    """Token bucket of `rate` requests per second, for coroutines on one event loop"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Take a token, sleeping until one is available"""
+        self._refill()
+        # reserve the token even if the bucket is empty so waiting coroutines queue up
+        # in order
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def pause(self, seconds):
+        """Empty the bucket so no tokens are handed out for `seconds`"""
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class AsyncAirtable:
+    """Pooled, rate limited aiohttp session for the Airtable API (async with)"""
+
+    def __init__(
+        self,
+        api_key=AIRTABLE_KEY,
+        api_url=AIRTABLE_API_URL,
+        requests_per_second=REQUESTS_PER_SECOND,
+        max_retries=MAX_RETRIES,
+        timeout=REQUEST_TIMEOUT,
+        pool_size=10,
+    ):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = None
+        self.buckets = {}
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size),
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.session.close()
+
+    def bucket(self, base):
+        if base not in self.buckets:
+            self.buckets[base] = AsyncTokenBucket(self.requests_per_second)
+        return self.buckets[base]
+
+    def url(self, base, path="", meta=False):
+        url = f"{self.api_url}/meta/bases/{base}" if meta else f"{self.api_url}/{base}"
+        if path:
+            url += f"/{path}"
+        return url
+
+    async def request(self, method, base, path="", meta=False, **kwargs):
+        """Make a request to `base` within its rate limit, retrying 429 & 5xx responses.
+
+        Returns the response's JSON, or raises AirtableError for any other error
+        response. Creates are only retried after a 429 or failing to connect, see
+        glue.airtable_client
+        """
+        table, _, rest = path.partition("/")
+        endpoint = f"{method} {'meta' if meta else 'records'}"
+        if rest:
+            endpoint += "/listRecords" if rest == "listRecords" else "/record"
+        with telemetry.call(
+            "airtable", endpoint, base, None if meta else table
+        ) as call:
+            bucket = self.bucket(base)
+            url = self.url(base, path, meta=meta)
+            create = is_create(method, path)
+            for attempt in range(self.max_retries + 1):
+                call.retries = attempt
+                await bucket.acquire()
+                try:
+                    async with self.session.request(method, url, **kwargs) as res:
+                        status = res.status
+                        retry_after = res.headers.get("Retry-After")
+                        body = await res.read()
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    # like the sync client, creates are only retried if they never
+                    # connected
+                    if attempt == self.max_retries or (
+                        create and not isinstance(e, aiohttp.ClientConnectorError)
+                    ):
+                        raise
+                    await asyncio.sleep(min(2**attempt, RATE_LIMIT_WAIT))
+                    continue
+                if status == 429 or (status >= 500 and not create):
+                    if attempt == self.max_retries:
+                        break
+                    try:
+                        wait = float(retry_after)
+                    except (TypeError, ValueError):
+                        wait = (
+                            RATE_LIMIT_WAIT
+                            if status == 429
+                            else min(2**attempt, RATE_LIMIT_WAIT)
+                        )
+                    print(
+                        f"Airtable returned {status} for {method} {url}, "
+                        f"retrying in {wait}s"
+                    )
+                    if status == 429:
+                        call.rate_limited += 1
+                        # hold back every request to this base, not just this one
+                        bucket.pause(wait)
+                    else:
+                        await asyncio.sleep(wait)
+                    continue
+                break
+            call.status = status
+            call.bytes_in = len(body)
+            if status >= 400:
+                text = body.decode(errors="replace")
+                raise AirtableError(f"{status} error for {method} {url}: {text}")
+            return json.loads(body)
+
+    async def iter_pages(
+        self,
+        base,
+        table,
+        formula=None,
+        view=None,
+        fields: list = None,
+        max_records=None,
+    ):
+        """Yield pages of up to 100 records from Airtable table as they're loaded"""
+        use_post = formula and len(quote(formula)) > MAX_URL_FORMULA_LENGTH
+        params = {"pageSize": 100}
+        if max_records:
+            params["maxRecords"] = max_records
+        if view:
+            params["view"] = view
+        if formula:
+            params["filterByFormula"] = formula
+        if fields and use_post:
+            params["fields"] = fields
+        offset = None
+
+        while True:
+            if offset:
+                params["offset"] = offset
+            if use_post:
+                data = await self.request(
+                    "POST", base, f"{table}/listRecords", json=params
+                )
+            else:
+                # aiohttp takes repeated parameters, like "fields[]", as a list of pairs
+                query = [(k, str(v)) for k, v in params.items()]
+                query.extend(("fields[]", field) for field in fields or [])
+                data = await self.request("GET", base, table, params=query)
+            yield data["records"]
+            offset = data.get("offset")
+            if not offset:
+                break
+
+    async def load_table(
+        self,
+        base,
+        table,
+        formula=None,
+        view=None,
+        fields: list = None,
+        max_records=None,
+    ):
+        """Load all records from Airtable table with optional formula filter"""
+        records = []
+        async for page in self.iter_pages(
+            base,
+            table,
+            formula=formula,
+            view=view,
+            fields=fields,
+            max_records=max_records,
+        ):
+            records.extend(page)
+        return records
+
+    async def _write_batches(
+        self, method, base, table, records, build_record, body=None, failures=None
+    ):
+        """Send `records` in concurrent batches of 10, returning the records in the
+        responses.
+
+        Like glue.airtable's batch writes, failed batches are appended to `failures` if
+        given, otherwise the first failure is raised once every batch has been attempted
+        """
+
+        async def write(batch):
+            data = await self.request(
+                method,
+                base,
+                table,
+                json={**(body or {}), "records": [build_record(r) for r in batch]},
+            )
+            mirror = get_mirror()
+            if mirror:
+                mirror.write_through(base, table, data.get("records", []))
+            return data.get("records", [])
+
+        batches = [
+            [r for r in group if r is not None] for group in grouper(records, 10)
+        ]
+        results = await asyncio.gather(
+            *(write(batch) for batch in batches), return_exceptions=True
+        )
+        written_records = []
+        for batch, result in zip(batches, results):
+            if isinstance(
+                result, (AirtableError, aiohttp.ClientError, asyncio.TimeoutError)
+            ):
+                if failures is None:
+                    raise result
+                failures.append({"records": batch, "error": result})
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                written_records.extend(result)
+        return written_records
+
+    async def create_batch_records(self, base, table, records, failures=None):
+        return await self._write_batches(
+            "POST", base, table, records, lambda rec: {"fields": rec}, failures=failures
+        )
+
+    async def update_batch_records(self, base, table, records, failures=None):
+        """Each record is a dict with the Airtable record `id` & `fields` to update"""
+        return await self._write_batches(
+            "PATCH",
+            base,
+            table,
+            records,
+            lambda rec: {"id": rec["id"], "fields": rec["fields"]},
+            failures=failures,
+        )
+
+    async def delete_batch_records(self, base, table, records):
+        async def delete(record_ids):
+            await self.request(
+                "DELETE", base, table, params=[("records[]", i) for i in record_ids]
+            )
+            mirror = get_mirror()
+            if mirror:
+                mirror.delete_through(base, table, record_ids)
+
+        await asyncio.gather(
+            *(
+                delete([rec["id"] for rec in group if rec])
+                for group in grouper(records, 10)
+            )
+        )
+
+    async def get_record_by_field(self, base, table, field, value, fields: list = None):
+        """Returns first matching record or None, from the mirror if it has the field"""
+        mirror = get_mirror()
+        if mirror and mirror.mirrors(base, table, field):
+            return mirror.get_by_fields(base, table, [field], value)
+        records = await self.load_table(
+            base,
+            table,
+            formula=f"{{{field}}} = {formula_value(value)}",
+            fields=fields,
+            max_records=1,
+        )
+        return records[0] if records else None
+
+    async def get_records_by_field(
+        self, base, table, field, values, fields: list = None
+    ):
+        """Returns a dict mapping each of `values` to the first record where `field`
+        matches it, looked up concurrently
+        """
+        values = list(dict.fromkeys(values))
+        records = await asyncio.gather(
+            *(self.get_record_by_field(base, table, field, v, fields) for v in values)
+        )
+        return dict(zip(values, records))
+
+
+def run(method, *args, **kwargs):
+    """Call AsyncAirtable `method` (e.g. "create_batch_records") from sync code"""
+
+    async def main():
+        async with AsyncAirtable() as airtable:
+            return await getattr(airtable, method)(*args, **kwargs)
+
+    return asyncio.run(main())
+
+
+def load_tables(tables) -> list:
+    """Load several tables concurrently from synchronous code.
+
+    Args:
+        tables (list): (base, table) pairs, or (base, table, kwargs) with load_table's
+            keyword arguments, e.g. {"formula": ..., "fields": [...]}
+
+    Returns:
+        list: the records of each table, in the same order as `tables`
+    """
+
+    async def main():
+        async with AsyncAirtable() as airtable:
+            return await asyncio.gather(
+                *(
+                    airtable.load_table(*spec[:2], **(spec[2:] or [{}])[0])
+                    for spec in tables
+                )
+            )
+
+    return asyncio.run(main())
@@ -0,0 +1,253 @@
+"""Shared HTTP client for the Airtable API.
+
+Keeps one pooled keep-alive session for every Airtable request made by the gluecode,
+throttles requests per base to stay under Airtable's rate limit, and retries rate
+limited (429) or failed (5xx) requests with backoff, honoring `Retry-After` headers.
+See https://airtable.com/developers/web/api/rate-limits
+
+Creates (POSTs other than listRecords) aren't idempotent: Airtable may have created the
+records before a timeout or 5xx response, so they're only retried after a 429 or a
+connection error raised before the request was sent.
+"""
+
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+from glue.constants import AIRTABLE_KEY
+from glue.telemetry import telemetry
+
+# overridable to point the gluecode at a local stand-in, see benchmarks/mock_airtable.py
+AIRTABLE_API_URL = os.getenv("AIRTABLE_API_URL", "https://api.airtable.com/v0")
+
+# Airtable allows 5 requests per second per base
+REQUESTS_PER_SECOND = 5
+# Airtable asks clients to wait 30 seconds after a 429 before making further requests
+RATE_LIMIT_WAIT = 30
+MAX_RETRIES = 5
+REQUEST_TIMEOUT = 60
+
+
+class AirtableError(requests.HTTPError):
+    """Raised when Airtable returns an error response that can't be retried"""
+
+
+def is_create(method, path):
+    """Whether a request creates records, so retrying it could create them twice"""
+    return method == "POST" and not path.endswith("/listRecords")
+
+
+def sent_before_failing(error) -> bool:
+    """Whether the request that raised a requests ConnectionError or Timeout may have
+    reached the server, i.e. the error wasn't raised while connecting
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return False
+    # urllib3 wraps errors raised while connecting (refused, DNS) in
+    # MaxRetryError.reason
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return not isinstance(reason, ConnectTimeoutError)
+
+
+class TokenBucket:
+    """Thread-safe token bucket of `rate` requests per second, bursting to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Take a token, sleeping until one is available"""
+        with self.lock:
+            self._refill()
+            # reserve the token even if the bucket is empty so concurrent callers queue
+            # up in order
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Empty the bucket so no tokens are handed out for `seconds`"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class AirtableClient:
+    """Pooled, rate limited Airtable API session, shared by glue.airtable"""
+
+    def __init__(
+        self,
+        api_key=AIRTABLE_KEY,
+        api_url=AIRTABLE_API_URL,
+        requests_per_second=REQUESTS_PER_SECOND,
+        max_retries=MAX_RETRIES,
+        timeout=REQUEST_TIMEOUT,
+        pool_size=10,
+    ):
+        self.api_url = api_url
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {"Authorization": f"Bearer {api_key}", "Accept-Encoding": "gzip, deflate"}
+        )
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        # size of response bodies as sent (gzipped) & after decompression
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self._bytes_lock = threading.Lock()
+
+    def bucket(self, base):
+        """Returns the token bucket shared by all requests to `base`"""
+        with self._buckets_lock:
+            if base not in self._buckets:
+                self._buckets[base] = TokenBucket(self.requests_per_second)
+            return self._buckets[base]
+
+    def url(self, base, path="", meta=False):
+        # the metadata API lives under /meta/bases/{base}, see
+        # https://airtable.com/developers/web/api/get-base-schema
+        url = f"{self.api_url}/meta/bases/{base}" if meta else f"{self.api_url}/{base}"
+        if path:
+            url += f"/{path}"
+        return url
+
+    @property
+    def bytes_saved(self):
+        """Bytes not transferred thanks to response compression"""
+        return self.bytes_decoded - self.bytes_received
+
+    def _count_bytes(self, res):
+        """Count the response's size as sent & decompressed, returning the former"""
+        decoded = len(res.content)
+        try:
+            # bytes read from the connection, before decompression
+            received = res.raw.tell() or decoded
+        except AttributeError:
+            received = decoded
+        with self._bytes_lock:
+            self.bytes_received += received
+            self.bytes_decoded += decoded
+        return received
+
+    def _retry_wait(self, res, attempt):
+        retry_after = res.headers.get("Retry-After") if res is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        if res is not None and res.status_code == 429:
+            return RATE_LIMIT_WAIT
+        # exponential backoff for server errors & dropped connections
+        return min(2 ** attempt, RATE_LIMIT_WAIT)
+
+    def request(self, method, base, path="", meta=False, **kwargs):
+        """Make a request to `base`, waiting for the base's rate limit and retrying 429
+        & 5xx responses.
+
+        Returns the `requests.Response`, or raises `AirtableError` for any other
+        error response
+        """
+        if not telemetry.enabled:
+            return self._request(method, base, path, meta, None, **kwargs)
+        table, _, rest = path.partition("/")
+        endpoint = f"{method} {'meta' if meta else 'records'}"
+        if rest == "listRecords":
+            endpoint += "/listRecords"
+        elif rest:
+            endpoint += "/record"
+        table = None if meta else table
+        with telemetry.call("airtable", endpoint, base, table) as call:
+            return self._request(method, base, path, meta, call, **kwargs)
+
+    def _request(self, method, base, path, meta, call, **kwargs):
+        bucket = self.bucket(base)
+        url = self.url(base, path, meta=meta)
+        kwargs.setdefault("timeout", self.timeout)
+        create = is_create(method, path)
+        for attempt in range(self.max_retries + 1):
+            if call:
+                call.retries = attempt
+            bucket.acquire()
+            try:
+                res = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries or (create and sent_before_failing(e)):
+                    raise
+                time.sleep(self._retry_wait(None, attempt))
+                continue
+            if res.status_code == 429 or (res.status_code >= 500 and not create):
+                if attempt == self.max_retries:
+                    break
+                wait = self._retry_wait(res, attempt)
+                print(
+                    f"Airtable returned {res.status_code} for {method} {url}, "
+                    f"retrying in {wait}s"
+                )
+                if res.status_code == 429:
+                    if call:
+                        call.rate_limited += 1
+                    # hold back every request to this base, not just this one
+                    bucket.pause(wait)
+                else:
+                    time.sleep(wait)
+                continue
+            break
+        if call:
+            call.status = res.status_code
+            call.bytes_out = len(res.request.body or b"")
+        if not res.ok:
+            raise AirtableError(
+                f"{res.status_code} error for {method} {url}: {res.text}", response=res
+            )
+        received = self._count_bytes(res)
+        if call:
+            call.bytes_in = received
+        return res
+
+    def get(self, base, path="", **kwargs):
+        return self.request("GET", base, path, **kwargs).json()
+
+    def post(self, base, path="", **kwargs):
+        return self.request("POST", base, path, **kwargs).json()
+
+    def patch(self, base, path="", **kwargs):
+        return self.request("PATCH", base, path, **kwargs).json()
+
+    def delete(self, base, path="", **kwargs):
+        return self.request("DELETE", base, path, **kwargs).json()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide AirtableClient, creating it on first use so it's reused
+    across warm Lambda invocations
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AirtableClient()
+        return _client
@@ -31,63 +31,42 @@ Airtable API keys can be found by opening the Airtable base in a browser & click
 Click on "API documentation", then click on "Authentication". 
 """
 
-import pandas as pd
 import os
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import gspread_pandas as gsp
-from glue.airtable import load_table
-#how do i import the load_table function from airtable.py?
-
-
-def load_table(base, table, formula=None, view=None, fields: list = None, max_records=None):
-    #Load all records from Airtable table with optional formula filter
-    offset = ""
-    has_offset = True
-    records = []
-
-    while has_offset:
-        url = f"https://api.airtable.com/v0/{base}/{table}?pageSize=100"
-        if max_records:
-            url += f"&maxRecords={max_records}"
-        if view:
-            url += f"&view={view}"
-        if formula:
-            url += f"&filterByFormula={formula}"
-        if fields:
-            # convoluted code to accomplish URL encoding of field names supplied to function as a list, 
-            # as well as strange query parameter syntax required by Airtable API, see following links:
-            # - https://airtable.com/developers/web/api/list-records#query-fields
-            # - https://community.airtable.com/t5/development-apis/using-the-quot-fields-quot-query-parameter-in-appgyver/td-p/67817
-            # - https://codepen.io/airtable/full/MeXqOg
-            url += "&fields%5B%5D="+"&fields%5B%5D=".join(list(map(requests.utils.quote, fields))) 
-        if offset:
-            url += f"&offset={offset}"
-        res = requests.get(url, headers={"Authorization": f"Bearer {AIRTABLE_KEY}"})
-        data = res.json()
-        records.extend(data["records"])
-        if "offset" in data:
-            offset = data["offset"]
-        else:
-            has_offset = False
-    return records
-
-from glue.constants import AIRTABLE_BASE, CRM_BASE_SYNC_SHEET_KEY, DOCS_SUPERBASE, DOCS_SUPERBASE_SYNC_SHEET_KEY
-
-from itertools import zip_longest
-import requests
-
-AIRTABLE_BASE = "appRkVGbRa896QESw"
-CRM_BASE_SYNC_SHEET_KEY = "1QjmmlrXlKyNf3GZUSgeVNi0fxRVbhtwlIVhK8qvR7ns"
-AIRTABLE_KEY = (
-    "patNepFl5zIBWAv6U.e005573596a8d51b665687907e6b61fecdd83525d3d0506f2d7cc5a414d5577c"
-)
 
-# load google service account credentials from local JSON file
-gsp_config = gsp.conf.get_config(
-    conf_dir="C:\\Users\\johnl\\Desktop\\Software Development\\Coemeta\\cb-airtable-glue",
-    file_name="coemeta-random-service-account.json",
+from glue.checkpoint import DeadlineExceeded, get_deadline
+from glue.constants import AIRTABLE_BASE, CRM_BASE_SYNC_SHEET_KEY
+from glue.scheduler import SyncScheduler
+from glue.sinks import SINKS, SheetsSink, export_table
+
+# location of the GCP Service Account credential file, defaults to the one deployed
+# alongside the glue package
+GSPREAD_CONFIG_DIR = os.getenv(
+    "GSPREAD_CONFIG_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+GSPREAD_CONFIG_FILE = os.getenv(
+    "GSPREAD_CONFIG_FILE", "coemeta-random-service-account.json"
 )
 
+# tables synced at once, Airtable requests are still throttled per base by the shared
+# client
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", 4))
+
+_gspread_config = None
+
+
+def get_gspread_config():
+    """Load google service account credentials from local JSON file, once & lazily"""
+    global _gspread_config
+    if _gspread_config is None:
+        _gspread_config = gsp.conf.get_config(
+            conf_dir=GSPREAD_CONFIG_DIR, file_name=GSPREAD_CONFIG_FILE
+        )
+    return _gspread_config
+
 
 def sync_airtable_to_sheets(
     gspread_config: dict,
@@ -96,11 +75,16 @@ def sync_airtable_to_sheets(
     table: str,
     view: str = None,
     fields: list = None,
-) -> None:
+    modified_field: str = None,
+    incremental_write: bool = False,
+    skip_unchanged: bool = True,
+    exports: list = None,
+) -> bool:
     """Pulls records from an Airtable table & writes them to a Google Sheet tab, using the table name.
     Will create a new tab on the designated Google Sheet if it does not already exist.
 
-    Depends on Pandas & Gspread Pandas libraries to write to Google Sheets, as well as internal load_table() function from this codebase.
+    Depends on Pandas & Gspread Pandas libraries to write to Google Sheets, as well as
+    internal export_table() & SheetsSink from this codebase.
 
     Args:
         gspread_config (gspread_pandas.conf.Config): gspread_pandas authentication config object.
@@ -109,155 +93,172 @@ def sync_airtable_to_sheets(
         table (str): Airtable table name (can be display name or ID found in URL)
         view (str, optional): Airtable view name (can be display name or ID found in URL). Defaults to None.
         fields (list, optional): List of field names or IDs to include from table. Defaults to None, which returns all fields
+        modified_field (str, optional): "Last modified time" field name, loads the table
+            incrementally when set (see load_table). Defaults to None.
+        incremental_write (bool, optional): Only write the cells that changed since the
+            last sync instead of replacing the whole tab (see glue.sheet_diff). Defaults
+            to False.
+        skip_unchanged (bool, optional): Skip authenticating with & writing to Google
+            Sheets if the records' content fingerprint matches the last successful write
+            to the tab. Defaults to True.
+        exports (list, optional): names of other sinks to write the table to from the
+            same download, e.g. ["parquet", "sqlite"] (see glue.sinks.SINKS). Defaults
+            to None.
 
     Returns:
-        None or Exception: None if successful, Exception if error
+        bool or Exception: True if the sheet (& exports) were written, False if they
+            were skipped as unchanged, Exception if error
     """
 
     try:
-        # load Airtable table
-        df = load_table(base=base, table=table, view=view, fields=fields)
-
-        # Convert the records to a pandas dataframe
-        df = pd.DataFrame(df)
-
-        # Unnest the 'fields' column into individual columns
-        df = pd.json_normalize(df["fields"])
-
-        # Sort df columns to preserve order when replacing sheet (otherwise looker studio connection breaks)
-        df = df.reindex(sorted(df.columns), axis=1)
-
-        # create gspread object using gspread config established prior (see: https://gspread-pandas.readthedocs.io/en/latest/configuration.html for more information.),
-        # using the Airtable table name as the "sheet" name (i.e. the spreadsheet tab), & creating it if it doesn't exist
-        spread = gsp.Spread(
-            config=gspread_config,
-            spread=spreadsheet_key,
-            sheet=table,
-            create_sheet=True,
+        # the table is downloaded once & streamed to the sheet & any other exports (see
+        # glue.sinks), using the Airtable table name as the "sheet" name (i.e. the
+        # spreadsheet tab), & creating it if it doesn't exist
+        sinks = [SheetsSink(spreadsheet_key, gspread_config, incremental_write)]
+        sinks.extend(SINKS[name]() for name in exports or [])
+        return export_table(
+            base,
+            table,
+            sinks,
+            view=view,
+            fields=fields,
+            modified_field=modified_field,
+            skip_unchanged=skip_unchanged,
         )
 
-        # write the dataframe to the Google Sheet, replacing the current data if the sheet (tab) already exists
-        spread.df_to_sheet(df, replace=1)
-
     except Exception as e:
         print(f"Error: {e}")
         raise e
 
 
-# map / dicts of Airtable tables with optional views & fields to sync to Google Sheet TODO: move to constants.py ?
-# CB CRM base
-# crm_tables_to_sync = {"CB CRM Base Metadata": {},
-#    }
+# sync manifest: each Airtable table to sync, the Google Sheet to sync it to & how
+# often. Keys:
+#   spreadsheet_key, base, table: Google Sheet key, Airtable base key & table name
+#     (also the tab name)
+#   view, fields, modified_field, incremental_write, exports: see
+#     sync_airtable_to_sheets
+#   min_interval: seconds between syncs, stretched for tables that rarely change (see
+#     glue.scheduler)
+#   priority: tables with a higher priority are synced first when there isn't time
+#     for every table due
+# TODO: move to constants.py ?
+SYNC_MANIFEST = [
+    # CB CRM base
+    {
+        "spreadsheet_key": CRM_BASE_SYNC_SHEET_KEY,
+        "base": AIRTABLE_BASE,
+        "table": "CB CRM Base Metadata",
+        "view": None,
+        "fields": None,
+        "modified_field": None,
+        "incremental_write": True,
+        # e.g. ["parquet", "sqlite"] to also snapshot the table, see glue.sinks
+        "exports": None,
+        "min_interval": 3 * 60 * 60,
+        "priority": 0,
+    },
+    # Add more tables as needed, e.g. from the Documenters superbase:
+    # {
+    #     "spreadsheet_key": DOCS_SUPERBASE_SYNC_SHEET_KEY,
+    #     "base": DOCS_SUPERBASE,
+    #     "table": "...",
+    #     ...
+    # },
+]
+
+
+def _sync_table(entry: dict, scheduler: SyncScheduler) -> dict:
+    """Syncs & records one manifest entry, catching errors so other tables still sync"""
+    spreadsheet_key = entry["spreadsheet_key"]
+    base, table = entry["base"], entry["table"]
+    result = {"spreadsheet_key": spreadsheet_key, "base": base, "table": table}
+    started = time.time()
+    start = time.monotonic()
+    try:
+        get_deadline().check()
+        written = sync_airtable_to_sheets(
+            gspread_config=get_gspread_config(),
+            spreadsheet_key=spreadsheet_key,
+            base=base,
+            table=table,
+            view=entry.get("view"),
+            fields=entry.get("fields"),
+            modified_field=entry.get("modified_field"),
+            incremental_write=entry.get("incremental_write", False),
+            exports=entry.get("exports"),
+        )
+        result["status"] = "written" if written else "skipped"
+    except DeadlineExceeded:
+        result["status"] = "deferred"
+    except Exception as e:
+        print(f"Error: {e} when syncing {table}")
+        result.update(status="failed", error=repr(e))
+    result["seconds"] = round(time.monotonic() - start, 2)
+    scheduler.record(entry, result["status"], result["seconds"], started)
+    return result
 
 
-def sync_tables_to_sheets() -> None:
-    """Syncs all tables in tables_to_sync list to Google Sheet.
+def sync_tables_to_sheets(
+    max_workers: int = SYNC_WORKERS, manifest: list = None, budget: float = None
+) -> list:
+    """Syncs the tables in the sync manifest that are due to their Google Sheets.
 
-    Args: none
+    A SyncScheduler (see glue.scheduler) picks the tables whose interval has passed,
+    highest priority & then cheapest first, until their estimated sync time fills the
+    budget, and records each run's duration & whether the table changed to adjust its
+    interval.
 
-    Returns:
-        None or Exception: None if successful, Exception if error
-    """
+    Tables are synced concurrently, with Airtable requests throttled per base & Google
+    Sheets writes throttled per spreadsheet. A table that fails to sync doesn't stop the
+    others, and is due again on the next run, as are tables deferred because the
+    invocation's deadline passed.
 
-    # iterate through dicts to sync tables to the Google Sheet:
-    for t in crm_tables_to_sync:
-        try:
-            sync_airtable_to_sheets(
-                gspread_config=google_credentials_obj,
-                spreadsheet_key=CRM_BASE_SYNC_SHEET_KEY,
-                base=AIRTABLE_BASE,
-                table=t,
-                view=crm_tables_to_sync[t].get("view"),
-                fields=crm_tables_to_sync[t].get("fields"),
-            )
+    Args:
+        max_workers (int, optional): number of tables to sync at once. Defaults to
+            SYNC_WORKERS.
+        manifest (list, optional): entries of tables to sync. Defaults to SYNC_MANIFEST.
+        budget (float, optional): seconds available for syncing, defaults to the time
+            left before the invocation's deadline.
 
-        except Exception as e:
-            print(f"Error: {e}")
-            raise e
-
-    for t in docs_tables_to_sync:
-        try:
-            sync_airtable_to_sheets(
-                gspread_config=google_credentials_obj,
-                spreadsheet_key=DOCS_SUPERBASE_SYNC_SHEET_KEY,
-                base=DOCS_SUPERBASE,
-                table=t,
-                view=docs_tables_to_sync[t].get("view"),
-                fields=docs_tables_to_sync[t].get("fields"),
-            )
+    Returns:
+        list: a result dict per manifest entry, with its "spreadsheet_key", "base",
+            "table", "status" ("written", "skipped", "failed", "deferred" to the next
+            run or "not due"), "seconds" taken & "error" if it failed
+    """
 
-        except Exception as e:
-            print(f"Error: {e} when syncing {t}")
-            raise e
-
-
-# copied over from airtable.py for ease
-def load_table(
-    base, table, formula=None, view=None, fields: list = None, max_records=None
-):
-    """Load all records from Airtable table with optional formula filter"""
-    offset = ""
-    has_offset = True
-    records = []
-
-    while has_offset:
-        url = f"https://api.airtable.com/v0/{base}/{table}?pageSize=100"
-        if max_records:
-            url += f"&maxRecords={max_records}"
-        if view:
-            url += f"&view={view}"
-        if formula:
-            url += f"&filterByFormula={formula}"
-        if fields:
-            # convoluted code to accomplish URL encoding of field names supplied to function as a list,
-            # as well as strange query parameter syntax required by Airtable API, see following links:
-            # - https://airtable.com/developers/web/api/list-records#query-fields
-            # - https://community.airtable.com/t5/development-apis/using-the-quot-fields-quot-query-parameter-in-appgyver/td-p/67817
-            # - https://codepen.io/airtable/full/MeXqOg
-            url += "&fields%5B%5D=" + "&fields%5B%5D=".join(
-                list(map(requests.utils.quote, fields))
+    manifest = SYNC_MANIFEST if manifest is None else manifest
+    if not manifest:
+        return []
+    scheduler = SyncScheduler(manifest)
+    workers = min(max_workers, len(manifest))
+    run, deferred, not_due = scheduler.plan(budget, workers=workers)
+    results = []
+    if run:
+        # load the credentials once, before the workers need them
+        get_gspread_config()
+        with ThreadPoolExecutor(max_workers=min(workers, len(run))) as executor:
+            results = list(
+                executor.map(lambda entry: _sync_table(entry, scheduler), run)
             )
-        if offset:
-            url += f"&offset={offset}"
-        res = requests.get(url, headers={"Authorization": f"Bearer {AIRTABLE_KEY}"})
-        data = res.json()
-        records.extend(data["records"])
-        if "offset" in data:
-            offset = data["offset"]
-        else:
-            has_offset = False
-    return records
-
-#Version 2
-
-# Define a dictionary to store table information
-tables_to_sync = {
-    "CB CRM Base Metadata": {"view": None, "fields": None},
-    # Add more tables as needed (would need to be hard coded, maybe annoying, but an idea)
-}
-
-# Modify the sync_tables_to_sheets function to use the tables_to_sync dictionary
-def sync_tables_to_sheets() -> None:
-    """Syncs all tables in tables_to_sync dictionary to Google Sheet."""
-    try:
-        # Iterate through the tables in tables_to_sync
-        for table, info in tables_to_sync.items():
-            sync_airtable_to_sheets(gspread_config=google_credentials_obj, 
-                                    spreadsheet_key=CRM_BASE_SYNC_SHEET_KEY, 
-                                    base=AIRTABLE_BASE, 
-                                    table=table, 
-                                    view=info.get("view"), 
-                                    fields=info.get("fields"))
-    except Exception as e:
-        print(f"Error: {e}")
-        raise e
+    for status, entries in (("deferred", deferred), ("not due", not_due)):
+        results.extend(
+            {
+                "spreadsheet_key": entry["spreadsheet_key"],
+                "base": entry["base"],
+                "table": entry["table"],
+                "status": status,
+                "seconds": 0,
+            }
+            for entry in entries
+        )
+    for result in results:
+        print(f"{result['table']}: {result['status']} in {result['seconds']}s")
+    return results
 
-# Call sync_tables_to_sheets() to sync all tables defined in tables_to_sync
-sync_tables_to_sheets()
 
 """# example usage for individual / ad hoc run:
 sync_airtable_to_sheets(
-    gspread_config=gsp_config,
+    gspread_config=get_gspread_config(),
     spreadsheet_key=CRM_BASE_SYNC_SHEET_KEY,
     base=AIRTABLE_BASE,
     table="CB CRM Base Metadata",
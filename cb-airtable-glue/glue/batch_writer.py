@@ -0,0 +1,168 @@
+"""Buffered writes to an Airtable table.
+
+Instead of a request per record with create_update_record, integrations can queue their
+writes in a BatchWriter, which coalesces repeated updates to the same record & sends
+everything with Airtable's batch API, 10 records per request, flushing batches
+concurrently within the base's rate limit:
+
+    with BatchWriter(AIRTABLE_BASE, "People") as writer:
+        writer.create({"Name": "..."})
+        writer.update(record_id, {"Email": "..."})
+        writer.delete(other_record_id)
+    writer.created_ids, writer.failures
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from glue.airtable import (
+    create_batch_records,
+    delete_batch_records,
+    grouper,
+    person_email_index,
+    update_batch_records,
+)
+from glue.airtable_client import AirtableError
+from glue.checkpoint import DeadlineExceeded
+from glue.constants import AIRTABLE_BASE
+
+BATCH_SIZE = 10
+
+
+class BatchWriter:
+    """Queues creates, updates & deletes to `table`, writing them in batches when
+    flushed.
+
+    Queued writes are flushed when the `with` block exits (even if it raised), or by
+    calling flush(). Failed batches don't stop the others, they're collected in
+    `failures` as dicts with the batch's `records` & the `error` raised, like
+    sync_table's BatchWriteError. Deletes are sent once the creates & updates are done,
+    so a record is never updated after it's been deleted
+    """
+
+    def __init__(self, base, table, max_workers=4):
+        self.base = base
+        self.table = table
+        self.max_workers = max_workers
+        self.creates = []
+        # record id -> fields, so repeated updates to a record are merged into one
+        self.updates = {}
+        self.deletes = {}
+        self.created = []
+        self.updated = []
+        self.failures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    @property
+    def created_ids(self):
+        return [record["id"] for record in self.created]
+
+    def create(self, fields):
+        self.creates.append(fields)
+
+    def update(self, record_id, fields):
+        """Queue an update, merged with any update already queued for the record, or
+        dropped if the record is queued for deletion
+        """
+        if record_id in self.deletes:
+            return
+        self.updates.setdefault(record_id, {}).update(fields)
+
+    def delete(self, record_id):
+        """Queue a delete, dropping any update queued for the record"""
+        self.updates.pop(record_id, None)
+        self.deletes[record_id] = True
+
+    def create_update(self, fields, update_id=None):
+        """Queue a create, or an update of `update_id`, like create_update_record"""
+        if update_id:
+            self.update(update_id, fields)
+        else:
+            self.create(fields)
+
+    def _args(self, batch):
+        return self.base, self.table, batch, self.failures
+
+    @staticmethod
+    def _results(submitted):
+        """Collect the records written by (batch, future) pairs, returning them with
+        the records of the batches the deadline stopped & its DeadlineExceeded
+        """
+        written, stopped, error = [], [], None
+        for batch, future in submitted:
+            try:
+                written.extend(future.result())
+            except DeadlineExceeded as e:
+                stopped.extend(batch)
+                error = e
+        return written, stopped, error
+
+    def _delete_batch(self, batch):
+        try:
+            delete_batch_records(self.base, self.table, batch)
+        except (AirtableError, requests.RequestException) as e:
+            self.failures.append({"records": batch, "error": e})
+
+    def flush(self) -> dict:
+        """Write every queued change, returning the created record ids & failures.
+
+        If the invocation's deadline stops the writes (see glue.checkpoint), the records
+        written so far are kept, the writes that weren't sent are queued again &
+        DeadlineExceeded is raised
+        """
+        creates, updates, deletes = self.creates, self.updates, self.deletes
+        self.creates, self.updates, self.deletes = [], {}, {}
+        update_records = [
+            {"id": record_id, "fields": fields} for record_id, fields in updates.items()
+        ]
+        delete_records = [{"id": record_id} for record_id in deletes]
+        previous_failures = len(self.failures)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            creating = [
+                (batch, executor.submit(create_batch_records, *self._args(batch)))
+                for batch in self._batches(creates)
+            ]
+            updating = [
+                (batch, executor.submit(update_batch_records, *self._args(batch)))
+                for batch in self._batches(update_records)
+            ]
+            created, stopped_creates, stopped = self._results(creating)
+            updated, stopped_updates, stopped_update = self._results(updating)
+            stopped = stopped or stopped_update
+            if stopped:
+                # queue the writes the deadline stopped for the next flush
+                self.creates.extend(stopped_creates)
+                for record in stopped_updates:
+                    self.update(record["id"], record["fields"])
+                self.deletes.update(deletes)
+            else:
+                list(executor.map(self._delete_batch, self._batches(delete_records)))
+
+        self.created.extend(created)
+        self.updated.extend(updated)
+        if self.base == AIRTABLE_BASE and self.table == "People":
+            if person_email_index.is_fresh():
+                for record in created + updated:
+                    person_email_index.add(record)
+        for failure in self.failures[previous_failures:]:
+            print(
+                f"Error writing {len(failure['records'])} records to {self.table}: "
+                f"{failure['error']}"
+            )
+        if stopped:
+            raise stopped
+        return {"created": self.created_ids, "failures": self.failures}
+
+    @staticmethod
+    def _batches(records):
+        return [
+            [r for r in group if r is not None]
+            for group in grouper(records, BATCH_SIZE)
+        ]
@@ -0,0 +1,91 @@
+"""Checkpoints & deadlines for syncs that may not finish within one Lambda invocation.
+
+Cron handlers have 15 minutes to run. Handlers decorated with `resumable` in
+glue.handler set the process-wide deadline from their Lambda context, long-running loops
+call `get_deadline().check()` between units of work, and DeadlineExceeded is raised once
+the time left falls under DEADLINE_MARGIN, so the handler can stop cleanly instead of
+being killed mid-write. Progress saved in a Checkpoint (see sync_table in glue.airtable:
+the pagination offset & the index of the records loaded so far, and the upsert batches
+written) lets the next invocation pick up where the last one stopped. Tables synced to
+Sheets are tracked by glue.scheduler instead.
+"""
+
+import os
+import threading
+import time
+
+from glue.state import get_state_store
+
+# seconds kept in reserve before the Lambda timeout to finish the current unit of work &
+# save progress
+DEADLINE_MARGIN = int(os.getenv("GLUE_DEADLINE_MARGIN", 60))
+
+
+class DeadlineExceeded(Exception):
+    """Raised when there's too little time left to start more work before the timeout"""
+
+
+class Deadline:
+    """Time limit for the current invocation, from a Lambda `context` or a number of
+    `seconds`.
+
+    Without either, the deadline never expires
+    """
+
+    def __init__(self, context=None, seconds=None, margin=DEADLINE_MARGIN):
+        if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+            seconds = context.get_remaining_time_in_millis() / 1000
+        self.ends_at = time.monotonic() + seconds - margin if seconds else None
+
+    def remaining(self) -> float:
+        """Seconds left to start new work"""
+        if self.ends_at is None:
+            return float("inf")
+        return self.ends_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self):
+        """Raise DeadlineExceeded if the deadline has passed"""
+        if self.expired():
+            raise DeadlineExceeded("Stopping before the Lambda timeout")
+
+
+_deadline = Deadline()
+
+
+def set_deadline(context=None, seconds=None, margin=DEADLINE_MARGIN) -> Deadline:
+    """Set the process-wide deadline, e.g. from the Lambda context of a handler"""
+    global _deadline
+    _deadline = Deadline(context, seconds, margin)
+    return _deadline
+
+
+def get_deadline() -> Deadline:
+    """Returns the process-wide deadline, which never expires unless it was set"""
+    return _deadline
+
+
+class Checkpoint:
+    """Progress of a resumable job, saved to a state store under `key` as it changes"""
+
+    def __init__(self, key, store=None):
+        self.key = key
+        self.store = store or get_state_store()
+        self.state = self.store.get(key) or {}
+        self.lock = threading.Lock()
+
+    def get(self, name, default=None):
+        return self.state.get(name, default)
+
+    def update(self, **values):
+        with self.lock:
+            self.state.update(values)
+            self.store.set(self.key, self.state)
+
+    def clear(self):
+        """Forget the job's progress once it's complete, so the next run starts over"""
+        with self.lock:
+            self.state = {}
+            self.store.delete(self.key)
@@ -4,6 +4,9 @@ import os
 
 AIRTABLE_KEY = os.getenv("AIRTABLE_KEY")
 AIRTABLE_BASE = os.getenv("AIRTABLE_BASE") # "CB CRM" base
+# "Last modified time" field in the People table, enables incremental loads of People
+# when set
+PEOPLE_MODIFIED_FIELD = os.getenv("PEOPLE_MODIFIED_FIELD")
 
 SOCIAL_BASE = os.getenv("SOCIAL_BASE")
 EDITORIAL_BASE = os.getenv("EDITORIAL_BASE", "applK7WF1q53lIBhH")
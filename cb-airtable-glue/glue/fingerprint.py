@@ -0,0 +1,250 @@
+"""Compact change detection for syncing records from other systems into Airtable.
+
+Instead of holding every Airtable record & comparing it field by field (see
+diff_fields), a ChangeIndex keeps a primary key -> (record ID, content hash) entry per
+record, hashing field values after normalizing them with a function compiled once per
+field from the table's field types. Incoming records are then checked with a single hash
+comparison.
+"""
+
+import hashlib
+import json
+import re
+from itertools import chain, islice
+
+import requests
+
+from glue.airtable_client import AirtableError, get_client
+
+# number of Airtable records used to infer field types when the schema isn't available
+SAMPLE_SIZE = 100
+
+DATETIME_RE = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}")
+
+NUMBER_TYPES = {
+    "autoNumber",
+    "count",
+    "currency",
+    "duration",
+    "number",
+    "percent",
+    "rating",
+}
+DATETIME_TYPES = {"createdTime", "dateTime", "lastModifiedTime"}
+
+_schemas = {}
+
+
+def get_table_schema(base, table):
+    """Returns a dict mapping field names to Airtable field types for `table` (name or
+    ID), or None if the schema can't be read, e.g. if the API key lacks the
+    schema.bases:read scope
+
+    Schemas are cached for the lifetime of the process, as is a failure to read a
+    base's schema (under `(base, None)`) so it's only requested once per base
+    """
+    if (base, table) not in _schemas and (base, None) not in _schemas:
+        try:
+            tables = get_client().get(base, "tables", meta=True)["tables"]
+        except (AirtableError, requests.RequestException) as e:
+            print(f"Could not load schema for {base}, inferring field types: {e}")
+            _schemas[(base, None)] = None
+            tables = []
+        for t in tables:
+            field_types = {f["name"]: f["type"] for f in t["fields"]}
+            _schemas[(base, t["id"])] = field_types
+            _schemas[(base, t["name"])] = field_types
+        _schemas.setdefault((base, table), None)
+    return _schemas.get((base, table))
+
+
+def infer_field_types(records):
+    """Guess Airtable field types from the values in a sample of records"""
+    field_types = {}
+    for record in records:
+        for key, value in record["fields"].items():
+            if key in field_types or value in (None, "", []):
+                continue
+            if isinstance(value, bool):
+                field_types[key] = "checkbox"
+            elif isinstance(value, (int, float)):
+                field_types[key] = "number"
+            elif isinstance(value, list):
+                field_types[key] = "multipleRecordLinks"
+            elif isinstance(value, str) and DATETIME_RE.match(value):
+                field_types[key] = "dateTime"
+            elif isinstance(value, str):
+                field_types[key] = "singleLineText"
+    return field_types
+
+
+def _empty(value):
+    """Airtable omits empty fields, so blank strings, empty lists & False are empty"""
+    return (
+        value is None
+        or value is False
+        or (isinstance(value, list) and len(value) == 0)
+        or (isinstance(value, str) and value.strip() == "")
+    )
+
+
+def normalize_value(value):
+    """Normalize a value of unknown type, following the same rules as diff_fields"""
+    if _empty(value):
+        return None
+    if isinstance(value, str) and DATETIME_RE.match(value):
+        return value[:19]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def normalize_number(value):
+    if _empty(value):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def normalize_datetime(value):
+    # Airtable returns datetimes with milliseconds, other systems usually don't
+    return None if _empty(value) else str(value)[:19]
+
+
+def normalize_date(value):
+    return None if _empty(value) else str(value)[:10]
+
+
+def normalize_empty(value):
+    return None if _empty(value) else value
+
+
+def compile_normalizers(field_types):
+    """Returns a dict mapping each field name to the normalizer for its type"""
+    normalizers = {}
+    for field, field_type in field_types.items():
+        if field_type in NUMBER_TYPES:
+            normalizers[field] = normalize_number
+        elif field_type in DATETIME_TYPES:
+            normalizers[field] = normalize_datetime
+        elif field_type == "date":
+            normalizers[field] = normalize_date
+        elif field_type in ("formula", "rollup", "lookup", "multipleLookupValues"):
+            # computed fields can return anything
+            normalizers[field] = normalize_value
+        else:
+            normalizers[field] = normalize_empty
+    return normalizers
+
+
+def fingerprint(values):
+    """Returns a short, stable hash of a list of JSON serializable values"""
+    content = json.dumps(values, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+
+class ContentFingerprint:
+    """Stable fingerprint of a sequence of records' fields, updated as they stream in"""
+
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=16)
+
+    def update(self, fields):
+        content = json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str)
+        self._hash.update(content.encode())
+        self._hash.update(b"\n")
+        return fields
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+class ChangeIndex:
+    """Maps the primary keys of Airtable records to their record ID & a hash of the
+    fields being synced.
+
+    Records from other systems only need to be compared on the fields they contain, so a
+    hash is kept for each distinct set of keys found in the incoming records (usually
+    just one)
+    """
+
+    def __init__(self, records, id_field, field_types=None):
+        self.id_field = id_field
+        self.keysets = list({tuple(sorted(r)): None for r in records})
+        self._keyset_positions = {keys: i for i, keys in enumerate(self.keysets)}
+        self.field_types = field_types
+        self.entries = {}
+
+    def _compile(self, field_types):
+        normalizers = compile_normalizers(field_types)
+        # resolve the normalizer for each key up front so hashing is a plain loop
+        self._keyset_normalizers = [
+            [(key, normalizers.get(key, normalize_value)) for key in keys]
+            for keys in self.keysets
+        ]
+
+    def _hash(self, fields, position):
+        return fingerprint(
+            [
+                normalize(fields.get(key))
+                for key, normalize in self._keyset_normalizers[position]
+            ]
+        )
+
+    def load(self, airtable_records):
+        """Index Airtable records, inferring field types from the first if needed"""
+        airtable_records = iter(airtable_records)
+        field_types = self.field_types
+        if field_types is None:
+            sample = list(islice(airtable_records, SAMPLE_SIZE))
+            field_types = infer_field_types(sample)
+            airtable_records = chain(sample, airtable_records)
+        self.field_types = field_types
+        self._compile(field_types)
+        positions = range(len(self.keysets))
+        for record in airtable_records:
+            if self.id_field in record["fields"]:
+                self.entries[record["fields"][self.id_field]] = (
+                    record["id"],
+                    tuple(self._hash(record["fields"], i) for i in positions),
+                )
+        return self
+
+    def __contains__(self, pk):
+        return pk in self.entries
+
+    def record_id(self, pk):
+        return self.entries[pk][0]
+
+    def changed(self, record):
+        """Whether `record` differs from the indexed record with the same primary key"""
+        position = self._keyset_positions[tuple(sorted(record))]
+        hashes = self.entries[record[self.id_field]][1]
+        return hashes[position] != self._hash(record, position)
+
+    def record_id_map(self):
+        return {pk: entry[0] for pk, entry in self.entries.items()}
+
+    def save(self) -> dict:
+        """The index as JSON serializable state, so a later run can finish loading it"""
+        return {
+            "keysets": [list(keys) for keys in self.keysets],
+            "field_types": self.field_types,
+            "entries": [
+                [pk, record_id, [h.hex() for h in hashes]]
+                for pk, (record_id, hashes) in self.entries.items()
+            ],
+        }
+
+    def matches(self, state: dict) -> bool:
+        """Whether an index saved by save() hashed the same fields the same way"""
+        keysets = [list(keys) for keys in self.keysets]
+        return state["keysets"] == keysets and state["field_types"] == self.field_types
+
+    def restore(self, state: dict):
+        """Add the entries of an index saved by save(), except keys loaded since"""
+        for pk, record_id, hashes in state["entries"]:
+            if pk not in self.entries:
+                self.entries[pk] = (record_id, tuple(bytes.fromhex(h) for h in hashes))
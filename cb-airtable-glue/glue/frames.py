@@ -0,0 +1,131 @@
+"""Builds pandas DataFrames straight from streams of Airtable records.
+
+FrameBuilder collects each record's fields into per-column lists in a single pass,
+flattening nested objects into dotted column names the same way pd.json_normalize does,
+so a table can be turned into a DataFrame without first holding the records, an
+intermediate DataFrame and the normalized copy of it in memory at once.
+"""
+
+import pandas as pd
+
+from glue.fingerprint import NUMBER_TYPES
+
+# string columns with fewer distinct values than this share of their rows are stored
+# as categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+
+def _is_attachment_list(value):
+    return bool(value) and all(
+        isinstance(v, dict) and "url" in v and "filename" in v for v in value
+    )
+
+
+LIST_RULES = {
+    "keep": lambda value: value,
+    "join": lambda value: ", ".join(str(v) for v in value),
+    "count": len,
+    "first": lambda value: value[0] if value else None,
+}
+
+ATTACHMENT_RULES = {
+    "keep": lambda value: value,
+    "url": lambda value: ", ".join(v["url"] for v in value),
+    "filename": lambda value: ", ".join(v["filename"] for v in value),
+    "count": len,
+}
+
+
+class FrameBuilder:
+    """Accumulates records' fields into typed, sorted DataFrame columns in one pass.
+
+    Args:
+        schema (dict, optional): field name -> Airtable field type (see
+            get_table_schema), used to type number columns & recognize attachment
+            fields. Defaults to None.
+        list_rule (str, optional): how to flatten list values, one of LIST_RULES.
+            Defaults to "keep", which leaves lists as they are, like pd.json_normalize.
+        attachment_rule (str, optional): how to flatten attachment lists, one of
+            ATTACHMENT_RULES. Defaults to "keep".
+        compact (bool, optional): store low-cardinality string columns as categoricals.
+            Defaults to False.
+        sep (str, optional): separator for the column names of nested object keys.
+            Defaults to ".".
+    """
+
+    def __init__(
+        self,
+        schema=None,
+        list_rule="keep",
+        attachment_rule="keep",
+        compact=False,
+        sep=".",
+    ):
+        self.schema = schema or {}
+        self.list_rule = LIST_RULES[list_rule]
+        self.attachment_rule = ATTACHMENT_RULES[attachment_rule]
+        self.compact = compact
+        self.sep = sep
+        self.columns = {}
+        self.rows = 0
+
+    def _set(self, column, value):
+        values = self.columns.get(column)
+        if values is None:
+            values = self.columns[column] = []
+        # pad rows the column was missing from
+        if len(values) < self.rows:
+            values.extend([None] * (self.rows - len(values)))
+        values.append(value)
+
+    def _add_value(self, column, value, field_type):
+        if isinstance(value, dict):
+            for key, nested_value in value.items():
+                self._add_value(f"{column}{self.sep}{key}", nested_value, None)
+        elif isinstance(value, list):
+            if field_type == "multipleAttachments" or (
+                field_type is None and _is_attachment_list(value)
+            ):
+                self._set(column, self.attachment_rule(value))
+            else:
+                self._set(column, self.list_rule(value))
+        else:
+            self._set(column, value)
+
+    def add(self, fields):
+        """Add one record's fields as a row"""
+        for field, value in fields.items():
+            self._add_value(field, value, self.schema.get(field))
+        self.rows += 1
+        return fields
+
+    def build(self) -> pd.DataFrame:
+        """Returns the DataFrame, with columns sorted by name"""
+        data = {}
+        for column in sorted(self.columns):
+            values = self.columns[column]
+            values.extend([None] * (self.rows - len(values)))
+            series = pd.Series(values)
+            if self.schema.get(column) in NUMBER_TYPES:
+                series = pd.to_numeric(series, errors="coerce")
+            elif self.compact and pd.api.types.is_string_dtype(series.dtype):
+                strings = series.dropna()
+                if (
+                    len(strings)
+                    and strings.map(type).eq(str).all()
+                    and strings.nunique() < CATEGORY_MAX_RATIO * len(strings)
+                ):
+                    series = series.astype("category")
+            data[column] = series
+            # release each column's list once it's been converted
+            self.columns[column] = None
+        self.columns = {}
+        return pd.DataFrame(data, index=pd.RangeIndex(self.rows))
+
+
+def records_to_frame(records, schema=None, **kwargs) -> pd.DataFrame:
+    """Build a DataFrame with sorted columns from Airtable records in one pass"""
+    builder = FrameBuilder(schema, **kwargs)
+    for record in records:
+        builder.add(record["fields"])
+    return builder.build()
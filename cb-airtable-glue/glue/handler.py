@@ -1,52 +1,84 @@
 """
-Contains functions needed for a lot of the backend processes completed by 
-other functions in the gluecode, such as setting up webhooks, 
-callback authorizations, and scripts to complete scheduled jobs. 
+Contains functions needed for a lot of the backend processes completed by
+other functions in the gluecode, such as setting up webhooks,
+callback authorizations, and scripts to complete scheduled jobs.
 Also functions which sync data from other systems with Airtable.
+
+Each handler imports only the integrations it uses, so a Lambda cold start only pays for
+the modules its own handler needs (e.g. webhooks don't load pandas & gspread). Run
+benchmarks/import_time.py to see the cold import cost of each handler.
 """
 
+import functools
 import json
 import os
 from datetime import datetime, timedelta
 
-import pytz
 import sentry_sdk
 from sentry_sdk.integrations.aws_lambda import AwsLambdaIntegration
 
-from glue.donorbox import sync_donorbox, sync_additional_donation_transaction_data
-from glue.google import create_yamm_google_sheet, standuply_contact_webhook  # noqa
-from glue.integrations import (
-    add_one_time_donor_to_mailchimp,
-    link_transactions,
-    membership_donor_slack,
-)
-from glue.mailchimp import handle_subscribe, handle_unsubscribe, sync_open_rate
-from glue.newsletters import update_newsletters
-from glue.operations import sync_leave_balance
-from glue.quickbooks import (
-    get_quickbooks_auth_url,
-    sync_bills,
-    update_quickbooks_auth_ssm,
+# sentry has to be initialized at import time for the Lambda integration to wrap the
+# handlers. Tracing is off unless SENTRY_TRACES_SAMPLE_RATE is set (serverless.yml sets
+# it for the crons), then each sampled invocation is sent as a transaction with the
+# spans of its Airtable & Sheets calls, see glue.telemetry
+TRACES_SAMPLE_RATE = os.getenv("SENTRY_TRACES_SAMPLE_RATE")
+sentry_sdk.init(
+    dsn=os.getenv("SENTRY_DSN"),
+    integrations=[AwsLambdaIntegration()],
+    traces_sample_rate=float(TRACES_SAMPLE_RATE) if TRACES_SAMPLE_RATE else None,
 )
-from glue.square import sync_square
-from glue.stripe import create_update_charge, sync_stripe
-from glue.paypal import sync_paypal
-from glue.airtable_to_sheets import sync_tables_to_sheets
 
-sentry_sdk.init(dsn=os.getenv("SENTRY_DSN"), integrations=[AwsLambdaIntegration()])
 
+def instrumented(handler):
+    """Log & report a summary of the Airtable & Sheets calls made by `handler`"""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        from glue.telemetry import telemetry
+
+        with telemetry.invocation(handler.__name__):
+            return handler(event, context)
+
+    return wrapper
+
+
+def resumable(handler):
+    """Stop `handler` before the Lambda timeout, leaving its checkpoints for next run"""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        from glue.checkpoint import DeadlineExceeded, set_deadline
 
+        set_deadline(context)
+        try:
+            return handler(event, context)
+        except DeadlineExceeded as e:
+            print(f"{e}, the next run will resume from here")
+
+    return wrapper
+
+
+@instrumented
+@resumable
 def donorbox_cron(event, context):
+    from glue.donorbox import sync_additional_donation_transaction_data, sync_donorbox
+
     sync_donorbox()
     sync_additional_donation_transaction_data(date_from=datetime.now() - timedelta(days=3),
                                               date_to=datetime.now())
 
 
+@instrumented
 def mailchimp_cron(event, context):
+    from glue.mailchimp import sync_open_rate
+
     sync_open_rate()
 
 
+@instrumented
 def mailchimp_webhook(event, context):
+    from glue.mailchimp import handle_subscribe, handle_unsubscribe
+
     data = json.loads(event["body"])
     if data["type"] == "subscribe":
         handle_subscribe(data)
@@ -59,14 +91,32 @@ def mailchimp_webhook(event, context):
 # TODO rename stripe_cron for clarity.
 
 
+@instrumented
+@resumable
 def stripe_cron(event, context):
-    sync_square()
-    sync_paypal(start_date=(datetime.now() - timedelta(days=2)),
-                end_date=datetime.now())
-    sync_stripe(since=datetime.now() - timedelta(days=2))
-
-
+    from glue.jobs import run_jobs
+    from glue.paypal import sync_paypal
+    from glue.square import sync_square
+    from glue.stripe import sync_stripe
+
+    run_jobs(
+        {
+            "sync_square": sync_square,
+            "sync_paypal": lambda: sync_paypal(
+                start_date=(datetime.now() - timedelta(days=2)), end_date=datetime.now()
+            ),
+            "sync_stripe": lambda: sync_stripe(
+                since=datetime.now() - timedelta(days=2)
+            ),
+        }
+    )
+
+
+@instrumented
 def stripe_webhook(event, context):
+    from glue.integrations import add_one_time_donor_to_mailchimp
+    from glue.stripe import create_update_charge
+
     data = json.loads(event["body"])
     if data["type"] == "charge.succeeded":
         charge = data["data"]["object"]
@@ -79,24 +129,51 @@ def slack_standup_cron(event, context):
     weekly_standup_report()
 
 
+@instrumented
 def slack_member_donor_cron(event, context):
+    from glue.integrations import membership_donor_slack
+
     membership_donor_slack()
 
 
+@instrumented
+@resumable
 def maintenance_cron(event, context):
-    link_transactions()
-    sync_tables_to_sheets()
+    from glue.airtable_to_sheets import sync_tables_to_sheets
+    from glue.integrations import link_transactions
+    from glue.jobs import run_jobs
+
+    def sync_sheets():
+        failed = [r for r in sync_tables_to_sheets() if r["status"] == "failed"]
+        if failed:
+            # raised after every table has been synced, run_jobs reports it to sentry
+            raise RuntimeError(
+                "Failed to sync tables to sheets: "
+                + ", ".join(f"{r['table']} ({r['error']})" for r in failed)
+            )
 
+    run_jobs(
+        {"link_transactions": link_transactions, "sync_tables_to_sheets": sync_sheets}
+    )
 
+
+@instrumented
 def leave_cron(event, context):
+    from glue.operations import sync_leave_balance
+
     sync_leave_balance()
 
 
+@instrumented
 def newsletter_analytics_cron(event, context):
+    from glue.newsletters import update_newsletters
+
     update_newsletters()
 
 
 def quickbooks_oauth(event, context):
+    from glue.quickbooks import get_quickbooks_auth_url
+
     return {
         "statusCode": "301",
         "headers": {"Location": get_quickbooks_auth_url()},
@@ -105,18 +182,26 @@ def quickbooks_oauth(event, context):
 
 
 def quickbooks_oauth_callback(event, context):
+    from glue.quickbooks import update_quickbooks_auth_ssm
+
     print(event)
     update_quickbooks_auth_ssm(event)
     return {"statusCode": "200", "body": json.dumps({"message": "Success"})}
 
 
 def quickbooks_cron(event, context):
+    import pytz
+
     tz = pytz.timezone("America/Chicago")
     utc_now = tz.localize(datetime.now()).astimezone(pytz.utc)
+    # from glue.quickbooks import sync_bills
     #sync_bills(modified_since=utc_now - timedelta(hours=24)) #### temporarily deprecated Dec 2022 per Eli & Harry, pending functionality updates
 
 
+@instrumented
 def google_sheets_yamm_post(event, context):
+    from glue.google import create_yamm_google_sheet
+
     data = json.loads(event["body"])
     sheet_data = create_yamm_google_sheet(data["name"], data["records"])
     return {
@@ -130,5 +215,12 @@ def google_sheets_yamm_post(event, context):
     }
 
 
+@instrumented
+def standuply_contact_webhook(event, context):
+    from glue.google import standuply_contact_webhook as google_webhook
+
+    return google_webhook(event, context)
+
+
 # def standuply_contact_webhook(event, context):
 #     return standuply_contact_tracing(event)
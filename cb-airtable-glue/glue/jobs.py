@@ -0,0 +1,96 @@
+"""Runs independent sync jobs from a handler concurrently.
+
+Most crons sync several unrelated sources, each mostly waiting on a different API, so
+running them side by side makes a cron take about as long as its slowest job instead of
+the sum of all of them. Airtable requests made by the jobs still share the per-base rate
+limits of the shared client (see glue.airtable_client).
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from glue.checkpoint import DeadlineExceeded
+
+JOB_WORKERS = 4
+
+_current = threading.local()
+
+
+class JobsFailed(Exception):
+    """Raised by run_jobs once every job has finished if any of them failed.
+
+    `results` holds the result dict of every job, see run_jobs
+    """
+
+    def __init__(self, results):
+        self.results = results
+        failed = [r for r in results if r["status"] == "failed"]
+        super().__init__(
+            f"{len(failed)} of {len(results)} jobs failed: "
+            + ", ".join(f"{r['job']} ({r['error']})" for r in failed)
+        )
+
+
+def current_job():
+    """Name of the job run_jobs is running in this thread, or None"""
+    return getattr(_current, "name", None)
+
+
+def _run_job(name, job):
+    """Run a job, returning its result dict & the exception it raised, if any"""
+    result = {"job": name}
+    error = None
+    start = time.monotonic()
+    _current.name = name
+    try:
+        job()
+        result["status"] = "ok"
+    except DeadlineExceeded as e:
+        result["status"] = "deferred"
+        error = e
+    except Exception as e:
+        import sentry_sdk
+
+        print(f"Error: {e} in {name}")
+        sentry_sdk.capture_exception(e)
+        result.update(status="failed", error=repr(e))
+        error = e
+    finally:
+        _current.name = None
+    result["seconds"] = round(time.monotonic() - start, 2)
+    print(f"{name}: {result['status']} in {result['seconds']}s")
+    return result, error
+
+
+def run_jobs(jobs: dict, max_workers: int = JOB_WORKERS) -> list:
+    """Run independent jobs concurrently, without letting one job's failure stop the
+    others.
+
+    Each job's exception is reported to Sentry separately as it happens. Once every job
+    has finished, JobsFailed is raised if any of them failed, so the handler still
+    fails, otherwise the DeadlineExceeded of a job stopped at the invocation's deadline
+    is raised again.
+
+    Args:
+        jobs (dict): job name -> function taking no arguments (use functools.partial or
+            a lambda to pass any)
+        max_workers (int, optional): jobs run at once. Defaults to JOB_WORKERS.
+
+    Returns:
+        list: a result dict per job, with its "job" name, "status" ("ok", "failed" or
+            "deferred" if it stopped at the invocation's deadline), "seconds" taken &
+            "error" if it failed
+    """
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        outcomes = list(executor.map(lambda item: _run_job(*item), jobs.items()))
+    results = [result for result, _ in outcomes]
+    errors = [error for _, error in outcomes if error is not None]
+    failures = [e for e in errors if not isinstance(e, DeadlineExceeded)]
+    if failures:
+        raise JobsFailed(results) from failures[0]
+    if errors:
+        raise errors[0]
+    return results
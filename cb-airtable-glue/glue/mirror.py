@@ -0,0 +1,224 @@
+"""Optional read-through mirror of Airtable tables in a local SQLite file.
+
+Tables registered with enable_mirror() are loaded into SQLite along with an index of the
+values in their lookup fields, so get_record_by_field & get_person_by_email can be
+answered locally instead of with a filterByFormula request per lookup. Mirrored tables
+are refreshed once they're older than the mirror's TTL, incrementally if a "Last
+modified time" field is configured, and records written through glue.airtable are
+written through to the mirror.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from glue.state import STATE_DIR
+
+MIRROR_PATH = os.getenv("GLUE_MIRROR_PATH", os.path.join(STATE_DIR, "mirror.db"))
+MIRROR_TTL = int(os.getenv("GLUE_MIRROR_TTL", 15 * 60))
+# deleted records can't be seen in incremental refreshes, so tables are fully reloaded
+# once a day
+MIRROR_MAX_AGE = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    base TEXT NOT NULL,
+    tbl TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (base, tbl, id)
+);
+CREATE TABLE IF NOT EXISTS lookups (
+    base TEXT NOT NULL,
+    tbl TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    folded TEXT NOT NULL,
+    id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lookups_value ON lookups (base, tbl, field, value);
+CREATE INDEX IF NOT EXISTS lookups_folded ON lookups (base, tbl, field, folded);
+CREATE INDEX IF NOT EXISTS lookups_id ON lookups (base, tbl, id);
+CREATE TABLE IF NOT EXISTS refreshes (
+    base TEXT NOT NULL,
+    tbl TEXT NOT NULL,
+    refreshed_at REAL NOT NULL,
+    loaded_at REAL NOT NULL,
+    watermark TEXT,
+    PRIMARY KEY (base, tbl)
+);
+"""
+
+
+def lookup_key(value):
+    """String used to index & look up a field value, so e.g. 5 and 5.0 match"""
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (int, float)):
+        return repr(float(value))
+    return str(value)
+
+
+class AirtableMirror:
+    """Local SQLite copy of selected Airtable tables, indexed on their lookup fields"""
+
+    def __init__(self, path=MIRROR_PATH, ttl=MIRROR_TTL):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl
+        self.tables = {}
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def add_table(self, base, table, lookup_fields, modified_field=None):
+        """Mirror `table` indexed by `lookup_fields`, refreshed by `modified_field`"""
+        with self.lock:
+            self.tables[(base, table)] = {
+                "lookup_fields": list(lookup_fields),
+                "modified_field": modified_field,
+            }
+            # the lookup fields may have changed since the table was last loaded
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM refreshes WHERE base = ? AND tbl = ?", (base, table)
+                )
+
+    def mirrors(self, base, table, field=None):
+        """Returns True if `table` (and `field`, if given) is mirrored"""
+        config = self.tables.get((base, table))
+        return config is not None and (
+            field is None or field in config["lookup_fields"]
+        )
+
+    def _index_rows(self, base, table, record):
+        for field in self.tables[(base, table)]["lookup_fields"]:
+            values = record["fields"].get(field)
+            for value in values if isinstance(values, list) else [values]:
+                if value is not None:
+                    key = lookup_key(value)
+                    yield (base, table, field, key, key.casefold(), record["id"])
+
+    def _write_records(self, base, table, records):
+        for record in records:
+            self.conn.execute(
+                "DELETE FROM lookups WHERE base = ? AND tbl = ? AND id = ?",
+                (base, table, record["id"]),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO records (base, tbl, id, data) "
+                "VALUES (?, ?, ?, ?)",
+                (base, table, record["id"], json.dumps(record)),
+            )
+            self.conn.executemany(
+                "INSERT INTO lookups (base, tbl, field, value, folded, id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                list(self._index_rows(base, table, record)),
+            )
+
+    def refresh(self, base, table, force=False):
+        """Reload `table` once it's older than the TTL, incrementally when possible"""
+        from glue.airtable import iter_table, modified_since_formula
+
+        modified_field = self.tables[(base, table)]["modified_field"]
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT refreshed_at, loaded_at, watermark FROM refreshes "
+                "WHERE base = ? AND tbl = ?",
+                (base, table),
+            ).fetchone()
+            now = time.time()
+            if row and not force and now - row[0] < self.ttl:
+                return
+            full_reload = (
+                force or row is None or row[2] is None or now - row[1] > MIRROR_MAX_AGE
+            )
+            if full_reload:
+                records = iter_table(base, table)
+                watermark = None
+                loaded_at = now
+            else:
+                records = iter_table(
+                    base, table, formula=modified_since_formula(modified_field, row[2])
+                )
+                watermark = row[2]
+                loaded_at = row[1]
+            with self.conn:
+                if full_reload:
+                    self.conn.execute(
+                        "DELETE FROM records WHERE base = ? AND tbl = ?", (base, table)
+                    )
+                    self.conn.execute(
+                        "DELETE FROM lookups WHERE base = ? AND tbl = ?", (base, table)
+                    )
+                for record in records:
+                    self._write_records(base, table, [record])
+                    modified = (
+                        record["fields"].get(modified_field) if modified_field else None
+                    )
+                    if modified and (watermark is None or modified > watermark):
+                        watermark = modified
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO refreshes "
+                    "(base, tbl, refreshed_at, loaded_at, watermark) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (base, table, now, loaded_at, watermark),
+                )
+
+    def get_by_fields(self, base, table, fields, value, casefold=False):
+        """Returns the first mirrored record with any of `fields` equal to `value`"""
+        self.refresh(base, table)
+        key = lookup_key(value)
+        column, key = ("folded", key.casefold()) if casefold else ("value", key)
+        placeholders = ", ".join("?" for _ in fields)
+        with self.lock:
+            # the oldest record first, like Airtable's default order. Not rowid, which
+            # changes when INSERT OR REPLACE writes an updated record
+            row = self.conn.execute(
+                "SELECT r.data FROM lookups l JOIN records r "
+                "ON r.base = l.base AND r.tbl = l.tbl AND r.id = l.id "
+                f"WHERE l.base = ? AND l.tbl = ? AND l.field IN ({placeholders}) "
+                f"AND l.{column} = ? "
+                "ORDER BY json_extract(r.data, '$.createdTime'), r.id LIMIT 1",
+                (base, table, *fields, key),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def write_through(self, base, table, records):
+        """Store records returned by Airtable after a create or update"""
+        if not self.mirrors(base, table):
+            return
+        with self.lock, self.conn:
+            self._write_records(base, table, [r for r in records if r.get("fields")])
+
+    def delete_through(self, base, table, record_ids):
+        if not self.mirrors(base, table):
+            return
+        with self.lock, self.conn:
+            for record_id in record_ids:
+                for sql_table in ("records", "lookups"):
+                    self.conn.execute(
+                        f"DELETE FROM {sql_table} "
+                        "WHERE base = ? AND tbl = ? AND id = ?",
+                        (base, table, record_id),
+                    )
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def enable_mirror(base, table, lookup_fields, modified_field=None, path=MIRROR_PATH):
+    """Mirror `table` so lookups on `lookup_fields` are answered without API calls"""
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = AirtableMirror(path)
+        _mirror.add_table(base, table, lookup_fields, modified_field)
+    return _mirror
+
+
+def get_mirror():
+    """Returns the process-wide mirror, or None if no tables are mirrored"""
+    return _mirror
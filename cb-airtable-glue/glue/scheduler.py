@@ -0,0 +1,130 @@
+"""Staleness-aware scheduling of the tables in a sync manifest.
+
+Each manifest entry is a dict describing one table to sync, with its "base", "table" &
+"spreadsheet_key", plus optional "min_interval" (seconds between syncs,
+DEFAULT_MIN_INTERVAL by default) & "priority" (higher first, 0 by default). A
+SyncScheduler keeps stats for each entry in the state store: when it last ran, how long
+it takes & how often a run finds it changed.
+
+On each invocation, plan() picks the entries that are due, highest priority & then
+cheapest first, until their estimated cost fills the invocation's time budget, and
+record() updates the stats with each run's result. Tables that are usually unchanged
+back off towards MAX_BACKOFF times their min_interval, so they stop using API quota &
+cron time the busy tables need.
+"""
+
+import os
+import threading
+import time
+
+from glue.checkpoint import get_deadline
+from glue.state import get_state_store, warn_if_ephemeral
+
+DEFAULT_MIN_INTERVAL = 3 * 60 * 60
+# a table that never changes is synced this many times less often than its min_interval
+MAX_BACKOFF = int(os.getenv("SYNC_MAX_BACKOFF", 8))
+# tables are due this many seconds early, so a cron firing slightly early doesn't skip a
+# whole period
+SCHEDULE_SLACK = 10 * 60
+# weight of the latest run in the moving averages of duration & change rate
+SMOOTHING = 0.3
+# estimated seconds to sync a table that hasn't been synced before
+DEFAULT_COST = 60
+
+
+def entry_key(entry: dict) -> str:
+    return f"{entry['spreadsheet_key']}/{entry['table']}"
+
+
+class SyncScheduler:
+    """Plans & records runs of the entries in `manifest`, saving stats in `store`"""
+
+    def __init__(self, manifest: list, store=None, key="schedule/sheets"):
+        self.manifest = manifest
+        if store is None:
+            warn_if_ephemeral("sync schedule stats")
+        self.store = store or get_state_store()
+        self.key = key
+        self.stats = self.store.get(key) or {}
+        self.lock = threading.Lock()
+
+    def interval(self, entry: dict) -> float:
+        """Seconds between syncs of `entry`, min_interval stretched if rarely changed"""
+        min_interval = entry.get("min_interval", DEFAULT_MIN_INTERVAL)
+        change_rate = self.stats.get(entry_key(entry), {}).get("change_rate", 1.0)
+        return min_interval / max(change_rate, 1 / MAX_BACKOFF)
+
+    def cost(self, entry: dict) -> float:
+        """Estimated seconds to sync `entry`, from the durations of its last runs"""
+        return self.stats.get(entry_key(entry), {}).get("seconds", DEFAULT_COST)
+
+    def is_due(self, entry: dict, now: float = None) -> bool:
+        last_run = self.stats.get(entry_key(entry), {}).get("last_run")
+        if last_run is None:
+            return True
+        now = time.time() if now is None else now
+        return now - last_run >= self.interval(entry) - SCHEDULE_SLACK
+
+    def plan(self, budget: float = None, workers: int = 1, now: float = None):
+        """Pick the entries to sync this invocation.
+
+        Args:
+            budget (float, optional): seconds available, defaults to the time left
+                before the invocation's deadline (see glue.checkpoint)
+            workers (int, optional): entries synced at once, which multiplies the
+                budget. Defaults to 1.
+            now (float, optional): current Unix time. Defaults to time.time().
+
+        Returns:
+            tuple: the entries to run in order, the entries that are due but don't fit
+                in the budget & the entries that aren't due
+        """
+        budget = get_deadline().remaining() if budget is None else budget
+        due, not_due = [], []
+        for entry in self.manifest:
+            (due if self.is_due(entry, now) else not_due).append(entry)
+        due.sort(key=lambda entry: (-entry.get("priority", 0), self.cost(entry)))
+
+        run, deferred = [], []
+        remaining = budget * workers
+        for entry in due:
+            # the first entry always runs, so a table estimated to take longer than
+            # the whole budget isn't starved
+            if not run or self.cost(entry) <= remaining:
+                run.append(entry)
+                remaining -= self.cost(entry)
+            else:
+                deferred.append(entry)
+        return run, deferred, not_due
+
+    def record(self, entry: dict, status: str, seconds: float, started: float):
+        """Update `entry`'s stats with the result of a run that started at Unix time
+        `started`.
+
+        "written" & "skipped" (unchanged) runs update its change rate & last run, failed
+        runs only its cost, so it's retried next time, and deferred runs aren't recorded
+        """
+        if status not in ("written", "skipped", "failed"):
+            return
+        with self.lock:
+            stats = dict(self.stats.get(entry_key(entry), {}))
+            runs = stats.get("runs", 0)
+            stats["seconds"] = round(
+                seconds
+                if "seconds" not in stats
+                else SMOOTHING * seconds + (1 - SMOOTHING) * stats["seconds"],
+                2,
+            )
+            if status != "failed":
+                changed = 1.0 if status == "written" else 0.0
+                stats["change_rate"] = round(
+                    changed
+                    if not runs
+                    else SMOOTHING * changed + (1 - SMOOTHING) * stats["change_rate"],
+                    3,
+                )
+                stats["runs"] = runs + 1
+                stats["last_run"] = started
+            self.stats[entry_key(entry)] = stats
+            stats["interval"] = round(self.interval(entry))
+            self.store.set(self.key, self.stats)
@@ -0,0 +1,131 @@
+"""Incremental writes of a DataFrame to a Google Sheet tab.
+
+Rather than clearing & rewriting the whole tab, the DataFrame is rendered to the same
+grid of cell values gspread_pandas' df_to_sheet would write, compared with the grid
+written last time (cached in the state store), and only the changed cells, appended rows
+& removed rows are written, with batched values updates (see SheetWriter.update_ranges).
+
+If there's no cached grid, or the header row changed (i.e. columns were added, removed
+or reordered), the tab is fully replaced instead (see glue.sheet_writer), so the sorted
+column order the Looker Studio connection depends on is kept.
+
+Rows are compared by position, not record ID, so removing or inserting a row shifts
+every row below it & they all look changed. Once more than MAX_CHANGED_ROWS of the rows
+differ, the tab is replaced too, as that's cheaper than updating nearly every cell.
+"""
+
+from gspread.utils import rowcol_to_a1
+from gspread_pandas.util import fillna
+
+from glue.state import get_state_store, warn_if_ephemeral
+from glue.telemetry import telemetry
+
+# fraction of the existing rows that can change before the tab is replaced instead
+MAX_CHANGED_ROWS = 0.5
+
+
+def frame_to_grid(df) -> list:
+    """Render a DataFrame to rows of cells, the way df_to_sheet(df, index=True) does"""
+    df = fillna(df.reset_index(), "")
+    return [[str(col) for col in df.columns]] + [
+        [str(val) for val in row] for row in df.values.tolist()
+    ]
+
+
+def diff_grids(old: list, new: list) -> list:
+    """Compare two grids of cell values with the same header row.
+
+    Args:
+        old (list): rows of cell values currently in the sheet
+        new (list): rows of cell values to write
+
+    Returns:
+        list: value ranges (dicts with A1 "range" & "values") covering every changed
+            cell in existing rows, runs of adjacent changed cells merged, plus one range
+            for appended rows
+    """
+    updates = []
+    for row_number, (old_row, new_row) in enumerate(zip(old, new), start=1):
+        run_start = None
+        for col_number in range(1, len(new_row) + 2):
+            changed = col_number <= len(new_row) and (
+                col_number > len(old_row)
+                or old_row[col_number - 1] != new_row[col_number - 1]
+            )
+            if changed and run_start is None:
+                run_start = col_number
+            elif not changed and run_start is not None:
+                updates.append(
+                    {
+                        "range": f"{rowcol_to_a1(row_number, run_start)}:"
+                        f"{rowcol_to_a1(row_number, col_number - 1)}",
+                        "values": [new_row[run_start - 1 : col_number - 1]],
+                    }
+                )
+                run_start = None
+    if len(new) > len(old):
+        updates.append(
+            {
+                "range": f"{rowcol_to_a1(len(old) + 1, 1)}:"
+                f"{rowcol_to_a1(len(new), len(new[0]))}",
+                "values": new[len(old) :],
+            }
+        )
+    return updates
+
+
+def changed_rows(old: list, new: list) -> int:
+    """Count the rows below the header that differ between two grids, including rows
+    removed from the end (appended rows aren't counted)
+    """
+    shared = min(len(old), len(new))
+    return sum(a != b for a, b in zip(old[1:shared], new[1:shared])) + max(
+        len(old) - len(new), 0
+    )
+
+
+def write_sheet_incremental(writer, df, sheet: str, store=None):
+    """Write a DataFrame to a sheet tab, only updating the cells that changed since the
+    last write.
+
+    Args:
+        writer (glue.sheet_writer.SheetWriter): writer for the spreadsheet to write to
+        df (pandas.DataFrame): data to write, with columns in their final order
+        sheet (str): tab name, also used to key the cached copy of the tab
+        store (optional): state store for the cached copy, defaults to
+            get_state_store(large=True)
+
+    Returns:
+        int: number of value ranges written, or -1 if the tab was fully replaced
+    """
+    if store is None:
+        warn_if_ephemeral("cached sheet grids", large=True)
+    store = store or get_state_store(large=True)
+    spreadsheet_key = writer.spreadsheet_key
+    cache_key = f"sheets/{spreadsheet_key}/{sheet}/grid"
+    grid = frame_to_grid(df)
+    old_grid = store.get(cache_key)
+    # without the grid written last time, the tab is replaced rather than diffed against
+    # its current values, which are formatted for display ("1,000", "TRUE") so rarely
+    # match
+    if (
+        not old_grid
+        or old_grid[0] != grid[0]
+        or changed_rows(old_grid, grid) > MAX_CHANGED_ROWS * (len(old_grid) - 1)
+    ):
+        writer.write_grid(grid, sheet)
+        store.set(cache_key, grid)
+        return -1
+
+    updates = diff_grids(old_grid, grid)
+    worksheet = writer.worksheet(sheet)
+    if len(grid) != len(old_grid):
+        # drops removed rows from the bottom of the tab, or makes room for appended rows
+        writer.bucket.acquire()
+        with telemetry.call("sheets", "resize", spreadsheet_key, sheet):
+            worksheet.resize(rows=len(grid))
+    if updates:
+        # sent in chunks, since appended rows can be most of the table
+        writer.update_ranges(sheet, updates)
+    store.set(cache_key, grid)
+    return len(updates)
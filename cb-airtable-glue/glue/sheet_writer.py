@@ -0,0 +1,258 @@
+"""Writes DataFrames to Google Sheet tabs, reusing one authenticated client & open
+spreadsheet.
+
+Opening a gspread_pandas Spread per table re-authenticates & re-fetches the
+spreadsheet's metadata every time, and df_to_sheet sends the whole table in a single
+request. A SheetWriter authenticates once per process, opens each spreadsheet once,
+caches its tabs & writes a table by:
+
+    1. creating a staging tab sized to the table,
+    2. uploading the rows to it in chunks of about CHUNK_CELLS cells, several at once,
+       within the spreadsheet's write quota,
+    3. swapping the data into the real tab with one batchUpdate that resizes the tab,
+       copies the staging tab over it & deletes the staging tab, so dashboards reading
+       the tab never see it half written. If anything fails before the swap, the tab is
+       left as it was.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread_pandas as gsp
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
+
+from glue.airtable_client import TokenBucket
+from glue.sheet_diff import frame_to_grid
+from glue.telemetry import telemetry
+
+# Google Sheets allows 60 write requests per minute, so each spreadsheet is written at
+# most once a second
+SHEETS_REQUESTS_PER_SECOND = 1
+# cells uploaded per request, keeping requests well under the Sheets API's size limits
+CHUNK_CELLS = int(os.getenv("SHEETS_CHUNK_CELLS", 50000))
+# chunk uploads in flight at once for each table
+UPLOAD_WORKERS = 4
+STAGING_SUFFIX = " (syncing)"
+
+_client = None
+_client_lock = threading.Lock()
+_sheets_buckets = {}
+_sheets_buckets_lock = threading.Lock()
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def sheets_bucket(spreadsheet_key: str) -> TokenBucket:
+    """Returns the rate limiter shared by every write to a spreadsheet"""
+    with _sheets_buckets_lock:
+        if spreadsheet_key not in _sheets_buckets:
+            _sheets_buckets[spreadsheet_key] = TokenBucket(SHEETS_REQUESTS_PER_SECOND)
+        return _sheets_buckets[spreadsheet_key]
+
+
+def open_spreadsheet(spreadsheet_key: str, config=None):
+    """Open a spreadsheet with the process-wide gspread_pandas client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = gsp.Client(config=config)
+    return _client.open_by_key(spreadsheet_key)
+
+
+class SheetWriter:
+    """Writes DataFrames to the tabs of one spreadsheet, see the module docstring"""
+
+    def __init__(self, spreadsheet_key, config=None, chunk_cells=CHUNK_CELLS):
+        self.spreadsheet_key = spreadsheet_key
+        self.config = config
+        self.chunk_cells = chunk_cells
+        self.bucket = sheets_bucket(spreadsheet_key)
+        self.lock = threading.RLock()
+        self._spreadsheet = None
+        self._worksheets = None
+
+    @property
+    def spreadsheet(self):
+        with self.lock:
+            if self._spreadsheet is None:
+                with telemetry.call("sheets", "open", self.spreadsheet_key):
+                    self._spreadsheet = open_spreadsheet(
+                        self.spreadsheet_key, self.config
+                    )
+                    self._worksheets = {
+                        ws.title: ws for ws in self._spreadsheet.worksheets()
+                    }
+            return self._spreadsheet
+
+    @property
+    def worksheets(self) -> dict:
+        """The spreadsheet's tabs by title, listed once & then kept up to date"""
+        self.spreadsheet
+        return self._worksheets
+
+    def _add_worksheet(self, title, rows, cols):
+        with self.lock:
+            self.bucket.acquire()
+            with telemetry.call("sheets", "add_worksheet", self.spreadsheet_key, title):
+                worksheet = self.spreadsheet.add_worksheet(
+                    title=title, rows=rows, cols=cols
+                )
+            self.worksheets[title] = worksheet
+            return worksheet
+
+    def worksheet(self, title, create=True):
+        """Returns the cached tab `title`, creating it if missing & `create` is set"""
+        with self.lock:
+            worksheet = self.worksheets.get(title)
+            if worksheet is None and create:
+                worksheet = self._add_worksheet(title, 1, 1)
+            return worksheet
+
+    def _delete_worksheet(self, title):
+        with self.lock:
+            worksheet = self.worksheets.pop(title, None)
+            if worksheet is not None:
+                self.bucket.acquire()
+                with telemetry.call(
+                    "sheets", "del_worksheet", self.spreadsheet_key, title
+                ):
+                    self.spreadsheet.del_worksheet(worksheet)
+
+    def _upload(self, title, start_row, rows):
+        self.bucket.acquire()
+        with telemetry.call("sheets", "values_update", self.spreadsheet_key, title):
+            self.spreadsheet.values_update(
+                f"'{title}'!A{start_row}",
+                params={"valueInputOption": "USER_ENTERED"},
+                body={"values": rows},
+            )
+
+    def write_grid(self, grid: list, title: str):
+        """Replace the contents of tab `title` with the rows of cell values in `grid`"""
+        rows, cols = len(grid), max(len(row) for row in grid)
+        staging_title = f"{title}{STAGING_SUFFIX}"
+        # a staging tab left behind by a run that failed partway
+        self._delete_worksheet(staging_title)
+        staging = self._add_worksheet(staging_title, rows, cols)
+        try:
+            chunk_rows = max(1, self.chunk_cells // cols)
+            with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+                uploads = [
+                    executor.submit(
+                        self._upload,
+                        staging_title,
+                        start + 1,
+                        grid[start : start + chunk_rows],
+                    )
+                    for start in range(0, rows, chunk_rows)
+                ]
+                for upload in uploads:
+                    upload.result()
+            target = self.worksheet(title)
+            grid_range = {
+                "startRowIndex": 0,
+                "endRowIndex": rows,
+                "startColumnIndex": 0,
+                "endColumnIndex": cols,
+            }
+            self.bucket.acquire()
+            with telemetry.call("sheets", "swap", self.spreadsheet_key, title):
+                self.spreadsheet.batch_update(
+                    {
+                        "requests": [
+                            {
+                                "updateSheetProperties": {
+                                    "properties": {
+                                        "sheetId": target.id,
+                                        "gridProperties": {
+                                            "rowCount": rows,
+                                            "columnCount": cols,
+                                        },
+                                    },
+                                    "fields": "gridProperties.rowCount,"
+                                    "gridProperties.columnCount",
+                                }
+                            },
+                            {
+                                "copyPaste": {
+                                    "source": {"sheetId": staging.id, **grid_range},
+                                    "destination": {"sheetId": target.id, **grid_range},
+                                    "pasteType": "PASTE_NORMAL",
+                                }
+                            },
+                            {"deleteSheet": {"sheetId": staging.id}},
+                        ]
+                    }
+                )
+            with self.lock:
+                self.worksheets.pop(staging_title, None)
+        except Exception:
+            self._delete_worksheet(staging_title)
+            raise
+
+    def _split_ranges(self, updates: list) -> list:
+        """Split value ranges (dicts with A1 "range" & "values") into batches of up to
+        about chunk_cells cells, splitting larger ranges by rows
+        """
+        batches, batch, cells = [], [], 0
+        for update in updates:
+            start = update["range"].split(":")[0]
+            row, col = a1_to_rowcol(start)
+            values = update["values"]
+            width = max(1, max(len(line) for line in values))
+            chunk_rows = max(1, self.chunk_cells // width)
+            for offset in range(0, len(values), chunk_rows):
+                chunk = values[offset : offset + chunk_rows]
+                chunk_cells = width * len(chunk)
+                if batch and cells + chunk_cells > self.chunk_cells:
+                    batches.append(batch)
+                    batch, cells = [], 0
+                first, last = row + offset, row + offset + len(chunk) - 1
+                batch.append(
+                    {
+                        "range": f"{rowcol_to_a1(first, col)}:"
+                        f"{rowcol_to_a1(last, col + width - 1)}",
+                        "values": chunk,
+                    }
+                )
+                cells += chunk_cells
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _update_batch(self, worksheet, batch):
+        self.bucket.acquire()
+        with telemetry.call(
+            "sheets", "batch_update", self.spreadsheet_key, worksheet.title
+        ):
+            worksheet.batch_update(batch, value_input_option="USER_ENTERED")
+
+    def update_ranges(self, title: str, updates: list):
+        """Write value ranges to tab `title` in place, in batches of up to about
+        chunk_cells cells sent several at once, within the spreadsheet's write quota
+
+        Args:
+            title (str): tab name
+            updates (list): value ranges, dicts with an A1 "range" & rows of "values"
+        """
+        worksheet = self.worksheet(title)
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+            writes = [
+                executor.submit(self._update_batch, worksheet, batch)
+                for batch in self._split_ranges(updates)
+            ]
+            for write in writes:
+                write.result()
+
+    def write(self, df, title: str):
+        """Replace tab `title` with a DataFrame, like df_to_sheet(df, replace=True)"""
+        self.write_grid(frame_to_grid(df), title)
+
+
+def get_sheet_writer(spreadsheet_key: str, config=None) -> SheetWriter:
+    """Returns the process-wide writer for a spreadsheet, so it's only opened once"""
+    with _writers_lock:
+        if spreadsheet_key not in _writers:
+            _writers[spreadsheet_key] = SheetWriter(spreadsheet_key, config)
+        return _writers[spreadsheet_key]
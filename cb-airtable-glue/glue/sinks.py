@@ -0,0 +1,558 @@
+"""Export sinks that receive an Airtable table's records in batches as they stream in.
+
+export_table() downloads a table once & feeds it to any number of sinks, a batch of up
+to SINK_BATCH_SIZE records at a time, so file exports hold one batch in memory rather
+than the table:
+
+    sinks = [SheetsSink(sheet_key), ParquetSink(), SQLiteSink()]
+    export_table(base, "Donations", sinks)
+
+Built in sinks write to a Google Sheet tab (SheetsSink, which still needs the whole
+table to write the tab), a CSV file, a Parquet file (a row group per batch) or a table
+in a SQLite database. File sinks write to GLUE_EXPORT_DIR, only replace the last export
+once the new one is complete, and upload finished exports to GLUE_EXPORT_BUCKET when
+it's set, so analytics tools can read snapshots of a table without going through the
+Sheet.
+
+A sink implements open(), write(), commit() & abort(), see Sink.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from urllib.parse import quote
+
+from glue.airtable import iter_table
+from glue.fingerprint import NUMBER_TYPES, ContentFingerprint, get_table_schema
+from glue.state import get_state_store, warn_if_ephemeral
+
+# records passed to the sinks at a time, which bounds the memory file exports use
+SINK_BATCH_SIZE = int(os.getenv("SINK_BATCH_SIZE", 5000))
+EXPORT_DIR = os.getenv(
+    "GLUE_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "glue-exports")
+)
+EXPORT_BUCKET = os.getenv("GLUE_EXPORT_BUCKET")
+EXPORT_PREFIX = f"{os.getenv('STAGE', 'prod')}/airtableGlue/exports"
+
+
+class Sink:
+    """Receives one table's records, from open() to commit() or abort().
+
+    Sinks are used for one export at a time, but can be reused for the next one
+    """
+
+    # state store key for the sink's destination, used to skip writing unchanged tables
+    key = None
+
+    def open(self, base: str, table: str, schema: dict = None):
+        """Start an export of `table`, with its field name -> field type `schema`"""
+        self.base = base
+        self.table = table
+        self.schema = schema
+
+    def write(self, batch: list):
+        """Write a batch of records' fields"""
+        raise NotImplementedError
+
+    def commit(self):
+        """Finish the export, replacing the last one"""
+        raise NotImplementedError
+
+    def abort(self):
+        """Discard the export, leaving the last one as it was"""
+
+
+class SheetsSink(Sink):
+    """Writes the table to a Sheet tab named after it, see sync_airtable_to_sheets"""
+
+    def __init__(self, spreadsheet_key: str, config=None, incremental_write=False):
+        self.spreadsheet_key = spreadsheet_key
+        self.config = config
+        self.incremental_write = incremental_write
+
+    def open(self, base, table, schema=None):
+        from glue.frames import FrameBuilder
+
+        super().open(base, table, schema)
+        self.key = f"sheets/{self.spreadsheet_key}/{table}"
+        # unnest the fields into sorted, typed dataframe columns (sorted columns
+        # preserve order when replacing the sheet, otherwise the looker studio
+        # connection breaks)
+        self.builder = FrameBuilder(schema=schema, compact=True)
+
+    def write(self, batch):
+        for fields in batch:
+            self.builder.add(fields)
+
+    def commit(self):
+        from glue.sheet_diff import write_sheet_incremental
+        from glue.sheet_writer import get_sheet_writer
+
+        df = self.builder.build()
+        self.builder = None
+        writer = get_sheet_writer(self.spreadsheet_key, config=self.config)
+        if self.incremental_write:
+            # write only the changed cells, falling back to replacing the tab if the
+            # columns changed
+            write_sheet_incremental(writer, df, self.table)
+        else:
+            # upload the dataframe to a staging tab in chunks, then swap it in for the
+            # current data
+            writer.write(df, self.table)
+
+    def abort(self):
+        self.builder = None
+
+
+def _cell(value):
+    """Flatten a field value to a scalar, serializing lists & objects as JSON"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+class FileSink(Sink):
+    """Base for sinks exporting each table to a file in `directory`, named after the
+    base & table.
+
+    The export is written to a temporary file that replaces the last export on commit,
+    then uploaded to `bucket` (if set) under `prefix`
+    """
+
+    extension = None
+
+    def __init__(
+        self, directory=EXPORT_DIR, bucket=EXPORT_BUCKET, prefix=EXPORT_PREFIX
+    ):
+        self.directory = directory
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def open(self, base, table, schema=None):
+        super().open(base, table, schema)
+        self.path = os.path.join(
+            self.directory, base, f"{quote(table, safe=' ')}.{self.extension}"
+        )
+        self.key = f"exports/{os.path.relpath(self.path, self.directory)}"
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+        os.close(fd)
+        self.columns = sorted(schema) if schema else []
+
+    def rows(self, batch):
+        """Returns the batch as rows of cell values in the order of `columns`.
+
+        Fields that aren't in `columns` yet (fields missing from the schema, or every
+        field when there's no schema) are appended to it, sorted, so rows of earlier
+        batches are shorter than later ones
+        """
+        new = {field for fields in batch for field in fields} - set(self.columns)
+        self.columns += sorted(new)
+        return [
+            [_cell(fields.get(column)) for column in self.columns] for fields in batch
+        ]
+
+    def upload(self, path):
+        import boto3
+
+        boto3.client("s3").upload_file(
+            path,
+            self.bucket,
+            f"{self.prefix}/{os.path.relpath(self.path, self.directory)}",
+        )
+
+    def commit(self):
+        os.replace(self.tmp_path, self.path)
+        if self.bucket:
+            self.upload(self.path)
+
+    def abort(self):
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class CSVSink(FileSink):
+    """Exports the table to a CSV file with a header row.
+
+    Rows are written to a temporary file as they come in & copied after the header on
+    commit, once every column is known, padding the rows written before a column
+    appeared
+    """
+
+    extension = "csv"
+
+    def open(self, base, table, schema=None):
+        super().open(base, table, schema)
+        self.rows_path = f"{self.tmp_path}.rows"
+        self.file = open(self.rows_path, "w", newline="")
+        self.writer = csv.writer(self.file)
+
+    def write(self, batch):
+        if batch:
+            self.writer.writerows(self.rows(batch))
+
+    def commit(self):
+        self.file.close()
+        with open(self.rows_path, newline="") as rows, open(
+            self.tmp_path, "w", newline=""
+        ) as file:
+            writer = csv.writer(file)
+            if self.columns:
+                writer.writerow(self.columns)
+            width = len(self.columns)
+            for row in csv.reader(rows):
+                writer.writerow(row + [""] * (width - len(row)))
+        os.remove(self.rows_path)
+        super().commit()
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.rows_path)
+        except FileNotFoundError:
+            pass
+        super().abort()
+
+
+class ParquetSink(FileSink):
+    """Exports the table to a Parquet file, writing a row group per batch.
+
+    Number fields are stored as doubles, checkboxes as booleans & everything else as
+    strings. A batch bringing new columns starts a new part file, and parts are merged
+    into one file on commit, with nulls for the columns a part is missing.
+
+    Requires pyarrow, which isn't in the Lambda package since with pandas & numpy it's
+    close to Lambda's 250MB limit: deploy it in a layer (e.g. AWS SDK for pandas) to
+    export to Parquet
+    """
+
+    extension = "parquet"
+
+    def __init__(self, *args, compression="snappy", **kwargs):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "ParquetSink requires pyarrow, which isn't in the Lambda package, "
+                "add a layer providing it (see glue.sinks.ParquetSink)"
+            ) from e
+        super().__init__(*args, **kwargs)
+        self.compression = compression
+
+    def open(self, base, table, schema=None):
+        super().open(base, table, schema)
+        self.writer = None
+        # paths & arrow schemas of the part files, the first part being tmp_path
+        self.parts = []
+
+    def _open_part(self):
+        """Start a new part file with the current columns"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        def number(value):
+            return float(value) if isinstance(value, (int, float)) else None
+
+        if self.writer is not None:
+            self.writer.close()
+        types = {field_type: (pa.float64(), number) for field_type in NUMBER_TYPES}
+        types["checkbox"] = (pa.bool_(), bool)
+        schema = self.schema or {}
+        columns = [types.get(schema.get(c), (pa.string(), str)) for c in self.columns]
+        self.arrow_schema = pa.schema(
+            [
+                (column, arrow_type)
+                for column, (arrow_type, _) in zip(self.columns, columns)
+            ]
+        )
+        self.converters = [convert for _, convert in columns]
+        path = f"{self.tmp_path}.{len(self.parts)}" if self.parts else self.tmp_path
+        self.parts.append((path, self.arrow_schema))
+        self.writer = pq.ParquetWriter(
+            path, self.arrow_schema, compression=self.compression
+        )
+
+    def write(self, batch):
+        import pyarrow as pa
+
+        if not batch:
+            return
+        rows = self.rows(batch)
+        if self.writer is None or len(self.columns) > len(self.arrow_schema):
+            self._open_part()
+        columns = [
+            pa.array(
+                [None if row[i] is None else convert(row[i]) for row in rows],
+                type=field.type,
+            )
+            for i, (field, convert) in enumerate(
+                zip(self.arrow_schema, self.converters)
+            )
+        ]
+        self.writer.write_table(pa.Table.from_arrays(columns, schema=self.arrow_schema))
+
+    def _merge(self):
+        """Rewrite the parts into tmp_path with every column, a row group at a time"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        merged_path = f"{self.tmp_path}.merged"
+        writer = pq.ParquetWriter(
+            merged_path, self.arrow_schema, compression=self.compression
+        )
+        try:
+            for path, schema in self.parts:
+                part = pq.ParquetFile(path)
+                for i in range(part.num_row_groups):
+                    group = part.read_row_group(i)
+                    columns = [
+                        group.column(field.name)
+                        if field.name in schema.names
+                        else pa.nulls(group.num_rows, type=field.type)
+                        for field in self.arrow_schema
+                    ]
+                    writer.write_table(
+                        pa.Table.from_arrays(columns, schema=self.arrow_schema)
+                    )
+        finally:
+            writer.close()
+        self._remove_parts()
+        os.replace(merged_path, self.tmp_path)
+
+    def _remove_parts(self):
+        for path, _ in self.parts[1:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def commit(self):
+        if self.writer is None:
+            # nothing was written, so write an empty file with the table's columns
+            self._open_part()
+        self.writer.close()
+        if len(self.parts) > 1:
+            self._merge()
+        super().commit()
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+        self._remove_parts()
+        try:
+            os.remove(f"{self.tmp_path}.merged")
+        except FileNotFoundError:
+            pass
+        super().abort()
+
+
+_sqlite_locks = {}
+_sqlite_locks_lock = threading.Lock()
+
+
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SQLiteSink(FileSink):
+    """Exports tables to a SQLite database per base, with a database table per Airtable
+    table.
+
+    Records are inserted into a staging table that replaces the last export's in one
+    transaction on commit, so readers of the database never see a partial table. Number
+    fields are stored as REAL, checkboxes as INTEGER & everything else as TEXT
+    """
+
+    extension = "sqlite"
+
+    def open(self, base, table, schema=None):
+        Sink.open(self, base, table, schema)
+        self.path = os.path.join(self.directory, f"{base}.{self.extension}")
+        self.key = f"exports/{os.path.basename(self.path)}/{table}"
+        os.makedirs(self.directory, exist_ok=True)
+        self.columns = sorted(schema) if schema else []
+        self.staging = f"{table} (syncing)"
+        # tables of the same base are exported to the same database, possibly at once
+        with _sqlite_locks_lock:
+            self.lock = _sqlite_locks.setdefault(self.path, threading.Lock())
+        self.conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        # number of columns in the staging table, 0 until it's created
+        self.created = 0
+
+    def _column(self, column):
+        """The SQL definition of a column"""
+        field_type = (self.schema or {}).get(column)
+        if field_type in NUMBER_TYPES:
+            sql_type = "REAL"
+        elif field_type == "checkbox":
+            sql_type = "INTEGER"
+        else:
+            sql_type = "TEXT"
+        return f"{_quote_identifier(column)} {sql_type}"
+
+    def _create(self):
+        columns = ", ".join(self._column(column) for column in self.columns)
+        with self.lock, self.conn:
+            self.conn.execute(f"DROP TABLE IF EXISTS {_quote_identifier(self.staging)}")
+            self.conn.execute(
+                f"CREATE TABLE {_quote_identifier(self.staging)} ({columns})"
+            )
+        self.created = len(self.columns)
+
+    def _add_columns(self):
+        """Add the columns that first appeared since the staging table was created"""
+        with self.lock, self.conn:
+            for column in self.columns[self.created :]:
+                self.conn.execute(
+                    f"ALTER TABLE {_quote_identifier(self.staging)} "
+                    f"ADD COLUMN {self._column(column)}"
+                )
+        self.created = len(self.columns)
+
+    def write(self, batch):
+        if not batch:
+            return
+        rows = self.rows(batch)
+        if not self.created:
+            self._create()
+        elif len(self.columns) > self.created:
+            self._add_columns()
+        staging = _quote_identifier(self.staging)
+        placeholders = ", ".join("?" for _ in self.columns)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO {staging} VALUES ({placeholders})", rows
+            )
+
+    def commit(self):
+        if not self.created:
+            if not self.columns:
+                # SQLite tables need at least one column
+                self.columns = ["id"]
+            self._create()
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    f"DROP TABLE IF EXISTS {_quote_identifier(self.table)}"
+                )
+                self.conn.execute(
+                    f"ALTER TABLE {_quote_identifier(self.staging)} "
+                    f"RENAME TO {_quote_identifier(self.table)}"
+                )
+            if self.bucket:
+                # upload a consistent copy, since other tables may be being written to
+                # the database
+                fd, backup_path = tempfile.mkstemp(dir=self.directory)
+                os.close(fd)
+                try:
+                    backup = sqlite3.connect(backup_path)
+                    self.conn.backup(backup)
+                    backup.close()
+                    self.upload(backup_path)
+                finally:
+                    os.remove(backup_path)
+        self.conn.close()
+
+    def upload(self, path):
+        import boto3
+
+        boto3.client("s3").upload_file(
+            path, self.bucket, f"{self.prefix}/{os.path.basename(self.path)}"
+        )
+
+    def abort(self):
+        with self.lock, self.conn:
+            self.conn.execute(f"DROP TABLE IF EXISTS {_quote_identifier(self.staging)}")
+        self.conn.close()
+
+
+# sinks that can be named in a table's "exports" (see glue.airtable_to_sheets), with
+# default options
+SINKS = {"csv": CSVSink, "parquet": ParquetSink, "sqlite": SQLiteSink}
+
+
+def export_table(
+    base: str,
+    table: str,
+    sinks: list,
+    view: str = None,
+    fields: list = None,
+    modified_field: str = None,
+    skip_unchanged: bool = True,
+    batch_size: int = SINK_BATCH_SIZE,
+) -> bool:
+    """Download an Airtable table once & write it to every sink, a batch of records at a
+    time.
+
+    Args:
+        base (str): Airtable base key
+        table (str): Airtable table name or ID
+        sinks (list): Sink instances to write the table to
+        view (str, optional): Airtable view name or ID. Defaults to None.
+        fields (list, optional): field names to include, defaults to all fields
+        modified_field (str, optional): "Last modified time" field name, loads the table
+            incrementally when set (see load_table). Defaults to None.
+        skip_unchanged (bool, optional): don't write the table if the records' content
+            fingerprint matches the last successful write to every sink. Defaults to
+            True.
+        batch_size (int, optional): records passed to the sinks at a time. Defaults to
+            SINK_BATCH_SIZE.
+
+    Returns:
+        bool: True if the sinks were written, False if they were skipped as unchanged
+    """
+    schema = get_table_schema(base, table)
+    if schema and fields:
+        schema = {field: schema[field] for field in fields if field in schema}
+    records = iter_table(
+        base=base, table=table, view=view, fields=fields, modified_field=modified_field
+    )
+    fingerprint = ContentFingerprint()
+    opened = []
+    try:
+        for sink in sinks:
+            sink.open(base, table, schema)
+            opened.append(sink)
+        batch = []
+        for record in records:
+            batch.append(fingerprint.update(record["fields"]))
+            if len(batch) == batch_size:
+                for sink in sinks:
+                    sink.write(batch)
+                batch = []
+        for sink in sinks:
+            sink.write(batch)
+        digest = fingerprint.hexdigest()
+        warn_if_ephemeral("export fingerprints")
+        store = get_state_store()
+        if skip_unchanged and all(
+            store.get(f"{sink.key}/fingerprint") == digest for sink in sinks
+        ):
+            print(f"Skipping {table}, unchanged since the last sync")
+            _abort(opened)
+            return False
+    except BaseException:
+        _abort(opened)
+        raise
+    while opened:
+        sink = opened.pop(0)
+        try:
+            sink.commit()
+        except BaseException:
+            _abort(opened)
+            raise
+        store.set(f"{sink.key}/fingerprint", digest)
+    return True
+
+
+def _abort(opened):
+    """Abort the `opened` sinks, taking each off the list first so that if an abort
+    raises, the caller doesn't abort it again
+    """
+    while opened:
+        opened.pop(0).abort()
@@ -0,0 +1,226 @@
+"""Pluggable stores for state that needs to persist between runs of the gluecode,
+such as incremental sync watermarks & table snapshots.
+
+Values are anything that can be serialized to JSON. The store used by default is picked
+with the GLUE_STATE_STORE environment variable ("file", "sqlite", "ssm" or "s3"), and
+local stores keep their data in GLUE_STATE_DIR, which defaults to a directory in /tmp so
+it survives warm Lambda invocations. SSM only fits small values, so with "ssm", large
+values like table snapshots are kept in GLUE_LARGE_STATE_STORE ("s3" when
+GLUE_STATE_BUCKET is set, otherwise "file").
+"""
+
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from urllib.parse import quote
+
+STATE_STORE = os.getenv("GLUE_STATE_STORE", "file")
+STATE_DIR = os.getenv(
+    "GLUE_STATE_DIR", os.path.join(tempfile.gettempdir(), "glue-state")
+)
+SSM_STATE_PREFIX = f"/{os.getenv('STAGE', 'prod')}/lambda/airtableGlue/state"
+S3_STATE_BUCKET = os.getenv("GLUE_STATE_BUCKET")
+S3_STATE_PREFIX = f"{os.getenv('STAGE', 'prod')}/airtableGlue/state"
+# store for values too large for SSM, like table snapshots & cached sheet grids, when
+# GLUE_STATE_STORE is "ssm" (otherwise they're kept in the default store)
+LARGE_STATE_STORE = os.getenv(
+    "GLUE_LARGE_STATE_STORE", "s3" if S3_STATE_BUCKET else "file"
+)
+# SSM's limit for standard parameters
+SSM_MAX_VALUE_SIZE = 4096
+# stores kept in /tmp, which is lost whenever Lambda starts a new container
+EPHEMERAL_STATE_STORES = {"file", "sqlite"}
+
+_ephemeral_warnings = set()
+
+
+class FileStateStore:
+    """Stores each key as a JSON file in `directory`"""
+
+    def __init__(self, directory=STATE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{quote(key, safe='')}.json")
+
+    def get(self, key, default=None):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def set(self, key, value):
+        # write to a temporary file first so a run cut off mid-write can't corrupt
+        # the state
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteStateStore:
+    """Stores keys & JSON values in a single SQLite database file"""
+
+    def __init__(self, path=os.path.join(STATE_DIR, "state.db")):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS state "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM state WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                (key, json.dumps(value)),
+            )
+
+    def delete(self, key):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM state WHERE key = ?", (key,))
+
+
+class SSMStateStore:
+    """Stores keys as SSM parameters under `prefix`.
+
+    SSM parameters are limited to 4KB (8KB for advanced parameters), so this store is
+    only suitable for small values like watermarks, not table snapshots
+    """
+
+    def __init__(self, prefix=SSM_STATE_PREFIX):
+        import boto3
+
+        self.prefix = prefix
+        self.ssm = boto3.client("ssm")
+
+    def _name(self, key):
+        # parameter names may only contain letters, numbers & .-_/ characters
+        return f"{self.prefix}/{re.sub(r'[^a-zA-Z0-9_./-]', '_', key)}"
+
+    def get(self, key, default=None):
+        try:
+            param = self.ssm.get_parameter(Name=self._name(key))
+        except self.ssm.exceptions.ParameterNotFound:
+            return default
+        return json.loads(param["Parameter"]["Value"])
+
+    def set(self, key, value):
+        value = json.dumps(value)
+        if len(value.encode()) > SSM_MAX_VALUE_SIZE:
+            raise ValueError(
+                f"{len(value.encode())} byte value for {key} is too large for SSM, "
+                "keep it in get_state_store(large=True) instead"
+            )
+        self.ssm.put_parameter(
+            Name=self._name(key), Value=value, Type="String", Overwrite=True
+        )
+
+    def delete(self, key):
+        try:
+            self.ssm.delete_parameter(Name=self._name(key))
+        except self.ssm.exceptions.ParameterNotFound:
+            pass
+
+
+class S3StateStore:
+    """Stores keys as JSON objects under `prefix` in an S3 bucket, for state that has to
+    outlive the Lambda's /tmp directory & is too large for SSM, like checkpoints & table
+    snapshots
+    """
+
+    def __init__(self, bucket=S3_STATE_BUCKET, prefix=S3_STATE_PREFIX):
+        import boto3
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.s3 = boto3.client("s3")
+
+    def _key(self, key):
+        return f"{self.prefix}/{quote(key, safe='/')}.json"
+
+    def get(self, key, default=None):
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=self._key(key))
+        except self.s3.exceptions.NoSuchKey:
+            return default
+        return json.loads(obj["Body"].read())
+
+    def set(self, key, value):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self._key(key),
+            Body=json.dumps(value).encode(),
+            ContentType="application/json",
+        )
+
+    def delete(self, key):
+        # deleting a key that doesn't exist succeeds in S3
+        self.s3.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+STATE_STORES = {
+    "file": FileStateStore,
+    "sqlite": SQLiteStateStore,
+    "ssm": SSMStateStore,
+    "s3": S3StateStore,
+}
+
+_stores = {}
+_store_lock = threading.Lock()
+
+
+def _store_name(large=False):
+    return LARGE_STATE_STORE if large and STATE_STORE == "ssm" else STATE_STORE
+
+
+def warn_if_ephemeral(purpose: str, large=False):
+    """Log a warning (once per process for each `purpose`) when running in Lambda with
+    the default state store (or large value store, with `large`) kept in /tmp, since
+    state saved there rarely survives to the next run
+    """
+    store_name = _store_name(large)
+    if (
+        store_name in EPHEMERAL_STATE_STORES
+        and os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+        and purpose not in _ephemeral_warnings
+    ):
+        _ephemeral_warnings.add(purpose)
+        print(
+            f"WARNING: the {store_name} state store keeps {purpose} in /tmp, which is "
+            "lost on cold starts, so most runs will start from scratch. "
+            "Set GLUE_STATE_STORE=s3 & GLUE_STATE_BUCKET to keep it between runs"
+        )
+
+
+def get_state_store(large=False):
+    """Returns the process-wide default state store, configured by GLUE_STATE_STORE.
+
+    With `large`, returns the store for values that may not fit in SSM (table snapshots,
+    sheet grids), which is GLUE_LARGE_STATE_STORE when GLUE_STATE_STORE is "ssm"
+    """
+    name = _store_name(large)
+    with _store_lock:
+        if name not in _stores:
+            _stores[name] = STATE_STORES[name]()
+        return _stores[name]
@@ -0,0 +1,223 @@
+"""Per-invocation telemetry for outbound Airtable & Google Sheets calls.
+
+With GLUE_TELEMETRY set, every Airtable request made through the shared client & every
+Google Sheets call made by the sheet syncs is recorded by service, endpoint, base (or
+spreadsheet) & table: call & error counts, statuses, bytes in & out, latency (total, max
+& a histogram), retries & 429s. Handlers decorated with `instrumented` in glue.handler
+run in a Sentry transaction (or a span of the Lambda integration's transaction, when
+it's tracing the invocation), each call is a span of it, including calls made from
+worker threads, and a summary of the invocation is logged as a line of JSON & attached
+to Sentry as the "telemetry" context.
+
+When telemetry is disabled the hooks cost an attribute check per call.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TELEMETRY_ENABLED = os.getenv("GLUE_TELEMETRY", "").lower() in ("1", "true", "yes")
+# upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Call:
+    """One outbound call, filled in by the code making it"""
+
+    __slots__ = (
+        "service",
+        "endpoint",
+        "base",
+        "table",
+        "status",
+        "bytes_in",
+        "bytes_out",
+        "retries",
+        "rate_limited",
+    )
+
+    def __init__(self, service=None, endpoint=None, base=None, table=None):
+        self.service = service
+        self.endpoint = endpoint
+        self.base = base
+        self.table = table
+        self.status = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+
+class Telemetry:
+    """Aggregates calls by (service, endpoint, base, table) until reset"""
+
+    def __init__(self, enabled=TELEMETRY_ENABLED):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.monotonic()
+            self.stats = {}
+            # the span of the current invocation, see invocation()
+            self.transaction = None
+
+    def record(self, call, latency):
+        key = (call.service, call.endpoint, call.base, call.table)
+        with self.lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "statuses": {},
+                    "bytes_in": 0,
+                    "bytes_out": 0,
+                    "retries": 0,
+                    "rate_limited": 0,
+                    "latency_total": 0.0,
+                    "latency_max": 0.0,
+                    "latency_histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+                }
+            stats["calls"] += 1
+            status = str(call.status)
+            stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+            if not status.startswith("2"):
+                stats["errors"] += 1
+            stats["bytes_in"] += call.bytes_in
+            stats["bytes_out"] += call.bytes_out
+            stats["retries"] += call.retries
+            stats["rate_limited"] += call.rate_limited
+            stats["latency_total"] += latency
+            stats["latency_max"] = max(stats["latency_max"], latency)
+            bucket = next(
+                (i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound),
+                len(LATENCY_BUCKETS),
+            )
+            stats["latency_histogram"][bucket] += 1
+
+    @contextmanager
+    def _call(self, service, endpoint, base, table):
+        import sentry_sdk
+
+        call = Call(service, endpoint, base, table)
+        start = time.monotonic()
+        # worker threads don't see the invocation's span, so their calls are added to
+        # it directly
+        parent = sentry_sdk.get_current_span() or self.transaction
+        span_kwargs = {"op": f"{service}.request", "name": f"{endpoint} {base}/{table}"}
+        span = (
+            parent.start_child(**span_kwargs)
+            if parent is not None
+            else sentry_sdk.start_span(**span_kwargs)
+        )
+        with span:
+            try:
+                yield call
+                if call.status is None:
+                    call.status = 200
+            except Exception as e:
+                if call.status is None:
+                    response = getattr(e, "response", None)
+                    call.status = getattr(response, "status_code", None) or "error"
+                raise
+            finally:
+                latency = time.monotonic() - start
+                self.record(call, latency)
+                for name in Call.__slots__[4:]:
+                    span.set_data(name, getattr(call, name))
+
+    def call(self, service, endpoint, base=None, table=None):
+        """Context manager recording one outbound call, yielding a Call to fill in.
+
+        The call's status defaults to 200, or to the response status of an exception
+        raised by the call
+        """
+        if not self.enabled:
+            return _NULL_CALL
+        return self._call(service, endpoint, base, table)
+
+    def summary(self) -> dict:
+        """Returns the calls recorded since the last reset, by endpoint & with totals"""
+        with self.lock:
+            calls = [
+                {
+                    "service": service,
+                    "endpoint": endpoint,
+                    "base": base,
+                    "table": table,
+                    **stats,
+                    "latency_total": round(stats["latency_total"], 3),
+                    "latency_max": round(stats["latency_max"], 3),
+                    "latency_histogram": dict(
+                        zip(
+                            [f"<={bound}s" for bound in LATENCY_BUCKETS]
+                            + [f">{LATENCY_BUCKETS[-1]}s"],
+                            stats["latency_histogram"],
+                        )
+                    ),
+                }
+                for (service, endpoint, base, table), stats in self.stats.items()
+            ]
+            seconds = time.monotonic() - self.started
+        calls.sort(key=lambda c: c["latency_total"], reverse=True)
+        totals = {}
+        for call in calls:
+            service_totals = totals.setdefault(call["service"], {})
+            for name in (
+                "calls",
+                "errors",
+                "bytes_in",
+                "bytes_out",
+                "retries",
+                "rate_limited",
+                "latency_total",
+            ):
+                total = service_totals.get(name, 0) + call[name]
+                service_totals[name] = round(total, 3)
+        return {"seconds": round(seconds, 3), "totals": totals, "calls": calls}
+
+    @contextmanager
+    def invocation(self, name):
+        """Record the calls made while running handler `name`, then log a summary"""
+        if not self.enabled:
+            yield
+            return
+        import sentry_sdk
+
+        self.reset()
+        # the Lambda integration starts a transaction for the invocation when tracing
+        # is enabled
+        parent = sentry_sdk.get_current_span()
+        transaction = (
+            parent.start_child(op="function", name=name)
+            if parent is not None
+            else sentry_sdk.start_transaction(op="function", name=name)
+        )
+        with transaction:
+            self.transaction = transaction
+            try:
+                yield
+            finally:
+                summary = {"handler": name, **self.summary()}
+                print(json.dumps({"telemetry": summary}))
+                sentry_sdk.set_context("telemetry", summary)
+                self.transaction = None
+
+
+class _NullCall:
+    """Context manager used when telemetry is disabled, yielding a throwaway Call"""
+
+    def __enter__(self):
+        return Call()
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_CALL = _NullCall()
+
+telemetry = Telemetry()
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+# keep state written by the tests out of the default /tmp/glue-state
+os.environ.setdefault("GLUE_STATE_DIR", tempfile.mkdtemp(prefix="glue-tests-"))
+os.environ.setdefault("AIRTABLE_KEY", "test")
+
+import pytest  # noqa: E402
+from mock_airtable import MockAirtable  # noqa: E402
+
+from glue import airtable_client, fingerprint  # noqa: E402
+from glue.checkpoint import Deadline, DeadlineExceeded  # noqa: E402
+
+BASE = "appTest0000000000"
+
+
+class StopAfter(Deadline):
+    """A deadline that passes after `checks` calls to check()"""
+
+    def __init__(self, checks):
+        super().__init__()
+        self.checks = checks
+        self.lock = threading.Lock()
+
+    def check(self):
+        with self.lock:
+            self.checks -= 1
+            if self.checks < 0:
+                raise DeadlineExceeded("Stopping before the Lambda timeout")
+
+
+@pytest.fixture
+def mock():
+    """A local stand-in for the Airtable API, unthrottled unless a test sets a rate"""
+    mock = MockAirtable(requests_per_second=0).start()
+    yield mock
+    mock.stop()
+
+
+@pytest.fixture
+def airtable_api(mock, monkeypatch):
+    """Point glue.airtable's shared client at the mock, with no schemas cached"""
+    monkeypatch.setattr(fingerprint, "_schemas", {})
+    monkeypatch.setattr(
+        airtable_client, "_client", airtable_client.AirtableClient(api_url=mock.url)
+    )
+    return mock
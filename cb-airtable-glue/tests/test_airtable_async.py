@@ -0,0 +1,171 @@
+import asyncio
+
+import pytest
+from conftest import BASE
+
+from glue.airtable_async import AsyncAirtable
+from glue.airtable_client import AirtableError
+
+
+def run(mock, method, *args, requests_per_second=1000, **kwargs):
+    async def main():
+        async with AsyncAirtable(
+            api_url=mock.url, requests_per_second=requests_per_second
+        ) as airtable:
+            return await getattr(airtable, method)(*args, **kwargs)
+
+    return asyncio.run(main())
+
+
+def people(count):
+    return [
+        {"Name": f"Person {i}", "Email": f"person{i}@example.org"} for i in range(count)
+    ]
+
+
+def test_load_table_follows_pagination(mock):
+    mock.add_table(BASE, "People", people(250))
+
+    records = run(mock, "load_table", BASE, "People")
+
+    assert len(records) == 250
+    assert len({r["id"] for r in records}) == 250
+    assert mock.requests["GET"] == 3
+
+
+def test_load_table_filters_fields_and_formula(mock):
+    mock.add_table(BASE, "People", people(30))
+
+    records = run(
+        mock,
+        "load_table",
+        BASE,
+        "People",
+        formula='{Name} = "Person 7"',
+        fields=["Email"],
+    )
+
+    assert [r["fields"] for r in records] == [{"Email": "person7@example.org"}]
+
+
+def test_long_formulas_are_posted(mock):
+    mock.add_table(BASE, "People", people(5))
+    formula = "OR(" + ", ".join(f'{{Name}} = "Person {i}"' for i in range(300)) + ")"
+
+    records = run(mock, "load_table", BASE, "People", formula=formula)
+
+    assert len(records) == 5
+    assert mock.requests["POST"] == 1 and mock.requests["GET"] == 0
+
+
+def test_rate_limited_requests_are_retried_after_backoff(mock):
+    mock.requests_per_second = 2
+    mock.add_table(BASE, "People", people(10))
+    values = [f"Person {i}" for i in range(6)]
+
+    matches = run(mock, "get_records_by_field", BASE, "People", "Name", values)
+
+    assert mock.requests["429"] > 0
+    assert {value: record["fields"]["Name"] for value, record in matches.items()} == {
+        value: value for value in values
+    }
+
+
+def test_server_errors_are_retried_for_reads(mock):
+    mock.add_table(BASE, "People", people(3))
+    mock.fail_next(503)
+
+    records = run(mock, "load_table", BASE, "People")
+
+    assert len(records) == 3
+    assert mock.requests["GET"] == 2
+
+
+def test_creates_are_not_retried_after_server_errors(mock):
+    mock.add_table(BASE, "People", [])
+    mock.fail_next(500)
+
+    with pytest.raises(AirtableError):
+        run(mock, "create_batch_records", BASE, "People", people(3))
+
+    assert mock.requests["POST"] == 1
+
+
+def test_batched_writes(mock):
+    mock.add_table(BASE, "People", [])
+
+    created = run(mock, "create_batch_records", BASE, "People", people(25))
+    assert len(created) == 25
+    # 25 records are sent in batches of 10
+    assert mock.requests["POST"] == 3
+
+    updates = [{"id": r["id"], "fields": {"Name": "Renamed"}} for r in created[:12]]
+    updated = run(mock, "update_batch_records", BASE, "People", updates)
+    assert len(updated) == 12
+    assert mock.requests["PATCH"] == 2
+
+    run(mock, "delete_batch_records", BASE, "People", created[:15])
+    remaining = mock.records(BASE, "People")
+    assert len(remaining) == 10
+    assert sum(r["fields"]["Name"] == "Renamed" for r in remaining) == 0
+
+
+def test_failed_batches_are_collected(mock):
+    mock.add_table(BASE, "People", [])
+    mock.fail_next(422)
+    failures = []
+
+    created = run(
+        mock, "create_batch_records", BASE, "People", people(20), failures=failures
+    )
+
+    assert len(created) == 10
+    assert len(failures) == 1 and len(failures[0]["records"]) == 10
+
+
+def test_timed_out_batches_are_collected(mock, monkeypatch):
+    mock.add_table(BASE, "People", [])
+    request = AsyncAirtable.request
+    calls = []
+
+    async def time_out_first_write(self, method, *args, **kwargs):
+        calls.append(method)
+        if len(calls) == 1:
+            raise asyncio.TimeoutError()
+        return await request(self, method, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncAirtable, "request", time_out_first_write)
+    failures = []
+
+    created = run(
+        mock, "create_batch_records", BASE, "People", people(30), failures=failures
+    )
+
+    assert len(created) == 20
+    assert len(failures) == 1
+    assert isinstance(failures[0]["error"], asyncio.TimeoutError)
+    assert len(mock.records(BASE, "People")) == 20
+
+
+def test_lookups_by_field(mock):
+    mock.add_table(BASE, "People", people(20))
+
+    record = run(
+        mock, "get_record_by_field", BASE, "People", "Email", "person3@example.org"
+    )
+    assert record["fields"]["Name"] == "Person 3"
+
+    missing = run(mock, "get_record_by_field", BASE, "People", "Email", "nobody@x.org")
+    assert missing is None
+
+    matches = run(
+        mock,
+        "get_records_by_field",
+        BASE,
+        "People",
+        "Name",
+        ["Person 1", "Person 2", "Person 1", "Person 99"],
+    )
+    assert list(matches) == ["Person 1", "Person 2", "Person 99"]
+    assert matches["Person 99"] is None
+    assert matches["Person 2"]["fields"]["Email"] == "person2@example.org"
@@ -0,0 +1,119 @@
+import time
+
+import pytest
+import requests
+from conftest import BASE
+
+from glue import airtable_client
+from glue.airtable_client import RATE_LIMIT_WAIT, AirtableClient, AirtableError
+
+OTHER_BASE = "appOther000000000"
+
+
+def client(mock, **kwargs):
+    return AirtableClient(api_url=mock.url, **kwargs)
+
+
+def people(count):
+    return [{"Name": f"Person {i}"} for i in range(count)]
+
+
+def create(airtable):
+    return airtable.post(BASE, "People", json={"records": [{"fields": {"Name": "A"}}]})
+
+
+def test_rate_limited_requests_wait_for_retry_after(mock):
+    mock.requests_per_second = 2
+    mock.add_table(BASE, "People", people(3))
+    airtable = client(mock, requests_per_second=100)
+
+    start = time.monotonic()
+    for _ in range(5):
+        assert len(airtable.get(BASE, "People")["records"]) == 3
+
+    assert mock.requests["429"] > 0
+    # waited for the mock's Retry-After, not the default 30 seconds
+    assert time.monotonic() - start < RATE_LIMIT_WAIT / 2
+
+
+def test_reads_are_retried_after_server_errors(mock):
+    mock.add_table(BASE, "People", people(3))
+    mock.fail_next(503)
+
+    records = client(mock).get(BASE, "People")["records"]
+
+    assert len(records) == 3
+    assert mock.requests["GET"] == 2
+
+
+def test_creates_are_not_retried_after_server_errors(mock):
+    mock.add_table(BASE, "People", [])
+    mock.fail_next(500)
+
+    with pytest.raises(AirtableError):
+        create(client(mock))
+
+    assert mock.requests["POST"] == 1
+    assert mock.records(BASE, "People") == []
+
+
+def test_creates_are_retried_after_rate_limits(mock, monkeypatch):
+    monkeypatch.setattr(airtable_client, "RATE_LIMIT_WAIT", 0.1)
+    mock.add_table(BASE, "People", [])
+    mock.fail_next(429)
+
+    create(client(mock))
+
+    assert mock.requests["POST"] == 2
+    assert len(mock.records(BASE, "People")) == 1
+
+
+def test_creates_are_not_retried_after_timeouts(mock):
+    mock.add_table(BASE, "People", [])
+    mock.latency = 0.5
+
+    with pytest.raises(requests.Timeout):
+        create(client(mock, timeout=0.1))
+
+    # the request reached the mock, so retrying it could create the record twice
+    assert mock.requests["POST"] == 1
+
+
+def test_creates_are_retried_when_they_never_connected(monkeypatch):
+    # nothing listens on port 9, so every attempt fails to connect
+    airtable = AirtableClient(api_url="http://127.0.0.1:9/v0", max_retries=1)
+    attempts = []
+    request = airtable.session.request
+
+    def count(*args, **kwargs):
+        attempts.append(args)
+        return request(*args, **kwargs)
+
+    monkeypatch.setattr(airtable.session, "request", count)
+
+    with pytest.raises(requests.ConnectionError):
+        create(airtable)
+
+    assert len(attempts) == 2
+
+
+def test_requests_are_throttled_per_base(mock):
+    mock.add_table(BASE, "People", people(1))
+    mock.add_table(OTHER_BASE, "People", people(1))
+
+    # a burst of 5 per base goes straight through
+    airtable = client(mock, requests_per_second=5)
+    start = time.monotonic()
+    for base in (BASE, OTHER_BASE):
+        for _ in range(5):
+            airtable.get(base, "People")
+    assert time.monotonic() - start < 0.5
+
+    # the next 5 on one base wait for their tokens
+    airtable = client(mock, requests_per_second=5)
+    start = time.monotonic()
+    for _ in range(10):
+        airtable.get(BASE, "People")
+    assert time.monotonic() - start >= 0.9
+    assert airtable.bucket(BASE) is airtable.bucket(BASE)
+    assert airtable.bucket(BASE) is not airtable.bucket(OTHER_BASE)
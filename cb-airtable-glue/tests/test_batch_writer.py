@@ -0,0 +1,92 @@
+import time
+
+import pytest
+from conftest import BASE, StopAfter
+
+from glue import airtable, batch_writer
+from glue.batch_writer import BatchWriter
+from glue.checkpoint import DeadlineExceeded
+
+
+def people(count):
+    return [{"Name": f"Person {i}"} for i in range(count)]
+
+
+def test_writes_are_sent_in_batches(airtable_api):
+    with BatchWriter(BASE, "People") as writer:
+        for fields in people(25):
+            writer.create(fields)
+
+    assert len(writer.created_ids) == 25
+    assert airtable_api.requests["POST"] == 3
+    assert writer.failures == []
+
+
+def test_updates_to_a_record_are_coalesced(airtable_api):
+    airtable_api.add_table(BASE, "People", people(2))
+    first, second = airtable_api.records(BASE, "People")
+
+    with BatchWriter(BASE, "People") as writer:
+        writer.update(first["id"], {"Name": "Ada"})
+        writer.update(first["id"], {"Email": "ada@example.org"})
+        # deleted, so neither update is sent
+        writer.update(second["id"], {"Name": "Deleted"})
+        writer.delete(second["id"])
+        writer.update(second["id"], {"Name": "Deleted again"})
+
+    assert airtable_api.requests["PATCH"] == 1
+    assert [r["fields"] for r in writer.updated] == [
+        {"Name": "Ada", "Email": "ada@example.org"}
+    ]
+    assert [r["id"] for r in airtable_api.records(BASE, "People")] == [first["id"]]
+
+
+def test_deletes_are_sent_after_updates(airtable_api, monkeypatch):
+    airtable_api.add_table(BASE, "People", people(2))
+    first, second = airtable_api.records(BASE, "People")
+    sent = []
+
+    def slow_update(*args, **kwargs):
+        time.sleep(0.2)
+        sent.append("update")
+        return airtable.update_batch_records(*args, **kwargs)
+
+    def delete(*args, **kwargs):
+        sent.append("delete")
+        return airtable.delete_batch_records(*args, **kwargs)
+
+    monkeypatch.setattr(batch_writer, "update_batch_records", slow_update)
+    monkeypatch.setattr(batch_writer, "delete_batch_records", delete)
+
+    with BatchWriter(BASE, "People") as writer:
+        writer.update(first["id"], {"Name": "Ada"})
+        writer.delete(second["id"])
+
+    assert sent == ["update", "delete"]
+
+
+def test_deadline_keeps_written_records_and_requeues_the_rest(
+    airtable_api, monkeypatch
+):
+    airtable_api.add_table(BASE, "People", people(1))
+    existing = airtable_api.records(BASE, "People")[0]
+    deadline = StopAfter(2)
+    monkeypatch.setattr(airtable, "get_deadline", lambda: deadline)
+    writer = BatchWriter(BASE, "People", max_workers=1)
+    for fields in people(30):
+        writer.create(fields)
+    writer.delete(existing["id"])
+
+    with pytest.raises(DeadlineExceeded):
+        writer.flush()
+
+    assert len(writer.created) == 20
+    assert len(writer.creates) == 10
+    assert list(writer.deletes) == [existing["id"]]
+    assert len(airtable_api.records(BASE, "People")) == 21
+
+    deadline.checks = 100
+    writer.flush()
+
+    assert len(writer.created) == 30
+    assert len(airtable_api.records(BASE, "People")) == 30
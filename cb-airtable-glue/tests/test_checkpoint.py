@@ -0,0 +1,117 @@
+import pytest
+from conftest import BASE, StopAfter
+
+from glue import airtable
+from glue.airtable_client import AirtableError
+from glue.checkpoint import Checkpoint, DeadlineExceeded
+from glue.jobs import run_jobs
+from glue.state import FileStateStore
+
+
+class CountingStore(FileStateStore):
+    """A file store counting the values it writes"""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.writes = 0
+
+    def set(self, key, value):
+        self.writes += 1
+        super().set(key, value)
+
+
+def people(count):
+    return [{"ID": i, "Name": f"Person {i}"} for i in range(count)]
+
+
+def test_sync_table_resumes_a_stopped_load(airtable_api, monkeypatch):
+    airtable_api.add_table(BASE, "Resumed", people(250))
+    # 250 existing people with one renamed, plus 30 new ones
+    records = people(280)
+    records[120]["Name"] = "Renamed"
+
+    # stop before the second page is requested
+    deadline = StopAfter(1)
+    monkeypatch.setattr(airtable, "get_deadline", lambda: deadline)
+    with pytest.raises(DeadlineExceeded):
+        airtable.sync_table(records, "Resumed", base=BASE)
+    # the schema & the first page
+    assert airtable_api.requests["GET"] == 2
+    assert len(airtable_api.records(BASE, "Resumed")) == 250
+
+    deadline.checks = 100
+    airtable_api.reset_stats()
+    record_id_map = airtable.sync_table(records, "Resumed", base=BASE)
+
+    # only the pages the first run didn't load are requested
+    assert airtable_api.requests["GET"] == 2
+    assert len(record_id_map) == 280
+    rows = airtable_api.records(BASE, "Resumed")
+    assert len(rows) == 280
+    assert [r["fields"]["Name"] for r in rows if r["fields"]["ID"] == 120] == [
+        "Renamed"
+    ]
+    key = f"checkpoints/sync/{BASE}/Resumed/load"
+    assert Checkpoint(key, airtable.get_state_store(large=True)).state == {}
+
+
+def test_iter_pages_restarts_when_a_resumed_offset_expired(airtable_api):
+    airtable_api.add_table(BASE, "Expired", people(150))
+    checkpoint = Checkpoint("test/expired")
+    checkpoint.update(offset="100", resumed=True)
+    airtable_api.fail_next(422, error="LIST_RECORDS_ITERATOR_NOT_AVAILABLE")
+
+    pages = list(airtable.iter_pages(BASE, "Expired", checkpoint=checkpoint))
+
+    assert [len(page) for page in pages] == [100, 50]
+    assert checkpoint.state == {"offset": None}
+
+
+def test_iter_pages_raises_when_an_offset_expires_midway(airtable_api):
+    airtable_api.add_table(BASE, "Expired midway", people(150))
+    pages = airtable.iter_pages(BASE, "Expired midway")
+
+    assert len(next(pages)) == 100
+    airtable_api.fail_next(422, error="LIST_RECORDS_ITERATOR_NOT_AVAILABLE")
+    with pytest.raises(AirtableError):
+        next(pages)
+
+
+def test_sync_table_resumes_a_stopped_upsert(airtable_api, monkeypatch, tmp_path):
+    airtable_api.add_table(BASE, "Upserted", people(5))
+    store = CountingStore(str(tmp_path))
+    monkeypatch.setattr(airtable, "get_state_store", lambda large=False: store)
+    deadline = StopAfter(2)
+    monkeypatch.setattr(airtable, "get_deadline", lambda: deadline)
+    records = people(45)
+
+    with pytest.raises(DeadlineExceeded):
+        airtable.sync_table(records, "Upserted", base=BASE, upsert=True)
+    # the progress is only saved once the deadline stops the writes
+    assert store.writes == 1
+    assert airtable_api.requests["PATCH"] == 2
+
+    deadline.checks = 100
+    airtable_api.reset_stats()
+    airtable.sync_table(records, "Upserted", base=BASE, upsert=True)
+
+    assert airtable_api.requests["PATCH"] == 3
+    assert len(airtable_api.records(BASE, "Upserted")) == 45
+    assert store.get(f"checkpoints/sync/{BASE}/Upserted/upsert") is None
+
+
+def test_sync_table_keeps_checkpoints_per_job(airtable_api, monkeypatch):
+    airtable_api.add_table(BASE, "Shared", [])
+    deadline = StopAfter(1)
+    monkeypatch.setattr(airtable, "get_deadline", lambda: deadline)
+
+    def sync_square():
+        airtable.sync_table(people(30), "Shared", base=BASE, upsert=True)
+
+    with pytest.raises(DeadlineExceeded):
+        run_jobs({"sync_square": sync_square})
+
+    store = airtable.get_state_store(large=True)
+    key = f"checkpoints/sync/sync_square/{BASE}/Shared/upsert"
+    assert Checkpoint(key, store).get("batches") == 1
+    assert Checkpoint(f"checkpoints/sync/{BASE}/Shared/upsert", store).state == {}
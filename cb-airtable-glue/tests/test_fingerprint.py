@@ -0,0 +1,97 @@
+from conftest import BASE
+
+from glue.fingerprint import (
+    compile_normalizers,
+    get_table_schema,
+    infer_field_types,
+    normalize_date,
+    normalize_datetime,
+    normalize_empty,
+    normalize_number,
+    normalize_value,
+)
+
+
+def test_compile_normalizers_picks_a_normalizer_per_field_type():
+    normalizers = compile_normalizers(
+        {
+            "Amount": "currency",
+            "Modified": "lastModifiedTime",
+            "Born": "date",
+            "Total": "rollup",
+            "Name": "singleLineText",
+        }
+    )
+
+    assert normalizers == {
+        "Amount": normalize_number,
+        "Modified": normalize_datetime,
+        "Born": normalize_date,
+        "Total": normalize_value,
+        "Name": normalize_empty,
+    }
+
+
+def test_normalizers_treat_airtable_empty_values_as_none():
+    for normalize in (
+        normalize_number,
+        normalize_datetime,
+        normalize_date,
+        normalize_empty,
+        normalize_value,
+    ):
+        for value in (None, "", "  ", [], False):
+            assert normalize(value) is None, (normalize.__name__, value)
+
+
+def test_normalize_number_compares_ints_floats_and_numeric_strings_equal():
+    assert normalize_number(3) == normalize_number(3.0) == normalize_number("3") == 3.0
+    assert normalize_number("n/a") == "n/a"
+
+
+def test_normalize_datetime_drops_milliseconds_and_timezone():
+    assert normalize_datetime("2023-04-05T06:07:08.000Z") == "2023-04-05T06:07:08"
+    assert normalize_datetime("2023-04-05T06:07:08") == "2023-04-05T06:07:08"
+
+
+def test_normalize_date_drops_the_time():
+    assert normalize_date("2023-04-05T06:07:08.000Z") == "2023-04-05"
+
+
+def test_normalize_value_handles_values_of_any_type():
+    assert normalize_value("2023-04-05T06:07:08.000Z") == "2023-04-05T06:07:08"
+    assert normalize_value(2) == 2.0
+    assert normalize_value(True) is True
+    assert normalize_value(["rec1"]) == ["rec1"]
+    assert normalize_value("text") == "text"
+
+
+def test_infer_field_types_uses_the_first_non_empty_value():
+    records = [
+        {"fields": {"Name": "", "Count": 1}},
+        {
+            "fields": {
+                "Name": "Ada",
+                "Done": True,
+                "When": "2023-04-05T06:07:08.000Z",
+                "Links": ["rec1"],
+            }
+        },
+    ]
+
+    assert infer_field_types(records) == {
+        "Count": "number",
+        "Name": "singleLineText",
+        "Done": "checkbox",
+        "When": "dateTime",
+        "Links": "multipleRecordLinks",
+    }
+
+
+def test_unreadable_schemas_are_only_requested_once_per_base(mock, airtable_api):
+    mock.add_table(BASE, "People", [{"Name": "Ann"}])
+    mock.fail_next(403, error="INVALID_PERMISSIONS_OR_MODEL_NOT_FOUND")
+
+    assert get_table_schema(BASE, "People") is None
+    assert get_table_schema(BASE, "Donations") is None
+    assert mock.requests["GET"] == 1
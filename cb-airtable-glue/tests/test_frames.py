@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+from glue.frames import FrameBuilder, records_to_frame
+
+ATTACHMENTS = [
+    {"url": "https://example.com/a.png", "filename": "a.png"},
+    {"url": "https://example.com/b.png", "filename": "b.png"},
+]
+
+
+def records(*fields):
+    return [{"id": f"rec{i}", "fields": f} for i, f in enumerate(fields)]
+
+
+def test_columns_are_sorted_and_missing_values_padded():
+    df = records_to_frame(records({"b": 1, "a": "x"}, {"c": True}, {"a": "y"}))
+
+    assert list(df.columns) == ["a", "b", "c"]
+    assert df["a"].isna().tolist() == [False, True, False]
+    assert df["a"].dropna().tolist() == ["x", "y"]
+    assert df["c"].isna().tolist() == [True, False, True]
+    assert df.index.equals(pd.RangeIndex(3))
+
+
+def test_nested_objects_are_flattened_like_json_normalize():
+    rows = records({"user": {"name": "Ada", "address": {"city": "London"}}, "n": 1})
+
+    df = records_to_frame(rows)
+
+    expected = pd.json_normalize([r["fields"] for r in rows])
+    assert sorted(expected.columns) == list(df.columns)
+    assert df["user.address.city"].tolist() == ["London"]
+
+
+def test_sep_changes_nested_column_names():
+    df = records_to_frame(records({"user": {"name": "Ada"}}), sep="_")
+
+    assert list(df.columns) == ["user_name"]
+
+
+@pytest.mark.parametrize(
+    "rule,expected",
+    [("keep", ["a", "b"]), ("join", "a, b"), ("count", 2), ("first", "a")],
+)
+def test_list_rules(rule, expected):
+    df = records_to_frame(records({"tags": ["a", "b"]}), list_rule=rule)
+
+    assert df["tags"].tolist() == [expected]
+
+
+@pytest.mark.parametrize(
+    "rule,expected",
+    [
+        ("url", "https://example.com/a.png, https://example.com/b.png"),
+        ("filename", "a.png, b.png"),
+        ("count", 2),
+    ],
+)
+def test_attachment_rules(rule, expected):
+    df = records_to_frame(
+        records({"files": ATTACHMENTS}), list_rule="count", attachment_rule=rule
+    )
+
+    assert df["files"].tolist() == [expected]
+
+
+def test_schema_types_number_columns():
+    df = records_to_frame(
+        records({"amount": "12.5"}, {"amount": "n/a"}, {}),
+        schema={"amount": "currency"},
+    )
+
+    assert df["amount"].dtype == float
+    assert df["amount"].tolist()[0] == 12.5
+    assert df["amount"].isna().tolist() == [False, True, True]
+
+
+def test_compact_stores_repeated_strings_as_categoricals():
+    builder = FrameBuilder(compact=True)
+    for i in range(10):
+        builder.add({"status": "done" if i % 2 else "todo", "name": f"task {i}"})
+
+    df = builder.build()
+
+    assert df["status"].dtype.name == "category"
+    assert df["name"].dtype.name != "category"
+    assert builder.columns == {}
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from glue.checkpoint import DeadlineExceeded
+from glue.jobs import JobsFailed, run_jobs
+
+
+def test_run_jobs_returns_results_of_successful_jobs():
+    results = run_jobs({"a": lambda: None, "b": lambda: None})
+
+    assert [(r["job"], r["status"]) for r in results] == [("a", "ok"), ("b", "ok")]
+
+
+def test_run_jobs_raises_after_every_job_has_finished():
+    finished = threading.Event()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(JobsFailed) as raised:
+        run_jobs({"fail": fail, "slow": lambda: finished.wait(0.2) or finished.set()})
+
+    assert finished.is_set()
+    statuses = {r["job"]: r["status"] for r in raised.value.results}
+    assert statuses == {"fail": "failed", "slow": "ok"}
+    assert isinstance(raised.value.__cause__, ValueError)
+    assert "fail (ValueError('boom'))" in str(raised.value)
+
+
+def test_run_jobs_reraises_deadline_exceeded():
+    deadline = DeadlineExceeded("Stopping before the Lambda timeout")
+
+    def stop():
+        raise deadline
+
+    with pytest.raises(DeadlineExceeded) as raised:
+        run_jobs({"stop": stop, "ok": lambda: None})
+
+    assert raised.value is deadline
+
+
+def test_run_jobs_prefers_failures_over_deadlines():
+    def stop():
+        raise DeadlineExceeded()
+
+    def fail():
+        raise ValueError()
+
+    with pytest.raises(JobsFailed):
+        run_jobs({"stop": stop, "fail": fail})
@@ -0,0 +1,37 @@
+from conftest import BASE
+
+from glue.mirror import AirtableMirror
+
+
+def person(record_id, created, email, name):
+    return {
+        "id": record_id,
+        "createdTime": created,
+        "fields": {"Email": email, "Name": name},
+    }
+
+
+def test_lookups_return_the_oldest_record_after_updates(tmp_path, monkeypatch):
+    mirror = AirtableMirror(str(tmp_path / "mirror.db"))
+    mirror.add_table(BASE, "People", ["Email"])
+    monkeypatch.setattr(mirror, "refresh", lambda base, table: None)
+    mirror.write_through(
+        BASE,
+        "People",
+        [
+            person("recB", "2023-01-01T00:00:00.000Z", "a@example.org", "Older"),
+            person("recA", "2023-02-01T00:00:00.000Z", "A@example.org", "Newer"),
+        ],
+    )
+
+    # updating the older record replaces its row, moving it to the end of the table
+    mirror.write_through(
+        BASE,
+        "People",
+        [person("recB", "2023-01-01T00:00:00.000Z", "a@example.org", "Updated")],
+    )
+
+    found = mirror.get_by_fields(
+        BASE, "People", ["Email"], "A@EXAMPLE.ORG", casefold=True
+    )
+    assert found["fields"]["Name"] == "Updated"
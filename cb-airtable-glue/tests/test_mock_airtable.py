@@ -0,0 +1,13 @@
+from conftest import BASE
+
+from glue import airtable
+
+
+def test_paging_through_a_filtered_table_sees_writes(airtable_api):
+    airtable_api.add_table(BASE, "People", [{"Team": "A"} for _ in range(150)])
+    pages = airtable.iter_pages(BASE, "People", formula='{Team} = "A"')
+
+    assert len(next(pages)) == 100
+    airtable.create_batch_records(BASE, "People", [{"Team": "A"}])
+
+    assert len(next(pages)) == 51
@@ -0,0 +1,57 @@
+import re
+from datetime import datetime
+
+from conftest import BASE
+
+from glue.airtable import RECORD_ID_CHARS, load_table, partition_formulas
+
+
+def test_record_id_partitions_cover_every_character_once():
+    formulas = partition_formulas(partitions=5)
+
+    assert len(formulas) == 5
+    classes = [re.search(r'"\[(.*)\]\$"', f).group(1) for f in formulas]
+    assert "".join(classes) == RECORD_ID_CHARS
+
+
+def test_record_id_partitions_spread_the_remainder():
+    for partitions in (7, 10, 16, 31):
+        formulas = partition_formulas(partitions=partitions)
+        classes = [re.search(r'"\[(.*)\]\$"', f).group(1) for f in formulas]
+
+        assert len(formulas) == partitions
+        assert "".join(classes) == RECORD_ID_CHARS
+        assert max(map(len, classes)) - min(map(len, classes)) <= 1
+    assert partition_formulas(partitions=1) == [
+        f'REGEX_MATCH(RECORD_ID(), "[{RECORD_ID_CHARS}]$")'
+    ]
+
+
+def test_field_partitions_slice_between_bounds():
+    assert partition_formulas(partition_field="Number", bounds=[100, 200]) == [
+        'OR(LEN({Number} & "") = 0, {Number} < 100)',
+        "AND(NOT({Number} < 100), {Number} < 200)",
+        'AND(NOT(LEN({Number} & "") = 0), NOT({Number} < 200))',
+    ]
+
+
+def test_datetime_bounds_use_is_before():
+    formulas = partition_formulas(
+        partition_field="Created", bounds=[datetime(2023, 1, 1)]
+    )
+
+    assert len(formulas) == 2
+    assert formulas[0].startswith('OR(LEN({Created} & "") = 0, IS_BEFORE({Created}, ')
+    assert formulas[1].startswith('AND(NOT(LEN({Created} & "") = 0), NOT(IS_BEFORE(')
+
+
+def test_field_partitions_put_zero_after_blanks(mock, airtable_api):
+    values = [0, 50, 100, 150, 250]
+    mock.add_table(BASE, "Numbers", [{}] + [{"Number": v} for v in values])
+
+    slices = [
+        sorted(r["fields"].get("Number", -1) for r in load_table(BASE, "Numbers", f))
+        for f in partition_formulas(partition_field="Number", bounds=[100, 200])
+    ]
+
+    assert slices == [[-1, 0, 50], [100, 150], [250]]
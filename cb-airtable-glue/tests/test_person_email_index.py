@@ -0,0 +1,44 @@
+import pytest
+from conftest import BASE
+
+from glue import airtable
+from glue.airtable import PersonEmailIndex
+
+
+@pytest.fixture
+def index(mock, airtable_api, monkeypatch):
+    monkeypatch.setattr(airtable, "AIRTABLE_BASE", BASE)
+    mock.add_table(
+        BASE,
+        "People",
+        [
+            {"Name": "Ann", "Email": "shared@example.org"},
+            {"Name": "Bob", "Email": "Shared@example.org"},
+            {"Name": "Cat", "Email": "cat@example.org", "Email 2": "bob@example.org"},
+            {"Name": "Dan"},
+        ],
+    )
+    monkeypatch.setattr(airtable, "person_email_index", PersonEmailIndex())
+    return airtable.person_email_index
+
+
+def test_last_person_with_an_email_wins(index):
+    assert index.get("SHARED@example.org")["fields"]["Name"] == "Bob"
+    assert airtable.get_person_email_map()["shared@example.org"] == (
+        index.get("shared@example.org")["id"]
+    )
+
+
+def test_records_include_people_whose_emails_are_all_shared(index):
+    names = [p["fields"]["Name"] for p in index.records()]
+
+    assert names == ["Ann", "Bob", "Cat"]
+
+
+def test_removed_email_goes_back_to_the_other_person(index):
+    bob = index.get("shared@example.org")
+    index.add({**bob, "fields": {"Name": "Bob", "Email": "robert@example.org"}})
+
+    assert index.get("shared@example.org")["fields"]["Name"] == "Ann"
+    assert index.get("robert@example.org")["id"] == bob["id"]
+    assert len(index.records()) == 3
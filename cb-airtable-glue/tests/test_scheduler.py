@@ -0,0 +1,114 @@
+import pytest
+
+from glue.scheduler import (
+    DEFAULT_MIN_INTERVAL,
+    MAX_BACKOFF,
+    SCHEDULE_SLACK,
+    SyncScheduler,
+    entry_key,
+)
+from glue.state import FileStateStore
+
+NOW = 1_700_000_000
+
+
+def entry(table, **kwargs):
+    return {"base": "appTest", "table": table, "spreadsheet_key": "sheet", **kwargs}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FileStateStore(str(tmp_path))
+
+
+def scheduler_with(store, manifest, **stats):
+    """A scheduler whose entries named in `stats` have those stats"""
+    scheduler = SyncScheduler(manifest, store)
+    for table, table_stats in stats.items():
+        scheduler.stats[entry_key(entry(table))] = table_stats
+    return scheduler
+
+
+def test_plan_orders_by_priority_then_cost(store):
+    manifest = [entry("slow"), entry("fast"), entry("urgent", priority=1)]
+    scheduler = scheduler_with(
+        store,
+        manifest,
+        slow={"seconds": 50},
+        fast={"seconds": 5},
+        urgent={"seconds": 90},
+    )
+
+    run, deferred, not_due = scheduler.plan(budget=1000, now=NOW)
+
+    assert [e["table"] for e in run] == ["urgent", "fast", "slow"]
+    assert deferred == not_due == []
+
+
+def test_plan_defers_entries_over_budget_but_always_runs_one(store):
+    manifest = [entry("a"), entry("b"), entry("c")]
+    scheduler = scheduler_with(
+        store, manifest, a={"seconds": 200}, b={"seconds": 300}, c={"seconds": 400}
+    )
+
+    run, deferred, _ = scheduler.plan(budget=100, now=NOW)
+    assert [e["table"] for e in run] == ["a"]
+    assert [e["table"] for e in deferred] == ["b", "c"]
+
+    run, deferred, _ = scheduler.plan(budget=300, workers=2, now=NOW)
+    assert [e["table"] for e in run] == ["a", "b"]
+    assert [e["table"] for e in deferred] == ["c"]
+
+
+def test_plan_skips_entries_that_are_not_due(store):
+    manifest = [entry("recent"), entry("stale"), entry("new")]
+    scheduler = scheduler_with(
+        store,
+        manifest,
+        recent={"last_run": NOW - 60, "change_rate": 1.0},
+        stale={"last_run": NOW - DEFAULT_MIN_INTERVAL, "change_rate": 1.0},
+    )
+
+    run, _, not_due = scheduler.plan(budget=1000, now=NOW)
+
+    assert sorted(e["table"] for e in run) == ["new", "stale"]
+    assert [e["table"] for e in not_due] == ["recent"]
+
+
+def test_slack_makes_entries_due_early(store):
+    scheduler = scheduler_with(
+        store,
+        [entry("a")],
+        a={"last_run": NOW - DEFAULT_MIN_INTERVAL + SCHEDULE_SLACK, "change_rate": 1},
+    )
+
+    assert scheduler.is_due(entry("a"), now=NOW)
+    assert not scheduler.is_due(entry("a"), now=NOW - 1)
+
+
+def test_unchanged_tables_back_off_up_to_max_backoff(store):
+    e = entry("quiet", min_interval=600)
+    scheduler = SyncScheduler([e], store)
+
+    scheduler.record(e, "written", 10, started=NOW)
+    assert scheduler.interval(e) == 600
+    for _ in range(50):
+        scheduler.record(e, "skipped", 10, started=NOW)
+
+    assert scheduler.interval(e) == pytest.approx(600 * MAX_BACKOFF)
+    scheduler.record(e, "written", 10, started=NOW)
+    assert scheduler.interval(e) < 600 * MAX_BACKOFF
+
+
+def test_record_saves_stats_and_ignores_deferred_runs(store):
+    e = entry("a")
+    scheduler = SyncScheduler([e], store)
+
+    scheduler.record(e, "written", 20, started=NOW)
+    scheduler.record(e, "failed", 40, started=NOW + 100)
+    scheduler.record(e, "deferred", 1000, started=NOW + 200)
+
+    stats = SyncScheduler([e], store).stats[entry_key(e)]
+    assert stats["runs"] == 1
+    assert stats["last_run"] == NOW
+    assert stats["seconds"] == pytest.approx(0.3 * 40 + 0.7 * 20)
@@ -0,0 +1,105 @@
+import pandas as pd
+
+from glue.sheet_diff import (
+    changed_rows,
+    diff_grids,
+    frame_to_grid,
+    write_sheet_incremental,
+)
+
+HEADER = ["index", "a", "b", "c"]
+
+
+def test_frame_to_grid_renders_index_header_and_blanks():
+    df = pd.DataFrame({"a": [1, None], "b": ["x", "y"]})
+
+    assert frame_to_grid(df) == [["index", "a", "b"], ["0", "1.0", "x"], ["1", "", "y"]]
+
+
+def test_diff_grids_returns_nothing_for_identical_grids():
+    grid = [HEADER, ["0", "1", "2", "3"]]
+
+    assert diff_grids(grid, [list(row) for row in grid]) == []
+
+
+def test_diff_grids_merges_adjacent_changed_cells():
+    old = [HEADER, ["0", "1", "2", "3"], ["1", "4", "5", "6"]]
+    new = [HEADER, ["0", "x", "y", "3"], ["1", "4", "5", "z"]]
+
+    assert diff_grids(old, new) == [
+        {"range": "B2:C2", "values": [["x", "y"]]},
+        {"range": "D3:D3", "values": [["z"]]},
+    ]
+
+
+def test_diff_grids_splits_runs_around_unchanged_cells():
+    old = [HEADER, ["0", "1", "2", "3"]]
+    new = [HEADER, ["0", "x", "2", "y"]]
+
+    assert diff_grids(old, new) == [
+        {"range": "B2:B2", "values": [["x"]]},
+        {"range": "D2:D2", "values": [["y"]]},
+    ]
+
+
+def test_diff_grids_writes_cells_missing_from_short_old_rows():
+    old = [HEADER, ["0", "1"]]
+    new = [HEADER, ["0", "1", "2", "3"]]
+
+    assert diff_grids(old, new) == [{"range": "C2:D2", "values": [["2", "3"]]}]
+
+
+def test_diff_grids_appends_new_rows_in_one_range():
+    old = [HEADER, ["0", "1", "2", "3"]]
+    new = old + [["1", "4", "5", "6"], ["2", "7", "8", "9"]]
+
+    assert diff_grids(old, new) == [
+        {"range": "A3:D4", "values": [["1", "4", "5", "6"], ["2", "7", "8", "9"]]}
+    ]
+
+
+def test_changed_rows_counts_shifted_and_removed_rows():
+    old = [HEADER] + [[str(i), "a", "b", "c"] for i in range(4)]
+    # removing the second row shifts the two below it up
+    new = old[:2] + old[3:]
+
+    assert changed_rows(old, new) == 3
+    assert changed_rows(new, old) == 2
+
+
+class FakeWriter:
+    spreadsheet_key = "sheet"
+
+    def __init__(self):
+        self.grids = []
+        self.updates = []
+
+    def worksheet(self, sheet):
+        return None
+
+    def write_grid(self, grid, sheet):
+        self.grids.append(grid)
+
+    def update_ranges(self, sheet, updates):
+        self.updates.extend(updates)
+
+
+class FakeStore(dict):
+    def set(self, key, value):
+        self[key] = value
+
+
+def test_write_sheet_incremental_replaces_the_tab_when_most_rows_moved():
+    df = pd.DataFrame({"a": range(10)})
+    writer, store = FakeWriter(), FakeStore()
+    write_sheet_incremental(writer, df, "Tab", store)
+
+    # updating one row writes just its cell
+    df.loc[5, "a"] = 50
+    assert write_sheet_incremental(writer, df, "Tab", store) == 1
+    assert writer.updates == [{"range": "B7:B7", "values": [["50"]]}]
+
+    # removing the first row changes every row, so the tab is replaced
+    df = df.iloc[1:]
+    assert write_sheet_incremental(writer, df, "Tab", store) == -1
+    assert len(writer.grids) == 2
@@ -0,0 +1,129 @@
+import csv
+import os
+import sqlite3
+
+import pytest
+from conftest import BASE
+
+from glue import sinks
+
+BATCHES = [
+    [{"Name": "Ada", "Amount": 3}, {"Name": "Grace"}],
+    # "Notes" first appears in the second batch
+    [{"Name": "Alan", "Notes": "late field", "Amount": 1.5}],
+]
+
+
+def export(sink, batches=BATCHES, schema=None):
+    sink.open(BASE, "People", schema)
+    for batch in batches:
+        sink.write(batch)
+    sink.commit()
+    return sink
+
+
+def test_csv_sink_widens_columns(tmp_path):
+    sink = export(sinks.CSVSink(directory=str(tmp_path), bucket=None))
+
+    with open(sink.path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows == [
+        ["Amount", "Name", "Notes"],
+        ["3", "Ada", ""],
+        ["", "Grace", ""],
+        ["1.5", "Alan", "late field"],
+    ]
+    assert os.listdir(os.path.dirname(sink.path)) == ["People.csv"]
+
+
+def test_csv_sink_writes_header_for_empty_table(tmp_path):
+    sink = export(sinks.CSVSink(directory=str(tmp_path), bucket=None), [[]], {"B": "x"})
+
+    with open(sink.path, newline="") as f:
+        assert list(csv.reader(f)) == [["B"]]
+
+
+def test_parquet_sink_merges_parts_with_new_columns(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    sink = export(
+        sinks.ParquetSink(directory=str(tmp_path), bucket=None),
+        schema={"Name": "singleLineText", "Amount": "number"},
+    )
+
+    table = pq.read_table(sink.path)
+    assert table.column_names == ["Amount", "Name", "Notes"]
+    assert str(table.schema.field("Amount").type) == "double"
+    assert table.to_pydict() == {
+        "Amount": [3.0, None, 1.5],
+        "Name": ["Ada", "Grace", "Alan"],
+        "Notes": [None, None, "late field"],
+    }
+    # a row group per batch
+    assert pq.ParquetFile(sink.path).num_row_groups == 2
+    assert os.listdir(os.path.dirname(sink.path)) == ["People.parquet"]
+
+
+def test_sqlite_sink_adds_new_columns(tmp_path):
+    sink = export(sinks.SQLiteSink(directory=str(tmp_path), bucket=None))
+
+    conn = sqlite3.connect(sink.path)
+    rows = conn.execute('SELECT Amount, Name, Notes FROM "People"').fetchall()
+    # without a schema every column is TEXT
+    assert rows == [
+        ("3", "Ada", None),
+        (None, "Grace", None),
+        ("1.5", "Alan", "late field"),
+    ]
+    tables = conn.execute("SELECT name FROM sqlite_master").fetchall()
+    assert tables == [("People",)]
+
+
+class FailingSink(sinks.Sink):
+    key = "failing"
+
+    def open(self, base, table, schema=None):
+        raise RuntimeError("can't open")
+
+
+def test_export_table_aborts_opened_sinks_when_open_fails(airtable_api, tmp_path):
+    airtable_api.add_table(BASE, "People", [{"Name": "Ada"}])
+    opened = sinks.CSVSink(directory=str(tmp_path), bucket=None)
+
+    with pytest.raises(RuntimeError):
+        sinks.export_table(BASE, "People", [opened, FailingSink()])
+
+    assert opened.file.closed
+    assert os.listdir(os.path.join(str(tmp_path), BASE)) == []
+
+
+class CountingSink(sinks.Sink):
+    def __init__(self, key, abort_fails=False):
+        self.key = key
+        self.abort_fails = abort_fails
+        self.aborts = 0
+
+    def open(self, base, table, schema=None):
+        pass
+
+    def write(self, records):
+        pass
+
+    def commit(self):
+        pass
+
+    def abort(self):
+        self.aborts += 1
+        if self.abort_fails:
+            raise RuntimeError("can't abort")
+
+
+def test_export_table_aborts_each_unchanged_sink_once(airtable_api):
+    airtable_api.add_table(BASE, "People", [{"Name": "Ada"}])
+    exported = [CountingSink("counting/a", abort_fails=True), CountingSink("counting")]
+    assert sinks.export_table(BASE, "People", exported)
+
+    with pytest.raises(RuntimeError):
+        sinks.export_table(BASE, "People", exported)
+
+    assert [sink.aborts for sink in exported] == [1, 1]
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import sentry_sdk
+from sentry_sdk.transport import Transport
+
+from glue.telemetry import Telemetry
+
+
+class CapturingTransport(Transport):
+    def __init__(self, options=None):
+        super().__init__(options)
+        self.events = []
+
+    def capture_envelope(self, envelope):
+        self.events.extend(item.payload.json for item in envelope.items)
+
+
+@pytest.fixture
+def events():
+    """Sentry events sent while the test runs"""
+    transport = CapturingTransport()
+    sentry_sdk.init(
+        dsn="https://key@sentry.invalid/1",
+        traces_sample_rate=1.0,
+        transport=transport,
+        default_integrations=False,
+    )
+    yield transport.events
+    sentry_sdk.init()
+
+
+def test_invocation_sends_a_transaction_with_a_span_per_call(events):
+    telemetry = Telemetry(enabled=True)
+
+    def request(table):
+        with telemetry.call("airtable", "GET records", "appX", table) as call:
+            call.bytes_in = 10
+
+    with telemetry.invocation("test_cron"):
+        request("People")
+        # calls made from worker threads are spans of the same transaction
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(request, ["Donations", "Events"]))
+    sentry_sdk.flush()
+
+    (transaction,) = [e for e in events if e.get("type") == "transaction"]
+    assert transaction["transaction"] == "test_cron"
+    spans = sorted(span["description"] for span in transaction["spans"])
+    assert spans == [
+        "GET records appX/Donations",
+        "GET records appX/Events",
+        "GET records appX/People",
+    ]
+    assert {span["op"] for span in transaction["spans"]} == {"airtable.request"}
+    summary = transaction["contexts"]["telemetry"]
+    assert summary["handler"] == "test_cron"
+    assert summary["totals"]["airtable"]["calls"] == 3
+
+
+def test_calls_are_not_recorded_when_disabled(events):
+    telemetry = Telemetry(enabled=False)
+
+    with telemetry.invocation("test_cron"):
+        with telemetry.call("airtable", "GET records", "appX", "People"):
+            pass
+    sentry_sdk.flush()
+
+    assert telemetry.stats == {}
+    assert events == []